@@ -0,0 +1,201 @@
+"""
+Benchmark the two-stage cascade image search against the full ViT-L search.
+
+For each query the full search encodes every crop with ViT-L and scores
+every image. The cascade encodes the crops with the small backbone, keeps
+the images of the top N hotels and re-ranks them with ViT-L on the first
+CASCADE_RERANK_CROPS crops. Reports p50/p99 latency and top-3 agreement
+with the full ranking per N, to pick CASCADE_TOP_HOTELS and
+CASCADE_RERANK_CROPS.
+
+With --model clip, queries are perturbed copies (random crop, JPEG
+recompression) of indexed hotel photos. Latency includes encoding. It
+needs hotel_features_ai.npy, mapping.pkl and the backbone's features
+written by setup_db.py. --model synthetic uses clustered random features
+and measures scoring only, so it checks the ranking logic, not CLIP speed.
+
+Usage:
+    python benchmarks/bench_cascade.py --queries 50 --top-hotels 5 10 20 50
+    python benchmarks/bench_cascade.py --backbone ViT-B/16 --rerank-crops 1 3
+    python benchmarks/bench_cascade.py --model synthetic --images 100000
+"""
+import argparse
+import io
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "image_search"))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from visual_features import (
+    DEFAULT_CROPS, HotelGroups, backbone_feature_name, best_crop_scores, cascade_candidates, color_texture_signature
+)
+
+IMAGE_SEARCH_DIR = Path(__file__).parent.parent.parent / "image_search"
+TOP_K = 3
+
+
+def fuse(ai_scores, color_scores):
+    return 0.7 * ai_scores + 0.3 * color_scores
+
+
+def full_rank(groups, features, color_scores, queries):
+    scores = fuse(best_crop_scores(features, queries), color_scores)
+    return groups.top_hotels(scores, TOP_K)[0]
+
+
+def cascade_rank(groups, features, small_features, color_scores, small_queries, queries, n_hotels):
+    coarse_scores = fuse(best_crop_scores(small_features, small_queries), color_scores)
+    candidates = cascade_candidates(groups, coarse_scores, n_hotels)
+    scores = np.full(len(color_scores), -np.inf, dtype=np.float32)
+    scores[candidates] = fuse(best_crop_scores(np.asarray(features[candidates]), queries), color_scores[candidates])
+    return groups.top_hotels(scores, TOP_K)[0]
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    p = lambda f: latencies[min(len(latencies) - 1, int(len(latencies) * f))] * 1000
+    return p(0.5), p(0.99)
+
+
+def agreement(results, reference):
+    """Mean top-3 overlap and the share of identical ordered top-3 lists"""
+    overlap = np.mean([len(set(r) & set(ref)) / max(1, len(ref)) for r, ref in zip(results, reference)])
+    exact = np.mean([list(r) == list(ref) for r, ref in zip(results, reference)])
+    return overlap, exact
+
+
+def clip_queries(args, rng):
+    """Encoders and perturbed hotel photos for --model clip"""
+    import torch
+    import clip
+    from PIL import Image
+    from utils.model_registry import configure_environment, model_source
+
+    configure_environment()
+    features = np.load(IMAGE_SEARCH_DIR / "hotel_features_ai.npy", mmap_mode="r")
+    small_features = np.load(IMAGE_SEARCH_DIR / f"{backbone_feature_name(args.backbone)}.npy", mmap_mode="r")
+    color_features = np.load(IMAGE_SEARCH_DIR / "hotel_features_color.npy")
+    with open(IMAGE_SEARCH_DIR / "mapping.pkl", "rb") as f:
+        mapping = pickle.load(f)
+
+    large, large_pre = clip.load(model_source("clip"), device="cpu")
+    small, small_pre = clip.load(args.backbone, device="cpu")
+
+    def encoder(model, preprocess):
+        def encode(crops):
+            with torch.no_grad():
+                feats = model.encode_image(torch.stack([preprocess(c) for c in crops])).float()
+                feats /= feats.norm(dim=-1, keepdim=True)
+            return feats.numpy()
+        return encode
+
+    photos = []
+    for image_index in rng.choice(len(mapping), min(args.queries, len(mapping)), replace=False):
+        image = Image.open(mapping[int(image_index)]["image_path"]).convert("RGB")
+        w, h = image.size
+        x0, y0 = rng.uniform(0, 0.1, 2)
+        buffer = io.BytesIO()
+        image.crop((w * x0, h * y0, w * (0.9 + x0), h * (0.9 + y0))).save(buffer, format="JPEG", quality=70)
+        photos.append(Image.open(io.BytesIO(buffer.getvalue())).convert("RGB"))
+
+    color_queries = [color_texture_signature(photo) for photo in photos]
+    return (features, small_features, color_features, HotelGroups(mapping, len(features)),
+            photos, color_queries, encoder(large, large_pre), encoder(small, small_pre))
+
+
+def run_clip(args, rng):
+    from visual_features import multi_scale_crops
+
+    (features, small_features, color_features, groups,
+     photos, color_queries, encode_large, encode_small) = clip_queries(args, rng)
+    print(f"{len(features)} images, {len(groups)} hotels, {len(photos)} queries, backbone {args.backbone}")
+
+    reference, latencies = [], []
+    for photo, color_query in zip(photos, color_queries):
+        started = time.perf_counter()
+        crops = multi_scale_crops(photo, DEFAULT_CROPS)
+        reference.append(full_rank(groups, features, color_features @ color_query, encode_large(crops)))
+        latencies.append(time.perf_counter() - started)
+    print(f"{'search':<10} {'N':>5} {'crops':>5} {'p50 ms':>8} {'p99 ms':>8} {'top3 overlap':>13} {'same top3':>10}")
+    print(f"{'full':<10} {'-':>5} {len(DEFAULT_CROPS):>5} {percentiles(latencies)[0]:>8.1f} "
+          f"{percentiles(latencies)[1]:>8.1f} {1.0:>13.3f} {1.0:>10.3f}")
+
+    for rerank_crops in args.rerank_crops:
+        for n_hotels in args.top_hotels:
+            results, latencies = [], []
+            for photo, color_query in zip(photos, color_queries):
+                started = time.perf_counter()
+                crops = multi_scale_crops(photo, DEFAULT_CROPS)
+                results.append(cascade_rank(
+                    groups, features, small_features, color_features @ color_query,
+                    encode_small(crops), encode_large(crops[:rerank_crops]), n_hotels
+                ))
+                latencies.append(time.perf_counter() - started)
+            p50, p99 = percentiles(latencies)
+            overlap, exact = agreement(results, reference)
+            print(f"{'cascade':<10} {n_hotels:>5} {rerank_crops:>5} {p50:>8.1f} {p99:>8.1f} "
+                  f"{overlap:>13.3f} {exact:>10.3f}", flush=True)
+
+
+def run_synthetic(args, rng):
+    from bench_vector_index import synthetic_features, make_queries, normalize
+
+    features = synthetic_features(args.images, 768, rng)
+    # The small backbone sees a noisier, lower-dimensional view of the same images
+    projection = rng.standard_normal((768, 512)).astype(np.float32) / np.sqrt(768)
+    small_features = normalize(features @ projection + 0.02 * rng.standard_normal((args.images, 512)))
+    mapping = {i: {"hotel_id": int(i // 20)} for i in range(args.images)}
+    groups = HotelGroups(mapping, args.images)
+    queries = make_queries(features, args.queries, rng)
+    small_queries = normalize(queries @ projection)
+    color_scores = np.zeros(args.images, dtype=np.float32)
+    print(f"{args.images} synthetic images, {len(groups)} hotels, {args.queries} queries (scoring only)")
+
+    reference, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        reference.append(full_rank(groups, features, color_scores, query))
+        latencies.append(time.perf_counter() - started)
+    p50, p99 = percentiles(latencies)
+    print(f"{'search':<10} {'N':>5} {'crops':>5} {'p50 ms':>8} {'p99 ms':>8} {'top3 overlap':>13} {'same top3':>10}")
+    print(f"{'full':<10} {'-':>5} {queries.shape[1]:>5} {p50:>8.2f} {p99:>8.2f} {1.0:>13.3f} {1.0:>10.3f}")
+    for rerank_crops in args.rerank_crops:
+        for n_hotels in args.top_hotels:
+            results, latencies = [], []
+            for query, small_query in zip(queries, small_queries):
+                started = time.perf_counter()
+                results.append(cascade_rank(
+                    groups, features, small_features, color_scores, small_query, query[:rerank_crops], n_hotels
+                ))
+                latencies.append(time.perf_counter() - started)
+            p50, p99 = percentiles(latencies)
+            overlap, exact = agreement(results, reference)
+            print(f"{'cascade':<10} {n_hotels:>5} {rerank_crops:>5} {p50:>8.2f} {p99:>8.2f} "
+                  f"{overlap:>13.3f} {exact:>10.3f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cascade image search against full ViT-L")
+    parser.add_argument("--model", choices=["clip", "synthetic"], default="clip")
+    parser.add_argument("--backbone", default="ViT-B/32", help="Small backbone (CASCADE_BACKBONE)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--images", type=int, default=50_000, help="Synthetic index size")
+    parser.add_argument("--top-hotels", nargs="+", type=int, default=[5, 10, 20, 50])
+    parser.add_argument("--rerank-crops", nargs="+", type=int, default=[1, 3])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.model == "synthetic":
+        run_synthetic(args, rng)
+    else:
+        run_clip(args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark CLIP image encoding with and without micro-batching.
+
+Simulates concurrent image searches: each request encodes three crops,
+either with its own forward pass (the pre-batching behaviour) or through a
+MicroBatcher shared by all requests. Reports throughput and p50/p99
+request latency per concurrency level, to pick CLIP_MAX_BATCH_SIZE,
+CLIP_MAX_WAIT_MS and IMAGE_POOL_WORKERS for the host.
+
+Usage:
+    python benchmarks/bench_clip_batching.py --concurrency 1 2 4 8 16
+    python benchmarks/bench_clip_batching.py --max-batch-size 32 --max-wait-ms 5 --requests 128
+    python benchmarks/bench_clip_batching.py --model synthetic   # no CLIP download
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.batching import MicroBatcher
+from utils.model_registry import configure_environment, model_source
+from utils.runtime_profile import get_runtime_profile, apply_thread_settings, prepare_model, inference_context
+
+CROPS_PER_REQUEST = 3
+
+
+def load_encoder(model_name):
+    """Return (encode_batch, input_shape) for CLIP's image tower or a small stand-in"""
+    import torch
+
+    if model_name == "clip":
+        import clip
+        model, _ = clip.load(model_source("clip"), device="cpu")
+        resolution = model.visual.input_resolution
+    else:
+        # Small conv net with the same call shape, to exercise the batcher
+        model = torch.nn.Sequential(
+            torch.nn.Conv2d(3, 32, 7, stride=4), torch.nn.ReLU(),
+            torch.nn.Conv2d(32, 64, 3, stride=2), torch.nn.ReLU(),
+            torch.nn.AdaptiveAvgPool2d(1), torch.nn.Flatten(), torch.nn.Linear(64, 512)
+        )
+        model.encode_image = model.forward
+        resolution = 224
+
+    profile = get_runtime_profile("image")
+    apply_thread_settings(profile)
+    prepare_model(model, profile)
+
+    def encode_batch(inputs):
+        with inference_context(profile):
+            features = model.encode_image(torch.stack(inputs)).float()
+            features /= features.norm(dim=-1, keepdim=True)
+        return features.numpy()
+
+    return encode_batch, (3, resolution, resolution)
+
+
+def run_load(request_fn, concurrency, requests):
+    """Run ``requests`` calls from ``concurrency`` threads; return (throughput, latencies)"""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = max(1, requests // concurrency)
+
+    def worker():
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            request_fn()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return len(latencies) / wall, sorted(latencies)
+
+
+def percentile_ms(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLIP micro-batching")
+    parser.add_argument("--model", choices=["clip", "synthetic"], default="clip")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per run")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    configure_environment()
+    import torch
+
+    encode_batch, shape = load_encoder(args.model)
+    crops = [torch.randn(*shape) for _ in range(CROPS_PER_REQUEST)]
+    encode_batch(crops)  # Warm-up
+    batcher = MicroBatcher("bench", encode_batch, args.max_batch_size, args.max_wait_ms)
+
+    modes = {
+        "unbatched": lambda: encode_batch(crops),
+        "batched": lambda: batcher.submit(crops),
+    }
+    print(f"model={args.model} max_batch_size={args.max_batch_size} max_wait_ms={args.max_wait_ms} "
+          f"torch threads={torch.get_num_threads()}")
+    print(f"{'mode':<10} {'concurrency':>11} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'mean batch':>11}")
+    for concurrency in args.concurrency:
+        for mode, request_fn in modes.items():
+            before = batcher.stats()
+            throughput, latencies = run_load(request_fn, concurrency, args.requests)
+            after = batcher.stats()
+            batches = after["batches"] - before["batches"]
+            mean_batch = (after["items"] - before["items"]) / batches if batches else CROPS_PER_REQUEST
+            print(f"{mode:<10} {concurrency:>11} {throughput:>8.2f} {percentile_ms(latencies, 0.5):>9.1f} "
+                  f"{percentile_ms(latencies, 0.99):>9.1f} {mean_batch:>11.1f}", flush=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark float16 and int8 feature matrices against float32.
+
+Writes the quantized copies of hotel_features_ai.npy (or of a synthetic
+clustered matrix) to a temporary directory, opens them memory-mapped the
+way the service does, and reports for each FEATURES_PRECISION:
+- size on disk (and in the page cache);
+- recall@k of the top-k images against float32;
+- the largest score error;
+- p50/p99 scoring latency for three-crop queries.
+
+Usage:
+    python benchmarks/bench_feature_precision.py --images 200000
+    python benchmarks/bench_feature_precision.py --features ../image_search/hotel_features_ai.npy
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "image_search"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_vector_index import make_queries, synthetic_features
+from feature_store import PRECISIONS, load_features, write_quantized
+from visual_features import best_crop_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized feature matrices")
+    parser.add_argument("--features", help="Path to hotel_features_ai.npy (default: synthetic)")
+    parser.add_argument("--images", type=int, default=100_000, help="Synthetic index size")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.features:
+        features = np.load(args.features)
+    else:
+        features = synthetic_features(args.images, args.dim, rng)
+    queries = make_queries(features, args.queries, rng)
+    print(f"{len(features)} images x {features.shape[1]} dims, {args.queries} queries, recall@{args.k}")
+    print(f"{'precision':<10} {'MB':>8} {'recall@k':>9} {'max err':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(f"{tmp}/bench.npy", features)
+        write_quantized(features, tmp, "bench")
+        reference = [best_crop_scores(features, query) for query in queries]
+        reference_top = [set(np.argsort(-scores)[:args.k]) for scores in reference]
+
+        for precision in PRECISIONS:
+            matrix = load_features(tmp, "bench", precision, mmap_mode="r")
+            latencies, recalls, errors = [], [], []
+            for query, expected, expected_top in zip(queries, reference, reference_top):
+                started = time.perf_counter()
+                scores = best_crop_scores(matrix, query)
+                latencies.append(time.perf_counter() - started)
+                recalls.append(len(expected_top & set(np.argsort(-scores)[:args.k])) / args.k)
+                errors.append(np.abs(scores - expected).max())
+            latencies.sort()
+            p = lambda f: latencies[min(len(latencies) - 1, int(len(latencies) * f))] * 1000
+            print(f"{precision:<10} {matrix.nbytes / 2**20:>8.1f} {np.mean(recalls):>9.3f} {max(errors):>9.4f} "
+                  f"{p(0.5):>8.2f} {p(0.99):>8.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark torch runtime profiles on this machine.
+
+Loads each service's model once per profile, applies the profile the same
+way the service does, and reports throughput and latency for a fixed
+synthetic workload. Use it to pick TORCH_*_THREADS, TORCH_BF16_SERVICES and
+TORCH_INT8_SERVICES for the host the service runs on.
+
+Usage:
+    python benchmarks/bench_runtime_profiles.py --services image activities sentiment
+    python benchmarks/bench_runtime_profiles.py --services activities --threads 1 2 4 --iterations 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.model_registry import configure_environment, model_source
+from utils.runtime_profile import (
+    RuntimeProfile, VISION_SERVICES, apply_thread_settings, prepare_model, prepare_input, inference_context
+)
+
+
+def profiles_for(service, thread_counts):
+    """Baseline plus one variation per knob, for each thread count"""
+    profiles = []
+    for threads in thread_counts:
+        profiles.append(RuntimeProfile(service, threads, inference_mode=False))
+        profiles.append(RuntimeProfile(service, threads, inference_mode=True))
+        profiles.append(RuntimeProfile(service, threads, inference_mode=True, bf16_autocast=True))
+        profiles.append(RuntimeProfile(service, threads, inference_mode=True, int8_dynamic=True))
+        if service in VISION_SERVICES:
+            profiles.append(RuntimeProfile(service, threads, inference_mode=True, channels_last=True))
+    return profiles
+
+
+def load_workload(service, batch_size):
+    """Return (model, run_once, items_per_call) for a service"""
+    import torch
+
+    if service == "image":
+        import clip
+        model, _ = clip.load(model_source("clip"), device="cpu")
+        batch = torch.randn(batch_size, 3, 336, 336)
+
+        def run(profile):
+            return model.encode_image(prepare_input(batch, profile)).float()
+        return model, run, batch_size
+
+    if service == "activities":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_source("minilm"))
+        texts = ["beach shacks with live music and water sports near Baga"] * batch_size
+
+        def run(profile):
+            return model.encode(texts, convert_to_tensor=True).float()
+        return model, run, batch_size
+
+    if service == "sentiment":
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        name = model_source("sentiment")
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        model = AutoModelForSequenceClassification.from_pretrained(name)
+        inputs = tokenizer(["Baga is crowded but great for families"] * batch_size,
+                           return_tensors="pt", padding=True)
+
+        def run(profile):
+            return model(**inputs).logits
+        return model, run, batch_size
+
+    if service == "llm":
+        from transformers import pipeline
+        generator = pipeline("text-generation", model=model_source("qwen"), device="cpu")
+        prompt = "Plan one day in North Goa with a beach and a fort."
+
+        def run(profile):
+            return generator(prompt, max_new_tokens=32, do_sample=False)
+        return generator.model, run, 1
+
+    raise ValueError(f"Unknown service: {service}")
+
+
+def bench_profile(service, profile, batch_size, warmup, iterations, default_threads):
+    import torch
+
+    apply_thread_settings(profile)
+    if not profile.intra_op_threads:
+        # Undo the previous profile's thread count
+        torch.set_num_threads(default_threads)
+    model, run, items = load_workload(service, batch_size)
+    prepare_model(model, profile)
+
+    latencies = []
+    with inference_context(profile):
+        for _ in range(warmup):
+            run(profile)
+        for _ in range(iterations):
+            started = time.perf_counter()
+            run(profile)
+            latencies.append(time.perf_counter() - started)
+
+    total = sum(latencies)
+    latencies.sort()
+    return {
+        "throughput": items * iterations / total,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark torch runtime profiles")
+    parser.add_argument("--services", nargs="+", default=["image", "activities", "sentiment"],
+                        choices=["image", "activities", "sentiment", "llm"])
+    parser.add_argument("--threads", nargs="+", type=int, default=[0, os.cpu_count() // 2 or 1],
+                        help="Intra-op thread counts to try (0 = torch default)")
+    parser.add_argument("--batch-size", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    configure_environment()
+    import torch
+    default_threads = torch.get_num_threads()
+    print(f"torch {torch.__version__}, default intra-op threads: {default_threads}")
+    print(f"{'profile':<60} {'items/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for service in args.services:
+        for profile in profiles_for(service, args.threads):
+            try:
+                result = bench_profile(service, profile, args.batch_size, args.warmup, args.iterations, default_threads)
+            except Exception as e:
+                print(f"{profile.describe():<60} failed: {e}")
+                continue
+            print(f"{profile.describe():<60} {result['throughput']:>9.2f} "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark the approximate vector indexes against brute force.
+
+Builds each index over the real hotel_features_ai.npy (or a synthetic
+clustered matrix of the same kind), runs three-crop queries and reports
+recall@k of the top-k images against exact search, with p50/p99 latency
+per nprobe value. Use it to pick VECTOR_INDEX and VECTOR_INDEX_NPROBE.
+
+Usage:
+    python benchmarks/bench_vector_index.py --images 200000
+    python benchmarks/bench_vector_index.py --features ../image_search/hotel_features_ai.npy --nprobe 4 8 16 32
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "image_search"))
+
+from vector_index import ExactIndex, IVFIndex, FaissIndex, faiss
+
+CROPS_PER_QUERY = 3
+
+
+def normalize(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_features(n_images, dim, rng):
+    """Clustered unit vectors, like photos grouped by hotel and scene"""
+    centers = rng.standard_normal((max(1, n_images // 50), dim)).astype(np.float32)
+    noise = 0.6 * rng.standard_normal((n_images, dim)).astype(np.float32)
+    return normalize(centers[rng.integers(0, len(centers), n_images)] + noise)
+
+
+def make_queries(features, n_queries, rng):
+    """Noisy crops of random indexed images"""
+    picks = features[rng.integers(0, len(features), n_queries)]
+    # Noise of norm about 0.5 per crop
+    noise = rng.standard_normal((n_queries, CROPS_PER_QUERY, features.shape[1])) * (0.5 / np.sqrt(features.shape[1]))
+    return normalize(picks[:, None, :] + noise)
+
+
+def run(index, queries, k, exact_ids=None):
+    latencies, recalls, results = [], [], []
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        ids, _ = index.search(query, k)
+        latencies.append(time.perf_counter() - started)
+        results.append(ids)
+        if exact_ids is not None:
+            recalls.append(len(np.intersect1d(ids, exact_ids[i])) / len(exact_ids[i]))
+    latencies.sort()
+    p = lambda f: latencies[min(len(latencies) - 1, int(len(latencies) * f))] * 1000
+    recall = float(np.mean(recalls)) if recalls else 1.0
+    return results, recall, p(0.5), p(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark approximate vector indexes")
+    parser.add_argument("--features", help="Path to hotel_features_ai.npy (default: synthetic)")
+    parser.add_argument("--images", type=int, default=100_000, help="Synthetic index size")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=100, help="Candidates per query (VECTOR_INDEX_CANDIDATES)")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", nargs="+", type=int, default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.features:
+        features = np.load(args.features, mmap_mode="r")
+    else:
+        features = synthetic_features(args.images, args.dim, rng)
+    queries = make_queries(np.asarray(features), args.queries, rng)
+    print(f"{len(features)} images x {features.shape[1]} dims, {args.queries} queries of {CROPS_PER_QUERY} crops, k={args.k}")
+
+    exact_ids, _, p50, p99 = run(ExactIndex(features), queries, args.k)
+    print(f"{'index':<8} {'nprobe':>6} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'exact':<8} {'-':>6} {1.0:>9.3f} {p50:>8.2f} {p99:>8.2f}")
+
+    kinds = [IVFIndex] + ([FaissIndex] if faiss is not None else [])
+    for cls in kinds:
+        started = time.perf_counter()
+        index = cls.build(features, args.nlist)
+        print(f"# built {cls.kind} in {time.perf_counter() - started:.1f}s")
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            if cls is FaissIndex:
+                index.index.nprobe = nprobe
+            _, recall, p50, p99 = run(index, queries, args.k, exact_ids)
+            print(f"{cls.kind:<8} {nprobe:>6} {recall:>9.3f} {p50:>8.2f} {p99:>8.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
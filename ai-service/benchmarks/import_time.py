@@ -0,0 +1,84 @@
+"""
+Report where import time goes when the ai-service starts.
+
+Runs a statement under ``python -X importtime`` in a fresh interpreter and
+prints the slowest modules by cumulative and by self time, plus totals per
+top-level package. Use it to check that a change did not pull torch,
+transformers or PIL back into the startup path.
+
+Usage:
+    python benchmarks/import_time.py                        # import main
+    python benchmarks/import_time.py --statement "import main; main.init_moderation_service()"
+    python benchmarks/import_time.py --module services.activity_recommendation_service --top 15
+"""
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+AI_SERVICE_DIR = Path(__file__).parent.parent
+
+# Packages that should never load on the startup path
+HEAVY_PACKAGES = ("torch", "transformers", "sentence_transformers", "clip", "PIL", "openai")
+
+
+def run_importtime(statement: str):
+    """Return [(module, self_us, cumulative_us, depth)] for a statement"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=str(AI_SERVICE_DIR),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Statement failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def print_report(rows, top: int):
+    total_us = sum(r[1] for r in rows)
+    print(f"{len(rows)} modules imported in {total_us / 1e6:.3f}s (sum of self times)\n")
+
+    print(f"Top {top} by cumulative time:")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {'  ' * min(depth, 6)}{name}")
+
+    print(f"\nTop {top} by self time:")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    packages = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    print(f"\nTop {top} packages (self time summed):")
+    for package, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+
+    heavy = sorted(p for p in packages if p in HEAVY_PACKAGES)
+    print(f"\nHeavy packages loaded: {', '.join(heavy) if heavy else 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="python -X importtime breakdown for the AI microservice")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--module", default="main", help="Module to import (default: main)")
+    group.add_argument("--statement", help="Python statement to run instead of a single import")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    statement = args.statement or f"import {args.module}"
+    print(f"$ python -X importtime -c {statement!r}\n")
+    print_report(run_importtime(statement), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -35,12 +35,216 @@ class Settings:
     
     # Similar Hotels Settings
     MAX_SIMILAR_HOTELS: int = int(os.getenv("MAX_SIMILAR_HOTELS", "10"))
+    # CLIP micro-batching (utils/batching.py): crops from concurrent searches
+    # share one forward pass of at most CLIP_MAX_BATCH_SIZE crops
+    CLIP_BATCHING_ENABLED: bool = os.getenv("CLIP_BATCHING_ENABLED", "True").lower() == "true"
+    CLIP_MAX_BATCH_SIZE: int = int(os.getenv("CLIP_MAX_BATCH_SIZE", "16"))
+    CLIP_MAX_WAIT_MS: float = float(os.getenv("CLIP_MAX_WAIT_MS", "10"))
+    # Uploads (utils/helpers.decode_image): larger files or images are rejected with 413.
+    # JPEGs are decoded straight to about IMAGE_DECODE_MIN_SIDE px on the shorter side,
+    # enough for CLIP's 336 px input from the tightest default crop (60%).
+    IMAGE_MAX_UPLOAD_BYTES: int = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+    IMAGE_MAX_PIXELS: int = int(os.getenv("IMAGE_MAX_PIXELS", "50000000"))
+    IMAGE_DECODE_MIN_SIDE: int = int(os.getenv("IMAGE_DECODE_MIN_SIDE", "560"))
+    # Query crops as fractional boxes "x0,y0,x1,y1;..." (image_search/visual_features.py);
+    # empty uses the whole image plus two center crops. Fewer crops are faster.
+    IMAGE_SEARCH_CROPS: str = os.getenv("IMAGE_SEARCH_CROPS", "")
+    # Nearest-neighbour index over the CLIP features (image_search/vector_index.py):
+    # "exact" (brute force), "ivf" or "faiss". Approximate indexes scan
+    # VECTOR_INDEX_NPROBE lists and fuse color scores for the best
+    # VECTOR_INDEX_CANDIDATES images only.
+    VECTOR_INDEX: str = os.getenv("VECTOR_INDEX", "exact")
+    VECTOR_INDEX_NPROBE: int = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+    VECTOR_INDEX_CANDIDATES: int = int(os.getenv("VECTOR_INDEX_CANDIDATES", "512"))
+    # Two-stage cascade: CASCADE_BACKBONE (image_search/hotel_features_ai_<backbone>.npy,
+    # written by setup_db.py) scores every image, then ViT-L re-ranks the images of the
+    # CASCADE_TOP_HOTELS best hotels using only the first CASCADE_RERANK_CROPS query crops.
+    # Takes precedence over VECTOR_INDEX.
+    CASCADE_ENABLED: bool = os.getenv("CASCADE_ENABLED", "False").lower() == "true"
+    CASCADE_BACKBONE: str = os.getenv("CASCADE_BACKBONE", "ViT-B/32")
+    CASCADE_TOP_HOTELS: int = int(os.getenv("CASCADE_TOP_HOTELS", "20"))
+    CASCADE_RERANK_CROPS: int = int(os.getenv("CASCADE_RERANK_CROPS", "1"))
+    # Text search (/api/v1/hotels/search-by-text): phrases beyond the persisted common
+    # ones (image_search/text_phrase_embeddings.npz) are kept in an LRU of this size
+    TEXT_EMBEDDING_CACHE_SIZE: int = int(os.getenv("TEXT_EMBEDDING_CACHE_SIZE", "4096"))
+    # Image search result cache keyed by a perceptual hash (utils/image_cache.py).
+    # Uploads within IMAGE_CACHE_HAMMING_RADIUS bits (of 64) reuse the cached CLIP embeddings.
+    IMAGE_CACHE_ENABLED: bool = os.getenv("IMAGE_CACHE_ENABLED", "True").lower() == "true"
+    IMAGE_CACHE_MAX_ENTRIES: int = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "1024"))
+    IMAGE_CACHE_TTL_SECONDS: float = float(os.getenv("IMAGE_CACHE_TTL_SECONDS", "3600"))
+    IMAGE_CACHE_HAMMING_RADIUS: int = int(os.getenv("IMAGE_CACHE_HAMMING_RADIUS", "6"))
     
+    # Incremental hotel preferences from /api/v1/chat/events: per-chat state kept in each
+    # worker, evicted least recently used beyond CHAT_PREFERENCES_MAX_CHATS or when idle
+    # for CHAT_PREFERENCES_TTL_SECONDS
+    CHAT_PREFERENCES_MAX_CHATS: int = int(os.getenv("CHAT_PREFERENCES_MAX_CHATS", "10000"))
+    CHAT_PREFERENCES_TTL_SECONDS: float = float(os.getenv("CHAT_PREFERENCES_TTL_SECONDS", "86400"))
+
     # Azure OpenAI Configuration
     AZURE_OPENAI_API_KEY: str = os.getenv("AZURE_OPENAI_API_KEY", "")
     AZURE_OPENAI_ENDPOINT: str = os.getenv("AZURE_OPENAI_ENDPOINT", "")
     AZURE_OPENAI_API_VERSION: str = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
     AZURE_CHAT_DEPLOYMENT: str = os.getenv("AZURE_CHAT_DEPLOYMENT", "")
 
+    # Service Worker Pools: (workers, queue depth) per service
+    SERVICE_POOLS: dict = {
+        "image": (
+            # Batching needs several searches in flight to form batches
+            int(os.getenv("IMAGE_POOL_WORKERS", "4" if CLIP_BATCHING_ENABLED else "1")),
+            int(os.getenv("IMAGE_POOL_QUEUE_DEPTH", "8")),
+        ),
+        "moderation": (
+            int(os.getenv("MODERATION_POOL_WORKERS", "4")),
+            int(os.getenv("MODERATION_POOL_QUEUE_DEPTH", "32")),
+        ),
+        "activities": (
+            int(os.getenv("ACTIVITIES_POOL_WORKERS", "2")),
+            int(os.getenv("ACTIVITIES_POOL_QUEUE_DEPTH", "16")),
+        ),
+        "itinerary": (
+            int(os.getenv("ITINERARY_POOL_WORKERS", "1")),
+            int(os.getenv("ITINERARY_POOL_QUEUE_DEPTH", "4")),
+        ),
+        "summarizer": (
+            int(os.getenv("SUMMARIZER_POOL_WORKERS", "2")),
+            int(os.getenv("SUMMARIZER_POOL_QUEUE_DEPTH", "8")),
+        ),
+        "recommendation": (
+            int(os.getenv("RECOMMENDATION_POOL_WORKERS", "1")),
+            int(os.getenv("RECOMMENDATION_POOL_QUEUE_DEPTH", "8")),
+        ),
+        "sentiment": (
+            int(os.getenv("SENTIMENT_POOL_WORKERS", "1")),
+            int(os.getenv("SENTIMENT_POOL_QUEUE_DEPTH", "16")),
+        ),
+    }
+    POOL_RETRY_AFTER_SECONDS: int = int(os.getenv("POOL_RETRY_AFTER_SECONDS", "2"))
+
+    # Startup Warm-up: services loaded in parallel before /ready reports ready
+    # ("none" keeps every service lazy)
+    WARMUP_SERVICES: list = [
+        s.strip() for s in os.getenv("WARMUP_SERVICES", "image,activities,recommendation,moderation").split(",")
+        if s.strip() and s.strip() != "none"
+    ]
+
+    # Pre-fork Supervisor (supervisor.py)
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    FEATURES_MMAP: bool = os.getenv("FEATURES_MMAP", "True").lower() == "true"
+    # Hotel feature matrices as float32, float16 or int8 (image_search/feature_store.py)
+    FEATURES_PRECISION: str = os.getenv("FEATURES_PRECISION", "float32")
+
+    # Torch CPU Runtime Profiles (utils/runtime_profile.py)
+    # Intra-op threads per service; 0 keeps torch's default (all cores)
+    TORCH_THREADS: dict = {
+        "image": int(os.getenv("TORCH_IMAGE_THREADS", "0")),
+        "activities": int(os.getenv("TORCH_ACTIVITIES_THREADS", "0")),
+        "llm": int(os.getenv("TORCH_LLM_THREADS", "0")),
+        "sentiment": int(os.getenv("TORCH_SENTIMENT_THREADS", "0")),
+    }
+    TORCH_INTEROP_THREADS: int = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+    TORCH_INFERENCE_MODE: bool = os.getenv("TORCH_INFERENCE_MODE", "True").lower() == "true"
+    TORCH_CHANNELS_LAST: bool = os.getenv("TORCH_CHANNELS_LAST", "False").lower() == "true"
+    # Comma-separated services to run under bf16 autocast / int8 dynamic quantization
+    TORCH_BF16_SERVICES: list = [s.strip() for s in os.getenv("TORCH_BF16_SERVICES", "").split(",") if s.strip()]
+    TORCH_INT8_SERVICES: list = [s.strip() for s in os.getenv("TORCH_INT8_SERVICES", "").split(",") if s.strip()]
+
+
+    # Tracing and Slow-request Log (utils/tracing.py)
+    # Fraction of requests whose span tree is recorded (0 disables tracing, 1 traces all)
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    SLOW_REQUEST_THRESHOLD_MS: int = int(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+    # Empty disables the slow-request log
+    SLOW_REQUEST_LOG_PATH: str = os.getenv("SLOW_REQUEST_LOG_PATH", "logs/slow_requests.jsonl")
+    # Also print trace events to stdout (the old debug output)
+    TRACE_PRINT_EVENTS: bool = os.getenv("TRACE_PRINT_EVENTS", "False").lower() == "true"
+
+
+    # Admin Profiling Endpoints (/admin/*); empty ADMIN_TOKEN disables them
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    PROFILE_OUTPUT_DIR: str = os.getenv("PROFILE_OUTPUT_DIR", "logs/profiles")
+    PROFILE_MAX_SECONDS: int = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    PROFILE_MAX_REQUESTS: int = int(os.getenv("PROFILE_MAX_REQUESTS", "100"))
+
+
+    # Model Artifact Cache (utils/model_registry.py, models_cli.py)
+    # Empty keeps downloading from the hubs on first use
+    MODEL_CACHE_DIR: str = os.getenv("MODEL_CACHE_DIR", "")
+    # Force the hubs offline when loading from the cache
+    MODELS_OFFLINE: bool = os.getenv("MODELS_OFFLINE", "True" if MODEL_CACHE_DIR else "False").lower() == "true"
+    # Services whose models `models_cli.py prefetch` downloads by default
+    MODEL_SERVICES: list = [
+        s.strip() for s in os.getenv("MODEL_SERVICES", "image,activities,itinerary,sentiment").split(",") if s.strip()
+    ]
+
+
+    # Admission Control (utils/admission.py)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    # Per priority class: (max concurrent, max queued, max queue wait in ms,
+    # CPU utilization 0-1 at which the class is shed; None never sheds)
+    ADMISSION_CLASSES: dict = {
+        "critical": (
+            int(os.getenv("ADMISSION_CRITICAL_CONCURRENCY", "32")),
+            int(os.getenv("ADMISSION_CRITICAL_QUEUE", "64")),
+            int(os.getenv("ADMISSION_CRITICAL_MAX_WAIT_MS", "2000")),
+            None,
+        ),
+        "interactive": (
+            int(os.getenv("ADMISSION_INTERACTIVE_CONCURRENCY", "16")),
+            int(os.getenv("ADMISSION_INTERACTIVE_QUEUE", "32")),
+            int(os.getenv("ADMISSION_INTERACTIVE_MAX_WAIT_MS", "1000")),
+            float(os.getenv("ADMISSION_INTERACTIVE_SHED_CPU", "0.97")),
+        ),
+        "batch": (
+            int(os.getenv("ADMISSION_BATCH_CONCURRENCY", "4")),
+            int(os.getenv("ADMISSION_BATCH_QUEUE", "8")),
+            int(os.getenv("ADMISSION_BATCH_MAX_WAIT_MS", "500")),
+            float(os.getenv("ADMISSION_BATCH_SHED_CPU", "0.85")),
+        ),
+    }
+    # Route template -> priority class; other routed requests use the default.
+    # ADMISSION_ROUTES adds or overrides entries: "/api/v1/hotels/similar=interactive,..."
+    ADMISSION_ROUTE_CLASSES: dict = {
+        "/api/v1/moderation/check": "critical",
+        "/api/v1/moderation/batch": "critical",
+        "/api/v1/hotels/similar": "batch",
+        "/api/v1/hotels/search-by-text": "batch",
+        "/api/v1/activities/itinerary/generate": "batch",
+        **dict(
+            entry.strip().split("=", 1) for entry in os.getenv("ADMISSION_ROUTES", "").split(",") if "=" in entry
+        ),
+    }
+    ADMISSION_DEFAULT_CLASS: str = os.getenv("ADMISSION_DEFAULT_CLASS", "interactive")
+    # Never queued or shed: probes, metrics, docs and the admin endpoints
+    ADMISSION_EXEMPT_PATHS: list = [
+        p.strip() for p in os.getenv("ADMISSION_EXEMPT_PATHS", "/,/health,/ready,/metrics,/docs,/openapi.json,/admin").split(",")
+        if p.strip()
+    ]
+    ADMISSION_RETRY_AFTER_SECONDS: int = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+    ADMISSION_CPU_SAMPLE_SECONDS: float = float(os.getenv("ADMISSION_CPU_SAMPLE_SECONDS", "1.0"))
+
+
+    # Request Coalescing (utils/coalesce.py)
+    # Identical in-flight requests share one computation
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "True").lower() == "true"
+    # How long results of requests sent with an Idempotency-Key are kept for retries
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "120"))
+    IDEMPOTENCY_MAX_KEYS: int = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "1024"))
+
+
+    # Graceful Degradation (utils/degradation.py)
+    # Step pipelines down to cheaper quality tiers when their pool queue fills
+    # past DEGRADE_QUEUE_RATIO or their recent p95 latency exceeds the limit
+    DEGRADATION_ENABLED: bool = os.getenv("DEGRADATION_ENABLED", "True").lower() == "true"
+    DEGRADE_QUEUE_RATIO: float = float(os.getenv("DEGRADE_QUEUE_RATIO", "0.5"))
+    DEGRADE_IMAGE_P95_MS: int = int(os.getenv("DEGRADE_IMAGE_P95_MS", "4000"))
+    DEGRADE_ITINERARY_P95_MS: int = int(os.getenv("DEGRADE_ITINERARY_P95_MS", "30000"))
+    DEGRADE_WINDOW_SECONDS: float = float(os.getenv("DEGRADE_WINDOW_SECONDS", "60"))
+    DEGRADE_EVAL_SECONDS: float = float(os.getenv("DEGRADE_EVAL_SECONDS", "5"))
+    DEGRADE_RECOVERY_SECONDS: float = float(os.getenv("DEGRADE_RECOVERY_SECONDS", "30"))
+    # Pin pipelines to a tier, e.g. "image_search=single_crop,itinerary=deterministic"
+    DEGRADE_FORCE_TIERS: dict = dict(
+        entry.strip().split("=", 1) for entry in os.getenv("DEGRADE_FORCE_TIERS", "").split(",") if "=" in entry
+    )
+
 
 settings = Settings()
@@ -1,13 +1,17 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, APIRouter, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, FileResponse
+from starlette.routing import Match
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
 from typing import List, Optional
-import uvicorn
 import sys
 import os
+import asyncio
+import secrets
+import threading
+import time
 from pathlib import Path
-from PIL import Image
-import io
 
 # Ensure we can import from services
 current_dir = Path(__file__).parent.absolute()
@@ -15,6 +19,18 @@ if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
 
 from config import settings
+from utils.model_registry import configure_environment
+
+# Point model loaders at MODEL_CACHE_DIR before any hub library is imported
+configure_environment()
+from utils.dispatch import build_dispatcher, PoolSaturatedError
+from utils.admission import build_admission_controller, AdmissionRejectedError
+from utils.coalesce import RequestCoalescer, IdempotencyKeyConflictError, canonical_key, bytes_key
+from utils.degradation import build_degradation_controller
+from utils.readiness import ReadinessRegistry
+from utils import metrics
+from utils import tracing
+from utils import profiling
 
 # Lazy import services to avoid issues with uvicorn reload
 def get_hotel_recommendation_service():
@@ -37,11 +53,25 @@ def get_activity_recommendation_service():
     from services.activity_recommendation_service import ActivityRecommendationService
     return ActivityRecommendationService()
 
+def get_sentiment_analysis_service():
+    """Lazy import for sentiment analysis service"""
+    from services.sentiment_analysis_service import SentimentAnalysisService
+    return SentimentAnalysisService()
+
 # Initialize services
 hotel_recommendation_service = None
 image_search_service = None
 moderation_service = None
 activity_recommendation_service = None
+sentiment_analysis_service = None
+
+# Services now load from pool threads, so guard each one against double loading
+_init_locks = {
+    "hotel_recommendation": threading.Lock(),
+    "image_search": threading.Lock(),
+    "activity_recommendation": threading.Lock(),
+    "sentiment_analysis": threading.Lock(),
+}
 
 def init_services():
     """Initialize all services (legacy helper)."""
@@ -53,33 +83,134 @@ def init_services():
 def init_hotel_recommendation_service():
     """Initialize hotel recommendation service on first use."""
     global hotel_recommendation_service
-    if hotel_recommendation_service is None:
-        hotel_recommendation_service = get_hotel_recommendation_service()
+    with _init_locks["hotel_recommendation"]:
+        if hotel_recommendation_service is None:
+            hotel_recommendation_service = get_hotel_recommendation_service()
 
 def init_image_search_service():
     """Initialize image search service on first use."""
     global image_search_service
-    if image_search_service is None:
-        image_search_service = get_image_search_service()
+    with _init_locks["image_search"]:
+        if image_search_service is None:
+            image_search_service = get_image_search_service()
 
 def init_moderation_service():
     """Initialize moderation service on first use."""
     global moderation_service
     if moderation_service is None:
         moderation_service = get_moderation_service()
-    if activity_recommendation_service is None:
-        activity_recommendation_service = get_activity_recommendation_service()
 
 def init_activity_recommendation_service():
     """Initialize activity recommendation service on first use."""
     global activity_recommendation_service
+    with _init_locks["activity_recommendation"]:
+        if activity_recommendation_service is None:
+            activity_recommendation_service = get_activity_recommendation_service()
+
+def init_sentiment_analysis_service():
+    """Initialize sentiment analysis service on first use."""
+    global sentiment_analysis_service
+    with _init_locks["sentiment_analysis"]:
+        if sentiment_analysis_service is None:
+            sentiment_analysis_service = get_sentiment_analysis_service()
+
+def warm_image_search_service():
+    """Load the image search service and start its batchers, so a failed one marks it not ready."""
+    init_image_search_service()
+    image_search_service.start_batchers()
+
+def warm_sentiment_analysis_service():
+    """Load the sentiment service and its model."""
+    init_sentiment_analysis_service()
+    sentiment_analysis_service.warm_up()
+
+def warm_activity_recommendation_service():
+    """Load the activity service and its search model (cart-only use skips the model)."""
+    init_activity_recommendation_service()
+    activity_recommendation_service.warm_up()
+
+# Per-service worker pools for blocking model and subprocess work
+dispatcher = build_dispatcher(settings)
+metrics.register_pool_collector(dispatcher)
+
+# Priority classes with their own concurrency limits, in front of the pools
+admission = build_admission_controller(settings)
+metrics.register_admission_collector(admission)
+
+# Cheaper quality tiers for image search and itineraries when their pools back up
+degradation = build_degradation_controller(settings, dispatcher)
+metrics.register_degradation_collector(degradation)
+
+
+async def run_degradable(pipeline: str, pool_name: str, fn, *args, **kwargs):
+    """Run a pipeline at its current quality tier; returns (result, tier)."""
+    tier = degradation.tier(pipeline)
+    started = time.perf_counter()
+    result = await run_blocking(pool_name, fn, *args, quality_tier=tier, **kwargs)
+    degradation.observe(pipeline, time.perf_counter() - started)
+    metrics.quality_tier_responses_total.inc(pipeline=pipeline, tier=tier)
+    trace = tracing.current_trace()
+    if trace is not None:
+        trace.root.set(quality_tier=tier)
+    return result, tier
+
+# Identical in-flight requests share one computation; Idempotency-Key retries replay it
+coalescer = RequestCoalescer(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_MAX_KEYS)
+
+
+async def run_coalesced(route: str, key: str, compute, response: Response, idempotency_key: Optional[str] = None):
+    """Run compute() once for concurrent identical requests; marks shared results in X-Coalesced."""
+    if not settings.COALESCE_ENABLED:
+        return await compute()
+    try:
+        result, outcome = await coalescer.run(route, key, compute, idempotency_key)
+    except IdempotencyKeyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    metrics.coalesced_requests_total.inc(route=route, outcome=outcome)
+    if outcome != "leader":
+        response.headers["X-Coalesced"] = outcome
+        tracing.event("coalesced request", outcome=outcome)
+    return result
+
+
+async def run_blocking(pool_name: str, fn, *args, **kwargs):
+    """Run blocking service work on its pool, rejecting with 503 when saturated."""
+    try:
+        return await dispatcher.run(pool_name, fn, *args, **kwargs)
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service busy: {e.pool_name} queue is full, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+# Warm-up loaders, keyed by the names used in WARMUP_SERVICES
+readiness = ReadinessRegistry()
+readiness.register("image", warm_image_search_service)
+readiness.register("activities", warm_activity_recommendation_service)
+readiness.register("recommendation", init_hotel_recommendation_service)
+readiness.register("moderation", init_moderation_service)
+readiness.register("sentiment", warm_sentiment_analysis_service)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load selected models in the background; /ready reports when they are warm
+    readiness.start(settings.WARMUP_SERVICES)
+    yield
+    dispatcher.shutdown()
+
+
+async def ensure_activity_recommendation_service():
+    """Load the activity service on its pool; a no-op once it is loaded."""
     if activity_recommendation_service is None:
-        activity_recommendation_service = get_activity_recommendation_service()
+        await run_blocking("activities", init_activity_recommendation_service)
 
 app = FastAPI(
     title="AI Microservice",
     description="AI-powered features for hotel search, chat summarization, and content moderation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - configure with your frontend URL
@@ -92,7 +223,125 @@ app.add_middleware(
 )
 
 
-# Services will be initialized on first request
+def is_admission_exempt(route_path: str) -> bool:
+    """Exempt paths match exactly or as a prefix ("/admin" covers "/admin/memory")."""
+    return any(
+        route_path == path or (path != "/" and route_path.startswith(path + "/"))
+        for path in settings.ADMISSION_EXEMPT_PATHS
+    )
+
+
+@app.middleware("http")
+async def admit_request(request: Request, call_next):
+    """Queue or shed requests by the priority class of their route."""
+    route = match_route(request)
+    if not settings.ADMISSION_ENABLED or route is None or is_admission_exempt(route.path):
+        return await call_next(request)
+
+    started = time.perf_counter()
+    try:
+        async with admission.admit(route.path) as priority:
+            waited = time.perf_counter() - started
+            metrics.admission_wait_duration.observe(waited, priority=priority.name)
+            trace = tracing.current_trace()
+            if trace is not None:
+                trace.root.set(priority=priority.name, admission_wait_ms=round(waited * 1000, 3))
+            return await call_next(request)
+    except AdmissionRejectedError as e:
+        # Label the rejection with its route template, as routing would have
+        request.scope["route"] = route
+        tracing.event("admission rejected", priority=e.priority, reason=e.reason)
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Service busy: {e.priority} requests are being shed ({e.reason}), please retry"},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and time them per route template (not per raw path)."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        metrics.http_requests_total.inc(method=request.method, route=route_path, status=str(status))
+        metrics.http_request_duration.observe(
+            time.perf_counter() - started, method=request.method, route=route_path
+        )
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """Propagate X-Request-ID, record the span tree and log slow requests."""
+    request_id = tracing.new_request_id(request.headers.get(tracing.REQUEST_ID_HEADER))
+    sampled = tracing.should_sample()
+    status = 500
+    with tracing.start_trace(request_id, f"{request.method} {request.url.path}", sampled) as trace:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            if trace is not None:
+                trace.root.set(status=status)
+                if tracing.is_slow(trace):
+                    trace.finish()
+                    log_slow_request(request, trace, status)
+    response.headers[tracing.REQUEST_ID_HEADER] = request_id
+    return response
+
+
+def match_route(request: Request):
+    """Route a request will be dispatched to, before routing runs (None if unmatched)."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+
+def match_route_path(request: Request) -> str:
+    """Route template a request will be dispatched to, before routing runs."""
+    route = match_route(request)
+    return route.path if route is not None else request.url.path
+
+
+@app.middleware("http")
+async def profile_matching_requests(request: Request, call_next):
+    """Hand requests to an armed /admin/profile/requests session for their route."""
+    if not profiling.route_profiler.armed():
+        return await call_next(request)
+    session = profiling.route_profiler.claim(match_route_path(request))
+    if session is None:
+        return await call_next(request)
+
+    token = profiling.activate_request_profile(session)
+    try:
+        return await call_next(request)
+    finally:
+        profiling.deactivate_request_profile(token)
+        # The last request merges and writes the pstats file
+        await asyncio.get_running_loop().run_in_executor(None, session.request_finished)
+
+
+def log_slow_request(request: Request, trace, status: int):
+    """Write a slow request's span tree, labelled with its route template."""
+    route = request.scope.get("route")
+    tracing.write_slow_request(
+        trace,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        path=request.url.path,
+        status=status
+    )
+
+
+# Services selected in WARMUP_SERVICES load at startup; the rest on first request
 
 # Request/Response Models
 class SimilarHotelsRequest(BaseModel):
@@ -100,6 +349,14 @@ class SimilarHotelsRequest(BaseModel):
     image_base64: Optional[str] = None
 
 
+class TextSearchRequest(BaseModel):
+    query: str
+    top_k: int = 3
+    max_price: Optional[int] = None
+    min_stars: Optional[int] = None
+    hotel_ids: Optional[List[int]] = None
+
+
 class HotelResult(BaseModel):
     hotel_id: str
     name: str
@@ -115,11 +372,13 @@ class HotelResult(BaseModel):
 class SimilarHotelsResponse(BaseModel):
     similar_hotels: List[HotelResult]
     total_results: int
+    quality_tier: str = "full"  # Lower under load: "single_crop" or "color_only"
 
 
 class HotelRecommendationRequest(BaseModel):
     messages: List[dict]  # List of {"user_id": str, "text": str}
     limit: Optional[int] = 5
+    chat_id: Optional[str] = None  # Use the chat's preferences from /api/v1/chat/events when up to date
 
 
 class HotelRecommendationResponse(BaseModel):
@@ -177,11 +436,50 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe for the load balancer.
+    Returns 200 once every warm-up service is loaded, 503 while loading or after a failure.
+    """
+    snapshot = readiness.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint: request, stage, pool and cache metrics."""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def decode_and_search_similar(image_data: bytes, **search_kwargs):
+    """Blocking job for /hotels/similar: decode the upload, then search with it."""
+    # PIL loads on first use so deployments without image search don't import it
+    from utils.helpers import decode_image, ImageTooLargeError
+    
+    try:
+        with metrics.stage_timer("image_decode"):
+            pil_image = decode_image(
+                image_data, settings.IMAGE_DECODE_MIN_SIDE,
+                settings.IMAGE_MAX_UPLOAD_BYTES, settings.IMAGE_MAX_PIXELS
+            )
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
+    return image_search_service.search_similar_hotels(pil_image, **search_kwargs)
+
+
 # 1. AI-based Similar Hotels Search (Image Search)
 @app.post("/api/v1/hotels/similar", response_model=SimilarHotelsResponse)
 async def find_similar_hotels(
+    response: Response,
     image: Optional[UploadFile] = File(None),
-    request: Optional[SimilarHotelsRequest] = None
+    request: Optional[SimilarHotelsRequest] = None,
+    max_price: Optional[int] = Query(None, ge=0, description="Only hotels priced at most this"),
+    min_stars: Optional[int] = Query(None, ge=1, le=5, description="Only hotels with at least this many stars"),
+    hotel_ids: Optional[List[int]] = Query(None, description="Only these hotels (repeat the parameter)"),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Find similar hotels based on an uploaded image.
@@ -189,53 +487,131 @@ async def find_similar_hotels(
     
     Example:
     - Upload an image file via multipart/form-data
-    - Returns top 3 similar hotels with similarity scores
+    - Optionally filter with ?max_price=8000&min_stars=4 (or hotel_ids=1&hotel_ids=2)
+    - Returns top 3 similar hotels with similarity scores, among those passing the filters
     """
     try:
-        init_image_search_service()
-        
         if image is None:
             raise HTTPException(status_code=400, detail="Image file is required")
         
-        # Read image
-        image_data = await image.read()
-        try:
-            pil_image = Image.open(io.BytesIO(image_data)).convert("RGB")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
+        # Read image; one byte past the limit is enough to reject it
+        image_data = await image.read(settings.IMAGE_MAX_UPLOAD_BYTES + 1)
         
-        # Search for similar hotels
-        results = image_search_service.search_similar_hotels(pil_image, top_k=3)
-        
-        # Format response
-        hotel_results = [
-            HotelResult(
-                hotel_id=result["hotel_id"],
-                name=result["name"],
-                similarity_score=result["similarity_score"],
-                stars=result.get("stars"),
-                price=result.get("price"),
-                description=result.get("description"),
-                best_match_image_path=result.get("best_match_image_path"),
-                score_breakdown=result.get("score_breakdown")
+        async def search():
+            # Decode and search in one job on the image pool, off the event loop
+            if image_search_service is None:
+                await run_blocking("image", init_image_search_service)
+            results, quality_tier = await run_degradable(
+                "image_search", "image", decode_and_search_similar, image_data, top_k=3,
+                max_price=max_price, min_stars=min_stars, hotel_ids=hotel_ids
+            )
+            
+            # Format response
+            hotel_results = [
+                HotelResult(
+                    hotel_id=result["hotel_id"],
+                    name=result["name"],
+                    similarity_score=result["similarity_score"],
+                    stars=result.get("stars"),
+                    price=result.get("price"),
+                    description=result.get("description"),
+                    best_match_image_path=result.get("best_match_image_path"),
+                    score_breakdown=result.get("score_breakdown")
+                )
+                for result in results
+            ]
+            
+            return SimilarHotelsResponse(
+                similar_hotels=hotel_results,
+                total_results=len(hotel_results),
+                quality_tier=quality_tier
             )
-            for result in results
-        ]
         
-        return SimilarHotelsResponse(
-            similar_hotels=hotel_results,
-            total_results=len(hotel_results)
-        )
+        # Re-uploads of the same photo (with the same filters) share one decode and CLIP pass
+        route = "/api/v1/hotels/similar"
+        key = bytes_key(route, image_data)
+        if max_price is not None or min_stars is not None or hotel_ids is not None:
+            key = canonical_key(route, {
+                "image": key, "max_price": max_price, "min_stars": min_stars, "hotel_ids": hotel_ids
+            })
+        return await run_coalesced(route, key, search, response, idempotency_key)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
+# 1b. Text-to-Image Hotel Search
+@app.post("/api/v1/hotels/search-by-text", response_model=SimilarHotelsResponse)
+async def search_hotels_by_text(
+    request: TextSearchRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Find hotels whose photos match a text description.
+    
+    Request body:
+    {
+        "query": "infinity pool with sea view",
+        "top_k": 3,
+        "max_price": 15000,
+        "min_stars": 4
+    }
+    """
+    try:
+        if not request.query.strip():
+            raise HTTPException(status_code=400, detail="Query must not be empty")
+        if not 1 <= request.top_k <= 20:
+            raise HTTPException(status_code=400, detail="top_k must be between 1 and 20")
+        if request.max_price is not None and request.max_price < 0:
+            raise HTTPException(status_code=400, detail="max_price must be non-negative")
+        if request.min_stars is not None and not 1 <= request.min_stars <= 5:
+            raise HTTPException(status_code=400, detail="min_stars must be between 1 and 5")
+        
+        async def search():
+            if image_search_service is None:
+                await run_blocking("image", init_image_search_service)
+            results = await run_blocking(
+                "image", image_search_service.search_by_text, request.query, top_k=request.top_k,
+                max_price=request.max_price, min_stars=request.min_stars, hotel_ids=request.hotel_ids
+            )
+            hotel_results = [
+                HotelResult(
+                    hotel_id=result["hotel_id"],
+                    name=result["name"],
+                    similarity_score=result["similarity_score"],
+                    stars=result.get("stars"),
+                    price=result.get("price"),
+                    description=result.get("description"),
+                    best_match_image_path=result.get("best_match_image_path"),
+                    score_breakdown=result.get("score_breakdown")
+                )
+                for result in results
+            ]
+            return SimilarHotelsResponse(similar_hotels=hotel_results, total_results=len(hotel_results))
+        
+        route = "/api/v1/hotels/search-by-text"
+        key = canonical_key(route, request.dict())
+        return await run_coalesced(route, key, search, response, idempotency_key)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching by text: {str(e)}")
+
+
 # 2. Hotel Recommendations from Chat (Hotel Recommendation Service)
 @app.post("/api/v1/hotels/recommend", response_model=HotelRecommendationResponse)
-async def recommend_hotels_from_chat(request: HotelRecommendationRequest):
+async def recommend_hotels_from_chat(
+    request: HotelRecommendationRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Get hotel recommendations based on chat messages.
     Extracts preferences from chat and returns personalized hotel recommendations.
+    With a chat_id, the preferences kept from /api/v1/chat/events are used when
+    they include the last of the messages; otherwise they come from the messages.
     
     Request body:
     {
@@ -244,18 +620,37 @@ async def recommend_hotels_from_chat(request: HotelRecommendationRequest):
             {"user_id": "u2", "text": "I saw one for 40k but that is too costly."},
             {"user_id": "u3", "text": "Yeah, 20k should be the limit."}
         ],
-        "limit": 5
+        "limit": 5,
+        "chat_id": "chat_123"
     }
     """
     try:
-        init_hotel_recommendation_service()
-        
-        result = hotel_recommendation_service.get_recommendations_from_chat(
-            messages=request.messages,
-            limit=request.limit or 5
-        )
+        async def recommend():
+            if hotel_recommendation_service is None:
+                await run_blocking("recommendation", init_hotel_recommendation_service)
+            
+            if request.chat_id:
+                result = await run_blocking(
+                    "recommendation",
+                    hotel_recommendation_service.get_recommendations_for_chat,
+                    request.chat_id,
+                    messages=request.messages,
+                    limit=request.limit or 5
+                )
+            else:
+                result = await run_blocking(
+                    "recommendation",
+                    hotel_recommendation_service.get_recommendations_from_chat,
+                    messages=request.messages,
+                    limit=request.limit or 5
+                )
+            return HotelRecommendationResponse(**result)
         
-        return HotelRecommendationResponse(**result)
+        route = "/api/v1/hotels/recommend"
+        key = canonical_key(route, request.dict())
+        return await run_coalesced(route, key, recommend, response, idempotency_key)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting recommendations: {str(e)}")
 
@@ -288,7 +683,11 @@ async def summarize_chat(request: ChatSummarizationRequest):
 
 # 2b. Chat Summarization from Messages List
 @app.post("/api/v1/chat/summarize-messages", response_model=ChatSummarizationResponse)
-async def summarize_chat_messages(request: ChatSummarizationMessagesRequest):
+async def summarize_chat_messages(
+    request: ChatSummarizationMessagesRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Summarize a list of chat messages directly.
     
@@ -307,16 +706,21 @@ async def summarize_chat_messages(request: ChatSummarizationMessagesRequest):
         if not request.messages or len(request.messages) == 0:
             raise HTTPException(status_code=400, detail="Messages list cannot be empty")
         
-        # Initialize chat summarizer service
-        summarizer = ChatSummarizerService()
-        result = summarizer.summarize_messages(request.messages)
+        async def summarize():
+            # Initialize chat summarizer service
+            summarizer = ChatSummarizerService()
+            result = await run_blocking("summarizer", summarizer.summarize_messages, request.messages)
+            
+            return ChatSummarizationResponse(
+                summary=result.get("summary", ""),
+                key_points=result.get("key_points", []),
+                message_count=result.get("message_count", len(request.messages)),
+                date_range=result.get("date_range")
+            )
         
-        return ChatSummarizationResponse(
-            summary=result.get("summary", ""),
-            key_points=result.get("key_points", []),
-            message_count=result.get("message_count", len(request.messages)),
-            date_range=result.get("date_range")
-        )
+        route = "/api/v1/chat/summarize-messages"
+        key = canonical_key(route, request.dict())
+        return await run_coalesced(route, key, summarize, response, idempotency_key)
     except HTTPException:
         raise
     except Exception as e:
@@ -334,7 +738,9 @@ async def moderate_content(request: ContentModerationRequest):
         init_moderation_service()
         
         # Call the actual moderation service
-        result = moderation_service.moderate_content(
+        result = await run_blocking(
+            "moderation",
+            moderation_service.moderate_content,
             content=request.content,
             user_id=request.user_id,
             message_id=request.message_id,
@@ -342,6 +748,8 @@ async def moderate_content(request: ContentModerationRequest):
         )
         
         return ContentModerationResponse(**result)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error moderating content: {str(e)}")
 
@@ -356,16 +764,22 @@ async def moderate_content_batch(requests: List[ContentModerationRequest]):
         # Initialize moderation service if needed
         init_moderation_service()
         
-        results = []
-        for request in requests:
-            result = moderation_service.moderate_content(
-                content=request.content,
-                user_id=request.user_id,
-                message_id=request.message_id,
-                chat_type="city"
-            )
-            results.append(ContentModerationResponse(**result))
-        return results
+        def moderate_all():
+            return [
+                moderation_service.moderate_content(
+                    content=request.content,
+                    user_id=request.user_id,
+                    message_id=request.message_id,
+                    chat_type="city"
+                )
+                for request in requests
+            ]
+        
+        # One pool slot for the whole batch so a large batch cannot flood the queue
+        results = await run_blocking("moderation", moderate_all)
+        return [ContentModerationResponse(**result) for result in results]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in batch moderation: {str(e)}")
 
@@ -456,6 +870,7 @@ class Itinerary(BaseModel):
     days: List[ItineraryDay]
     hotels: Optional[List[SelectedHotel]] = []
     num_people: int
+    quality_tier: str = "full"  # Lower under load: "no_local_llm" or "deterministic"
 
 
 class MyLensPlace(BaseModel):
@@ -488,9 +903,11 @@ async def process_activity_message(request: ProcessMessageRequest):
     }
     """
     try:
-        init_activity_recommendation_service()
+        await ensure_activity_recommendation_service()
         
-        result = activity_recommendation_service.process_message(
+        result = await run_blocking(
+            "activities",
+            activity_recommendation_service.process_message,
             chat_id=request.chat_id,
             user=request.user,
             message=request.message
@@ -501,6 +918,8 @@ async def process_activity_message(request: ProcessMessageRequest):
             recommendations=[ActivityPlace(**rec) for rec in result["recommendations"]],
             trigger_rec=result["trigger_rec"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
 
@@ -525,16 +944,20 @@ async def search_activities(request: SearchRequest):
     }
     """
     try:
-        init_activity_recommendation_service()
+        await ensure_activity_recommendation_service()
         
         # Access the search engine directly from the service
-        recommendations = activity_recommendation_service.search_engine.search(
+        recommendations = await run_blocking(
+            "activities",
+            activity_recommendation_service.search_engine.search,
             query=request.query,
             top_k=request.top_k,
             exclude_names=request.exclude_names
         )
         
         return [ActivityPlace(**rec) for rec in recommendations]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching activities: {str(e)}")
 
@@ -552,7 +975,7 @@ async def remove_activity_from_cart(request: AddToCartRequest):
     }
     """
     try:
-        init_activity_recommendation_service()
+        await ensure_activity_recommendation_service()
         
         result = activity_recommendation_service.remove_from_cart(
             chat_id=request.chat_id,
@@ -582,7 +1005,7 @@ async def add_activity_to_cart(request: AddToCartRequest):
     }
     """
     try:
-        init_activity_recommendation_service()
+        await ensure_activity_recommendation_service()
         
         result = activity_recommendation_service.add_to_cart(
             chat_id=request.chat_id,
@@ -608,10 +1031,12 @@ async def get_activity_cart(chat_id: str):
     Returns the list of activities added to the cart along with settings (num_days, num_people).
     """
     try:
-        init_activity_recommendation_service()
+        await ensure_activity_recommendation_service()
         
         cart_data = activity_recommendation_service.get_cart(chat_id)
         return Cart(**cart_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting cart: {str(e)}")
 
@@ -629,7 +1054,7 @@ async def update_activity_cart_settings(request: UpdateCartSettingsRequest):
     }
     """
     try:
-        init_activity_recommendation_service()
+        await ensure_activity_recommendation_service()
         
         result = activity_recommendation_service.update_cart_settings(
             chat_id=request.chat_id,
@@ -637,6 +1062,8 @@ async def update_activity_cart_settings(request: UpdateCartSettingsRequest):
             num_people=request.num_people
         )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating cart settings: {str(e)}")
 
@@ -644,7 +1071,9 @@ async def update_activity_cart_settings(request: UpdateCartSettingsRequest):
 @app.post("/api/v1/activities/itinerary/generate", response_model=Itinerary)
 async def generate_activity_itinerary(
     request: GenerateItineraryRequest,
-    chat_id: str = Query(..., description="The chat ID for which to generate the itinerary")
+    response: Response,
+    chat_id: str = Query(..., description="The chat ID for which to generate the itinerary"),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Generate an itinerary using Azure OpenAI with activities, hotels, and myLens data.
@@ -664,35 +1093,47 @@ async def generate_activity_itinerary(
     - mylens_data: List of places from myLens (user's interests)
     """
     try:
-        init_activity_recommendation_service()
+        await ensure_activity_recommendation_service()
         
         # Convert Pydantic models to dict for service
         hotels_in_cart = [h.dict() for h in request.hotels_in_cart]
         mylens_data = [p.dict() for p in request.mylens_data]
         
-        print(f"[API] Generating itinerary with {len(hotels_in_cart)} hotels and {len(mylens_data)} myLens places")
-        
-        result = activity_recommendation_service.generate_itinerary(
-            chat_id, 
-            hotels_in_cart=hotels_in_cart,
-            mylens_data=mylens_data
-        )
-        
-        if result.get("status") == "error":
-            raise HTTPException(status_code=400, detail=result.get("error", "Failed to generate itinerary"))
-        
-        # Debug: Log what we're about to serialize
-        print(f"[API] About to return itinerary with {len(result.get('days', []))} days")
-        print(f"[API] Day numbers in result: {[d.get('day') for d in result.get('days', [])]}")
-        print(f"[API] Selected hotels: {len(result.get('hotels', []))} out of {len(hotels_in_cart)} in cart")
-        
-        itinerary_obj = Itinerary(**result)
-        
-        # Debug: Log after Pydantic serialization
-        print(f"[API] After Pydantic: {[d.day for d in itinerary_obj.days]}")
-        print(f"[API] Hotels in response: {[h.name for h in itinerary_obj.hotels]}")
+        async def generate():
+            tracing.event("Generating itinerary", hotels=len(hotels_in_cart), mylens_places=len(mylens_data))
+            
+            result, quality_tier = await run_degradable(
+                "itinerary",
+                "itinerary",
+                activity_recommendation_service.generate_itinerary,
+                chat_id,
+                hotels_in_cart=hotels_in_cart,
+                mylens_data=mylens_data
+            )
+            
+            if result.get("status") == "error":
+                raise HTTPException(status_code=400, detail=result.get("error", "Failed to generate itinerary"))
+            
+            with tracing.span("serialize_itinerary") as serialize_span:
+                itinerary_obj = Itinerary(**result, quality_tier=quality_tier)
+                serialize_span.set(
+                    days=len(itinerary_obj.days),
+                    hotels_selected=len(itinerary_obj.hotels or []),
+                    hotels_in_cart=len(hotels_in_cart)
+                )
+            
+            return itinerary_obj
         
-        return itinerary_obj
+        # Double-clicks and backend retries share one generation; the cart is
+        # part of the key so a changed cart always gets a fresh itinerary
+        route = "/api/v1/activities/itinerary/generate"
+        key = canonical_key(route, {
+            "chat_id": chat_id,
+            "cart": activity_recommendation_service.get_cart(chat_id),
+            "hotels_in_cart": hotels_in_cart,
+            "mylens_data": mylens_data
+        })
+        return await run_coalesced(route, key, generate, response, idempotency_key)
     except HTTPException:
         raise
     except Exception as e:
@@ -701,7 +1142,296 @@ async def generate_activity_itinerary(
         raise HTTPException(status_code=500, detail=f"Error generating itinerary: {str(e)}")
 
 
+# ============= Chat Event Ingestion =============
+
+CHAT_EVENT_FEATURES = ["moderation", "sentiment", "activities", "hotel_preferences"]
+
+
+class ChatEvent(BaseModel):
+    user: str  # Display name, used for the activity buffer
+    message: str
+    user_id: Optional[str] = None
+    message_id: Optional[str] = None
+
+
+class ChatEventsRequest(BaseModel):
+    chat_id: str
+    events: List[ChatEvent]
+    chat_type: str = "private"  # 'city' or 'private'
+    features: List[str] = CHAT_EVENT_FEATURES
+    hotel_limit: int = 0  # Hotel recommendations to return with the preferences (0 for none)
+
+
+class ChatEventsResponse(BaseModel):
+    chat_id: str
+    event_count: int
+    moderation: Optional[List[ContentModerationResponse]] = None
+    sentiment: Optional[List[dict]] = None
+    activities: Optional[ProcessMessageResponse] = None
+    hotel_preferences: Optional[dict] = None
+    errors: dict = {}  # Feature -> error message for features that failed
+    error_status: dict = {}  # Feature -> HTTP status the feature's own endpoint would have returned
+
+
+def normalize_chat_text(text: str) -> str:
+    """Strip every line and drop blank ones; done once per event for all features."""
+    return "\n".join(line.strip() for line in text.split("\n") if line.strip())
+
+
+async def _moderate_events(events: List[ChatEvent], texts: List[str], chat_type: str):
+    init_moderation_service()
+
+    def moderate_all():
+        return [
+            moderation_service.moderate_content(
+                content=text,
+                user_id=event.user_id,
+                message_id=event.message_id,
+                chat_type=chat_type
+            )
+            for event, text in zip(events, texts)
+        ]
+
+    results = await run_blocking("moderation", moderate_all)
+    return [ContentModerationResponse(**result) for result in results]
+
+
+async def _analyze_event_sentiment(texts: List[str]):
+    if sentiment_analysis_service is None:
+        await run_blocking("sentiment", init_sentiment_analysis_service)
+    return await run_blocking("sentiment", sentiment_analysis_service.analyze_messages_batch, texts)
+
+
+async def _buffer_activity_events(chat_id: str, events: List[ChatEvent], texts: List[str]):
+    await ensure_activity_recommendation_service()
+    result = await run_blocking(
+        "activities",
+        activity_recommendation_service.process_messages,
+        chat_id,
+        [{"user": event.user, "message": text} for event, text in zip(events, texts)]
+    )
+    return ProcessMessageResponse(
+        message_count=result["message_count"],
+        recommendations=[ActivityPlace(**rec) for rec in result["recommendations"]],
+        trigger_rec=result["trigger_rec"]
+    )
+
+
+async def _update_hotel_preferences(chat_id: str, events: List[ChatEvent], texts: List[str], limit: int):
+    if hotel_recommendation_service is None:
+        await run_blocking("recommendation", init_hotel_recommendation_service)
+    return await run_blocking(
+        "recommendation",
+        hotel_recommendation_service.update_chat_preferences,
+        chat_id,
+        [{"user_id": event.user_id or event.user, "text": text} for event, text in zip(events, texts)],
+        limit=limit
+    )
+
+
+@app.post("/api/v1/chat/events", response_model=ChatEventsResponse)
+async def ingest_chat_events(request: ChatEventsRequest):
+    """
+    Process one or more new chat messages through every chat feature at once.
+    
+    Moderation, sentiment and tag extraction, the activity recommendation buffer
+    and the incremental hotel-preference update run concurrently on their own
+    pools. A feature that fails (or whose pool is busy) is reported in "errors"
+    without failing the others.
+    
+    Request body:
+    {
+        "chat_id": "chat_123",
+        "events": [{"user": "john_doe", "user_id": "u1", "message": "Let's find a hotel with a pool"}],
+        "features": ["sentiment", "activities", "hotel_preferences"]
+    }
+    """
+    unknown = set(request.features) - set(CHAT_EVENT_FEATURES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown features: {', '.join(sorted(unknown))}")
+
+    events = []
+    texts = []
+    for event in request.events:
+        text = normalize_chat_text(event.message)
+        if text:
+            events.append(event)
+            texts.append(text)
+    if not events:
+        raise HTTPException(status_code=400, detail="No non-empty messages in events")
+
+    tasks = {}
+    if "moderation" in request.features:
+        tasks["moderation"] = _moderate_events(events, texts, request.chat_type)
+    if "sentiment" in request.features:
+        tasks["sentiment"] = _analyze_event_sentiment(texts)
+    if "activities" in request.features:
+        tasks["activities"] = _buffer_activity_events(request.chat_id, events, texts)
+    if "hotel_preferences" in request.features:
+        tasks["hotel_preferences"] = _update_hotel_preferences(
+            request.chat_id, events, texts, request.hotel_limit
+        )
+
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    response = ChatEventsResponse(chat_id=request.chat_id, event_count=len(events))
+    errors = {}
+    error_status = {}
+    for feature, result in zip(tasks, results):
+        if isinstance(result, HTTPException):
+            errors[feature] = result.detail
+            error_status[feature] = result.status_code
+        elif isinstance(result, Exception):
+            errors[feature] = str(result)
+            error_status[feature] = 500
+        else:
+            setattr(response, feature, result)
+    response.errors = errors
+    response.error_status = error_status
+    if errors:
+        tracing.event("chat event features failed", features=",".join(sorted(errors)))
+    return response
+
+
+# ============= Admin Profiling Endpoints =============
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need ADMIN_TOKEN in X-Admin-Token; they 404 when it is unset."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+admin_router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+class ProfileRequestsRequest(BaseModel):
+    route: str  # Route template, e.g. "/api/v1/hotels/similar"
+    requests: int = 10
+
+
+@admin_router.post("/profile/requests")
+async def arm_request_profile(request: ProfileRequestsRequest):
+    """
+    cProfile the blocking work of the next N requests to a route.
+    Poll GET /admin/profile/requests/{id}; when done, download the .pstats file.
+    """
+    routes = {getattr(route, "path", None) for route in app.router.routes}
+    if request.route not in routes:
+        raise HTTPException(status_code=400, detail=f"Unknown route: {request.route}")
+    if not 1 <= request.requests <= settings.PROFILE_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"requests must be between 1 and {settings.PROFILE_MAX_REQUESTS}")
+    return profiling.route_profiler.arm(request.route, request.requests).to_dict()
+
+
+@admin_router.get("/profile/requests")
+async def list_request_profiles():
+    return [session.to_dict() for session in profiling.route_profiler.sessions()]
+
+
+@admin_router.get("/profile/requests/{session_id}")
+async def get_request_profile(session_id: str):
+    session = profiling.route_profiler.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown profiling session")
+    return session.to_dict()
+
+
+@admin_router.post("/profile/stacks")
+async def sample_stacks(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(10, ge=1)
+):
+    """Wall-clock stack samples of every thread for T seconds, as a folded-stacks file."""
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.PROFILE_MAX_SECONDS}")
+    try:
+        return await asyncio.to_thread(profiling.stack_sampler.sample, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@admin_router.get("/memory")
+async def memory_status():
+    return profiling.allocation_tracker.status()
+
+
+@admin_router.post("/memory/start")
+async def start_memory_tracing(frames: int = Query(25, ge=1, le=100)):
+    """Start tracemalloc; allocations made before this are not tracked."""
+    return profiling.allocation_tracker.start(frames)
+
+
+@admin_router.post("/memory/snapshot")
+async def take_memory_snapshot(
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500)
+):
+    try:
+        return await asyncio.to_thread(profiling.allocation_tracker.snapshot, key_type, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@admin_router.get("/memory/diff")
+async def diff_memory_snapshots(
+    base: str,
+    target: Optional[str] = None,
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500)
+):
+    """Allocation growth from snapshot `base` to `target` (or to a new snapshot)."""
+    try:
+        return await asyncio.to_thread(profiling.allocation_tracker.diff, base, target, key_type, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@admin_router.post("/memory/stop")
+async def stop_memory_tracing():
+    return profiling.allocation_tracker.stop()
+
+
+@admin_router.get("/profiles")
+async def list_profile_files():
+    return {"pid": os.getpid(), "files": profiling.list_output_files()}
+
+
+@admin_router.get("/profiles/{name}")
+async def download_profile_file(name: str):
+    path = profiling.resolve_output_file(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile file not found")
+    return FileResponse(str(path), filename=name, media_type="application/octet-stream")
+
+
+
+@admin_router.get("/degradation")
+async def degradation_status():
+    """Current quality tier and load signals of each degradable pipeline."""
+    return {"pid": os.getpid(), "pipelines": degradation.snapshot()}
+
+
+@admin_router.post("/degradation/{pipeline}")
+async def force_degradation_tier(pipeline: str, tier: Optional[str] = Query(None)):
+    """Pin a pipeline to a tier; omit tier to return it to automatic control."""
+    if pipeline not in degradation.pipelines:
+        raise HTTPException(status_code=404, detail=f"Unknown pipeline: {pipeline}")
+    try:
+        degradation.force(pipeline, tier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return degradation.snapshot()[pipeline]
+
+
+app.include_router(admin_router)
+
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         "main:app",
         host=settings.HOST,
@@ -0,0 +1,122 @@
+"""
+Manage the model artifacts the AI microservice loads.
+
+Usage:
+    python models_cli.py list
+    python models_cli.py prefetch [--services image,activities] [--force]
+    python models_cli.py verify
+    python models_cli.py load-times [--services sentiment]
+
+Set MODEL_CACHE_DIR first. prefetch downloads (and pins) every model the
+selected services need; at runtime the services load from that directory
+with the Hugging Face hubs in offline mode.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from config import settings
+from utils import model_registry
+from utils.memory import current_rss_mb
+
+
+def parse_services(value):
+    return [s.strip() for s in value.split(",") if s.strip()] if value else settings.MODEL_SERVICES
+
+
+def cmd_list(args):
+    manifest = model_registry.load_manifest()
+    print(f"MODEL_CACHE_DIR: {settings.MODEL_CACHE_DIR or '(unset: models download from the hubs)'}")
+    print(f"Offline mode: {settings.MODELS_OFFLINE}\n")
+    print(f"{'key':<10} {'services':<12} {'name':<45} {'revision':<14} {'size':>9}")
+    for artifact in model_registry.artifacts_for(parse_services(args.services)):
+        entry = manifest.get(artifact.key)
+        revision = entry["revision"][:12] if entry else "-"
+        size = f"{entry['bytes'] / (1024 * 1024):.0f}M" if entry else "not cached"
+        print(f"{artifact.key:<10} {','.join(artifact.services):<12} {artifact.name:<45} {revision:<14} {size:>9}")
+    return 0
+
+
+def cmd_prefetch(args):
+    for row in model_registry.prefetch(parse_services(args.services), force=args.force):
+        if row["status"] == "cached":
+            print(f"{row['key']:<10} already cached")
+        else:
+            print(f"{row['key']:<10} fetched revision {row['revision'][:12]} in {row['seconds']}s")
+    print(f"Manifest: {model_registry.cache_dir() / model_registry.MANIFEST_NAME}")
+    return 0
+
+
+def cmd_verify(args):
+    failed = False
+    for row in model_registry.verify(parse_services(args.services)):
+        if row["status"] == "ok":
+            print(f"{row['key']:<10} ok ({row['files']} files, revision {row['revision'][:12]})")
+        else:
+            failed = True
+            print(f"{row['key']:<10} {row['status'].upper()}")
+            for problem in row["problems"]:
+                print(f"           {problem}")
+    return 1 if failed else 0
+
+
+def cmd_load_times(args):
+    model_registry.configure_environment()
+    results = []
+    for artifact in model_registry.artifacts_for(parse_services(args.services)):
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        try:
+            model_registry.load_artifact(artifact.key)
+            error = None
+        except Exception as e:
+            error = str(e)
+        seconds = time.perf_counter() - started
+        rss_after = current_rss_mb()
+        results.append({
+            "key": artifact.key,
+            "seconds": round(seconds, 2),
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before and rss_after else None,
+            "error": error
+        })
+        status = f"failed: {error}" if error else f"{seconds:7.2f}s  +{results[-1]['rss_delta_mb']}MB RSS"
+        print(f"{artifact.key:<10} {status}", flush=True)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 1 if any(r["error"] for r in results) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model artifact manager for the AI microservice")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in [
+        ("list", "Show each model, the services that need it and its cache state"),
+        ("prefetch", "Download models into MODEL_CACHE_DIR and record checksums"),
+        ("verify", "Check cached files against the manifest checksums"),
+        ("load-times", "Load each model (offline, from the cache) and report the time taken"),
+    ]:
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument("--services", help="Comma-separated services (default: MODEL_SERVICES)")
+        if name == "prefetch":
+            command.add_argument("--force", action="store_true", help="Download again even if cached")
+        if name == "load-times":
+            command.add_argument("--json", action="store_true", help="Also print the results as JSON")
+
+    args = parser.parse_args()
+    handlers = {"list": cmd_list, "prefetch": cmd_prefetch, "verify": cmd_verify, "load-times": cmd_load_times}
+    try:
+        sys.exit(handlers[args.command](args))
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
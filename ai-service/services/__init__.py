@@ -1,5 +1,22 @@
 # Services module for AI integrations
-from .hotel_recommendation_service import HotelRecommendationService
-from .image_search_service import ImageSearchService
+#
+# The service classes are imported on first attribute access so importing one
+# lightweight service (moderation, the cart endpoints) does not load torch and
+# CLIP through this package.
+import importlib
 
-__all__ = ['HotelRecommendationService', 'ImageSearchService']
\ No newline at end of file
+_LAZY_EXPORTS = {
+    'HotelRecommendationService': '.hotel_recommendation_service',
+    'ImageSearchService': '.image_search_service',
+}
+
+__all__ = ['HotelRecommendationService', 'ImageSearchService']
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
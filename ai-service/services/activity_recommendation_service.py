@@ -2,11 +2,16 @@ import json
 import numpy as np
 import re
 import os
-import torch
+import threading
 from typing import List, Optional, Dict
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
+
+from utils.runtime_profile import (
+    get_runtime_profile, apply_process_settings, prepare_model, inference_context
+)
+from utils.metrics import stage_timer
+from utils.model_registry import model_source
+from utils.tracing import span, event
 
 
 class LocalLLM:
@@ -15,12 +20,19 @@ class LocalLLM:
     
     def __new__(cls):
         if cls._instance is None:
+            # torch and transformers load only when an itinerary needs the local LLM
+            import torch
+            from transformers import pipeline
+            
             cls._instance = super(LocalLLM, cls).__new__(cls)
+            cls._instance.runtime_profile = get_runtime_profile("llm")
+            llm_source = model_source("qwen")
+            apply_process_settings()
             device = "cpu"
             try:
                 cls._instance.pipeline = pipeline(
                     "text-generation",
-                    model="Qwen/Qwen2.5-0.5B-Instruct",
+                    model=llm_source,
                     device=device,
                     model_kwargs={"torch_dtype": torch.float32}
                 )
@@ -28,9 +40,10 @@ class LocalLLM:
                 print(f"Error loading local LLM: {e}. Falling back to CPU.")
                 cls._instance.pipeline = pipeline(
                     "text-generation",
-                    model="Qwen/Qwen2.5-0.5B-Instruct",
+                    model=llm_source,
                     device="cpu"
                 )
+            prepare_model(cls._instance.pipeline.model, cls._instance.runtime_profile)
         return cls._instance
 
     def generate_itinerary(self, chat_id: str, num_days: int, num_people: int, places: List[Dict]) -> Optional[Dict]:
@@ -85,7 +98,8 @@ class LocalLLM:
         
         try:
             prompt = self.pipeline.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-            outputs = self.pipeline(prompt, max_new_tokens=1000, do_sample=False)
+            with inference_context(self.runtime_profile), stage_timer("local_llm_generate"):
+                outputs = self.pipeline(prompt, max_new_tokens=1000, do_sample=False)
             text = outputs[0]['generated_text']
             
             # Extract JSON from response
@@ -118,11 +132,35 @@ class ActivitySearchEngine:
         if self._initialized:
             return
         
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.runtime_profile = get_runtime_profile("activities")
+        self.model = None
         self.places_data = []
+        self.corpus = []
         self.embeddings = None
+        self._model_lock = threading.Lock()
         self._load_data()
         self._initialized = True
+    
+    def ensure_model(self):
+        """
+        Load MiniLM and embed the activity corpus on first use.
+        
+        Cart endpoints only need the place data, so they never pay for
+        sentence_transformers/torch; search and warm-up do.
+        """
+        if self.embeddings is not None or not self.corpus:
+            return
+        with self._model_lock:
+            if self.embeddings is not None:
+                return
+            from sentence_transformers import SentenceTransformer
+            
+            apply_process_settings()
+            self.model = SentenceTransformer(model_source("minilm"))
+            prepare_model(self.model, self.runtime_profile)
+            with inference_context(self.runtime_profile):
+                embeddings = self.model.encode(self.corpus, convert_to_tensor=False)
+            self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
 
     def _get_region(self, full_text: str) -> str:
         full_text = full_text.lower()
@@ -165,9 +203,7 @@ class ActivitySearchEngine:
                     })
                     corpus.append(combined_text)
                 
-                if corpus:
-                    self.embeddings = self.model.encode(corpus, convert_to_tensor=False)
-                    self.embeddings = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+                self.corpus = corpus
                     
                 print(f"Loaded {len(self.places_data)} activities for search")
         except Exception as e:
@@ -175,10 +211,12 @@ class ActivitySearchEngine:
             raise
 
     def search(self, query: str, top_k: int = 3, exclude_names: List[str] = []) -> List[Dict]:
+        self.ensure_model()
         if self.embeddings is None or not self.places_data:
             return []
         
-        query_embedding = self.model.encode([query], convert_to_tensor=False)
+        with inference_context(self.runtime_profile), stage_timer("minilm_encode"):
+            query_embedding = self.model.encode([query], convert_to_tensor=False)
         query_embedding = query_embedding / np.linalg.norm(query_embedding, axis=1, keepdims=True)
         
         similarities = np.dot(self.embeddings, query_embedding.T).flatten()
@@ -224,81 +262,117 @@ class ActivitySearchEngine:
 class ActivityCartManager:
     """Manages activity carts for different chat sessions"""
     _instance = None
+    _instance_lock = threading.Lock()
 
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(ActivityCartManager, cls).__new__(cls)
-            cls._instance.carts = {}
-            cls._instance.message_counts = {}
-            cls._instance.participants = {}
-            cls._instance.message_buffers = {}
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(ActivityCartManager, cls).__new__(cls)
+                cls._instance.carts = {}
+                cls._instance.message_counts = {}
+                cls._instance.participants = {}
+                cls._instance.message_buffers = {}
+                # Requests for the same chat run concurrently on the activities pool
+                cls._instance._lock = threading.Lock()
         return cls._instance
 
-    def add_to_cart(self, chat_id: str, place_name: str, user_name: str):
-        if chat_id not in self.carts:
-            self.carts[chat_id] = {
-                "items": [],
-                "num_days": 3,
-                "num_people": 2
-            }
-        
-        # Check if already exists to increment count
-        for item in self.carts[chat_id]["items"]:
-            if item["place_name"] == place_name:
-                item["count"] += 1
-                return
-                
-        self.carts[chat_id]["items"].append({
-            "place_name": place_name,
-            "added_by": user_name,
-            "count": 1
-        })
+    def add_to_cart(self, chat_id: str, place_name: str, user_name: str, max_items: Optional[int] = None) -> bool:
+        """Add a place (or count it again); False if that needs a new item and the cart has max_items"""
+        with self._lock:
+            if chat_id not in self.carts:
+                self.carts[chat_id] = {
+                    "items": [],
+                    "num_days": 3,
+                    "num_people": 2
+                }
+            
+            # Check if already exists to increment count
+            for item in self.carts[chat_id]["items"]:
+                if item["place_name"] == place_name:
+                    item["count"] += 1
+                    return True
+            
+            if max_items is not None and len(self.carts[chat_id]["items"]) >= max_items:
+                return False
+            self.carts[chat_id]["items"].append({
+                "place_name": place_name,
+                "added_by": user_name,
+                "count": 1
+            })
+            return True
+
+    def remove_from_cart(self, chat_id: str, place_name: str):
+        """Decrement a place's count, removing it at zero"""
+        with self._lock:
+            if chat_id not in self.carts:
+                self.carts[chat_id] = {
+                    "items": [],
+                    "num_days": 3,
+                    "num_people": 2
+                }
+            items = self.carts[chat_id]["items"]
+            for i, item in enumerate(items):
+                if item["place_name"] == place_name:
+                    if item["count"] > 1:
+                        item["count"] -= 1
+                    else:
+                        items.pop(i)
+                    break
 
     def get_cart(self, chat_id: str) -> Dict:
-        return self.carts.get(chat_id, {
-            "items": [],
-            "num_days": 3,
-            "num_people": 2
-        })
+        """A copy of the cart, safe to read while other requests change it"""
+        with self._lock:
+            cart = self.carts.get(chat_id)
+            if cart is None:
+                return {
+                    "items": [],
+                    "num_days": 3,
+                    "num_people": 2
+                }
+            return {**cart, "items": [dict(item) for item in cart["items"]]}
 
     def update_cart_settings(self, chat_id: str, num_days: int, num_people: int):
-        if chat_id not in self.carts:
-            self.carts[chat_id] = {
-                "items": [],
-                "num_days": num_days,
-                "num_people": num_people
-            }
-        else:
-            self.carts[chat_id]["num_days"] = num_days
-            self.carts[chat_id]["num_people"] = num_people
+        with self._lock:
+            if chat_id not in self.carts:
+                self.carts[chat_id] = {
+                    "items": [],
+                    "num_days": num_days,
+                    "num_people": num_people
+                }
+            else:
+                self.carts[chat_id]["num_days"] = num_days
+                self.carts[chat_id]["num_people"] = num_people
 
     def increment_message(self, chat_id: str, participant: str, message: str) -> int:
         # Detect if this is a block of messages (multiple lines)
         lines = [line.strip() for line in message.split('\n') if line.strip()]
         num_lines = len(lines)
         
-        self.message_counts[chat_id] = self.message_counts.get(chat_id, 0) + num_lines
-        if chat_id not in self.participants:
-            self.participants[chat_id] = set()
-        self.participants[chat_id].add(participant)
-        
-        if chat_id not in self.message_buffers:
-            self.message_buffers[chat_id] = []
+        with self._lock:
+            self.message_counts[chat_id] = self.message_counts.get(chat_id, 0) + num_lines
+            if chat_id not in self.participants:
+                self.participants[chat_id] = set()
+            self.participants[chat_id].add(participant)
             
-        for line in lines:
-            self.message_buffers[chat_id].append(line)
-        
-        return self.message_counts[chat_id]
+            if chat_id not in self.message_buffers:
+                self.message_buffers[chat_id] = []
+                
+            for line in lines:
+                self.message_buffers[chat_id].append(line)
+            
+            return self.message_counts[chat_id]
 
     def get_buffer(self, chat_id: str, limit: int = 7) -> str:
-        buffer = self.message_buffers.get(chat_id, [])
-        combined = " ".join(buffer[-limit:])
-        if len(buffer) >= limit:
-            self.message_buffers[chat_id] = []
-        return combined
+        with self._lock:
+            buffer = self.message_buffers.get(chat_id, [])
+            combined = " ".join(buffer[-limit:])
+            if len(buffer) >= limit:
+                self.message_buffers[chat_id] = []
+            return combined
 
     def get_participant_count(self, chat_id: str) -> int:
-        return len(self.participants.get(chat_id, set()))
+        with self._lock:
+            return len(self.participants.get(chat_id, set()))
 
 
 def parse_duration(duration_str: str) -> int:
@@ -390,6 +464,10 @@ class ActivityRecommendationService:
         self.cart_manager = ActivityCartManager()
         self.llm = None  # Lazy loaded
     
+    def warm_up(self):
+        """Load the search model ahead of the first request (used by startup warm-up)"""
+        self.search_engine.ensure_model()
+    
     def _init_llm(self):
         """Lazy load LLM only when needed for itinerary generation"""
         if self.llm is None:
@@ -397,11 +475,17 @@ class ActivityRecommendationService:
     
     def process_message(self, chat_id: str, user: str, message: str) -> Dict:
         """Process a chat message and return recommendations if threshold reached"""
-        lines = [l.strip() for l in message.split('\n') if l.strip()]
-        num_lines = len(lines)
-        
-        count = self.cart_manager.increment_message(chat_id, user, message)
-        
+        return self.process_messages(chat_id, [{"user": user, "message": message}])
+
+    def process_messages(self, chat_id: str, messages: List[Dict]) -> Dict:
+        """Process a batch of chat messages ({"user", "message"}), searching at most once"""
+        count = self.cart_manager.message_counts.get(chat_id, 0)
+        num_lines = 0
+        for entry in messages:
+            lines = [l.strip() for l in entry["message"].split('\n') if l.strip()]
+            num_lines += len(lines)
+            count = self.cart_manager.increment_message(chat_id, entry["user"], entry["message"])
+
         recommendations = []
         # Trigger if we hit a multiple of 7 OR if a batch just crossed the 7 threshold
         trigger_rec = count > 0 and (count % 7 == 0 or (count // 7 > (count - num_lines) // 7))
@@ -433,7 +517,8 @@ class ActivityRecommendationService:
         if not place:
             return {"error": "Place not found", "status": "error"}
         
-        self.cart_manager.add_to_cart(chat_id, place_name, user)
+        if not self.cart_manager.add_to_cart(chat_id, place_name, user, max_items=10):
+            return {"error": "Cart is full (max 10 items)", "status": "error"}
         return {"status": "success", "cart": self.cart_manager.get_cart(chat_id)}
     
     def get_cart(self, chat_id: str) -> Dict:
@@ -442,29 +527,7 @@ class ActivityRecommendationService:
     
     def remove_from_cart(self, chat_id: str, place_name: str) -> Dict:
         """Remove an activity from the cart"""
-        cart = self.cart_manager.get_cart(chat_id)
-        items = cart.get("items", [])
-        
-        # Find and remove the item
-        for i, item in enumerate(items):
-            if item["place_name"] == place_name:
-                if item["count"] > 1:
-                    # Decrement count
-                    item["count"] -= 1
-                else:
-                    # Remove item completely
-                    items.pop(i)
-                break
-        
-        # Update cart
-        if chat_id not in self.cart_manager.carts:
-            self.cart_manager.carts[chat_id] = {
-                "items": [],
-                "num_days": 3,
-                "num_people": 2
-            }
-        self.cart_manager.carts[chat_id]["items"] = items
-        
+        self.cart_manager.remove_from_cart(chat_id, place_name)
         return {"status": "success", "cart": self.cart_manager.get_cart(chat_id)}
     
     def update_cart_settings(self, chat_id: str, num_days: int, num_people: int) -> Dict:
@@ -472,8 +535,16 @@ class ActivityRecommendationService:
         self.cart_manager.update_cart_settings(chat_id, num_days, num_people)
         return {"status": "success"}
     
-    def generate_itinerary(self, chat_id: str, hotels_in_cart: List[Dict] = None, mylens_data: List[Dict] = None) -> Dict:
-        """Generate an itinerary using Azure OpenAI with activities, hotels, and myLens data"""
+    def generate_itinerary(self, chat_id: str, hotels_in_cart: List[Dict] = None, mylens_data: List[Dict] = None,
+                           quality_tier: str = "full") -> Dict:
+        """
+        Generate an itinerary using Azure OpenAI with activities, hotels, and myLens data
+        
+        quality_tier (set by the degradation controller under load): "full" tries
+        Azure OpenAI, then the local LLM, then the deterministic scheduler;
+        "no_local_llm" skips the CPU-heavy local LLM; "deterministic" goes
+        straight to the scheduler.
+        """
         cart = self.cart_manager.get_cart(chat_id)
         
         if not cart.get("items"):
@@ -491,64 +562,71 @@ class ActivityRecommendationService:
                 for _ in range(item["count"]):
                     activity_places.append(place)
         
-        print(f"[Itinerary] Activities: {len(activity_places)}, Hotels: {len(hotels_in_cart or [])}, MyLens: {len(mylens_data or [])}")
+        event("Itinerary inputs", activities=len(activity_places),
+              hotels=len(hotels_in_cart or []), mylens_places=len(mylens_data or []))
         
         # 2. Try Azure OpenAI first
-        try:
-            from services.azure_itinerary_service import get_azure_itinerary_service
-            azure_service = get_azure_itinerary_service()
-            
-            azure_itinerary = azure_service.generate_itinerary(
-                chat_id=chat_id,
-                num_days=cart["num_days"],
-                num_people=cart["num_people"],
-                activities=activity_places,
-                hotels=hotels_in_cart or [],
-                mylens_data=mylens_data or []
-            )
-            
-            if azure_itinerary and "days" in azure_itinerary:
-                llm_num_days = len(azure_itinerary.get("days", []))
-                requested_days = cart["num_days"]
+        if quality_tier != "deterministic":
+            with span("itinerary.azure") as azure_span:
+                try:
+                    from services.azure_itinerary_service import get_azure_itinerary_service
+                    azure_service = get_azure_itinerary_service()
                 
-                if llm_num_days == requested_days:
-                    print(f"[Azure OpenAI] Successfully generated {llm_num_days} days as requested")
-                    # Azure OpenAI handles hotel selection internally
-                    return azure_itinerary
-                else:
-                    print(f"[Azure OpenAI] Generated {llm_num_days} days but {requested_days} were requested - falling back")
-        except Exception as e:
-            print(f"[Azure OpenAI] Error: {e}")
-            import traceback
-            traceback.print_exc()
+                    azure_itinerary = azure_service.generate_itinerary(
+                        chat_id=chat_id,
+                        num_days=cart["num_days"],
+                        num_people=cart["num_people"],
+                        activities=activity_places,
+                        hotels=hotels_in_cart or [],
+                        mylens_data=mylens_data or []
+                    )
+                
+                    if azure_itinerary and "days" in azure_itinerary:
+                        llm_num_days = len(azure_itinerary.get("days", []))
+                        requested_days = cart["num_days"]
+                        azure_span.set(days=llm_num_days, requested_days=requested_days)
+                    
+                        if llm_num_days == requested_days:
+                            # Azure OpenAI handles hotel selection internally
+                            return azure_itinerary
+                        else:
+                            event("Azure OpenAI day count mismatch, falling back",
+                                  days=llm_num_days, requested_days=requested_days)
+                except Exception as e:
+                    print(f"[Azure OpenAI] Error: {e}")
+                    azure_span.set(error=repr(e))
+                    import traceback
+                    traceback.print_exc()
         
         # 3. Fallback to Local LLM (legacy)
-        print(f"[Fallback] Trying local LLM...")
-        self._init_llm()
-        llm_itinerary = self.llm.generate_itinerary(
-            chat_id=chat_id,
-            num_days=cart["num_days"],
-            num_people=cart["num_people"],
-            places=activity_places
-        )
-        
-        # Validate LLM output - ensure it has the correct number of days
-        if llm_itinerary and "days" in llm_itinerary:
-            llm_num_days = len(llm_itinerary.get("days", []))
-            requested_days = cart["num_days"]
+        if quality_tier == "full":
+            with span("itinerary.local_llm") as llm_span:
+                self._init_llm()
+                llm_itinerary = self.llm.generate_itinerary(
+                    chat_id=chat_id,
+                    num_days=cart["num_days"],
+                    num_people=cart["num_people"],
+                    places=activity_places
+                )
             
-            if llm_num_days == requested_days:
-                print(f"[Local LLM] Generated {llm_num_days} days as requested")
-                # Select hotels for LLM itinerary
-                selected_hotels = self._select_hotels(llm_itinerary, hotels_in_cart or [])
-                llm_itinerary["hotels"] = selected_hotels
-                return llm_itinerary
-            else:
-                print(f"[Local LLM] Generated {llm_num_days} days but {requested_days} were requested - falling back to deterministic")
+                # Validate LLM output - ensure it has the correct number of days
+                if llm_itinerary and "days" in llm_itinerary:
+                    llm_num_days = len(llm_itinerary.get("days", []))
+                    requested_days = cart["num_days"]
+                    llm_span.set(days=llm_num_days, requested_days=requested_days)
+                
+                    if llm_num_days == requested_days:
+                        # Select hotels for LLM itinerary
+                        selected_hotels = self._select_hotels(llm_itinerary, hotels_in_cart or [])
+                        llm_itinerary["hotels"] = selected_hotels
+                        return llm_itinerary
+                    else:
+                        event("Local LLM day count mismatch, falling back to deterministic",
+                              days=llm_num_days, requested_days=requested_days)
         
         # 4. Deterministic Robust Scheduler (Final Fallback)
-        print(f"[Scheduler] Using deterministic scheduler for {cart['num_days']} days")
-        itinerary = self._generate_deterministic_itinerary(chat_id, activity_places, cart["num_days"], cart["num_people"])
+        with stage_timer("deterministic_schedule"):
+            itinerary = self._generate_deterministic_itinerary(chat_id, activity_places, cart["num_days"], cart["num_people"])
         
         # 5. Select hotels for deterministic itinerary
         selected_hotels = self._select_hotels(itinerary, hotels_in_cart or [])
@@ -561,11 +639,14 @@ class ActivityRecommendationService:
         Intelligently select hotels from cart based on itinerary analysis
         """
         if not hotels_in_cart:
-            print("[Hotel Selection] No hotels in cart")
+            event("No hotels in cart")
             return []
         
-        print(f"[Hotel Selection] Analyzing {len(hotels_in_cart)} hotels in cart")
-        
+        with span("select_hotels", hotels_in_cart=len(hotels_in_cart)) as selection_span:
+            return self._select_hotels_from_cart(itinerary, hotels_in_cart, selection_span)
+    
+    def _select_hotels_from_cart(self, itinerary: Dict, hotels_in_cart: List[Dict], selection_span) -> List[Dict]:
+        """Score the cart's hotels and assign them to days (body of _select_hotels)"""
         num_days = len(itinerary.get("days", []))
         
         # Analyze activity regions across days
@@ -576,7 +657,7 @@ class ActivityRecommendationService:
                 if region in region_distribution:
                     region_distribution[region] += 1
         
-        print(f"[Hotel Selection] Activity distribution: {region_distribution}")
+        selection_span.set(region_distribution=region_distribution)
         
         # Determine primary region
         primary_region = max(region_distribution, key=region_distribution.get) if region_distribution else "Central"
@@ -626,7 +707,7 @@ class ActivityRecommendationService:
         num_hotels_needed = 1 if num_days <= 3 else 2 if num_days <= 6 else 3
         selected = hotel_scores[:num_hotels_needed]
         
-        print(f"[Hotel Selection] Selected {len(selected)} out of {len(hotels_in_cart)} hotels")
+        selection_span.set(selected=len(selected))
         
         # Determine which days for each hotel
         if len(selected) == 1:
@@ -671,14 +752,15 @@ class ActivityRecommendationService:
                 "recommended_for_days": days
             })
             
-            print(f"[Hotel Selection] Selected: {hotel.get('name')} - {reason_text}")
+            event("Selected hotel", name=hotel.get("name"), reason=reason_text)
         
         return result
     
     def _generate_deterministic_itinerary(self, chat_id: str, all_places: List[Dict], 
                                          num_days: int, num_people: int) -> Dict:
         """Fallback deterministic scheduler with time-aware scheduling"""
-        print(f"[Itinerary Generator] Creating {num_days}-day itinerary for {num_people} people with {len(all_places)} activities")
+        event("Creating deterministic itinerary", num_days=num_days, num_people=num_people,
+              activities=len(all_places))
         
         # Group by region to minimize travel
         by_region = {"North": [], "South": [], "Central": [], "Unknown": []}
@@ -688,15 +770,12 @@ class ActivityRecommendationService:
         days = []
         for i in range(num_days):
             day_num = i + 1
-            print(f"[Debug] Creating day {day_num} (type: {type(day_num)})")
             days.append({
                 "day": day_num,
                 "activities": [],
                 "total_duration_mins": 0
             })
         
-        print(f"[Itinerary Generator] Created {len(days)} day slots")
-        
         # Time-aware scheduling: Start at 8:00 AM for each day
         day_clocks = [480 for _ in range(num_days)]  # 8:00 AM in minutes
         
@@ -804,15 +883,10 @@ class ActivityRecommendationService:
             # Move to next day for better distribution (round-robin)
             current_day_index = (best_day_idx + 1) % num_days
         
-        # Log the distribution
-        for day in days:
-            print(f"[Itinerary Generator] Day {day['day']} (type: {type(day['day'])}): {len(day['activities'])} activities, {day['total_duration_mins']} mins")
-        
-        print(f"[Itinerary Generator] Total days created: {len(days)}")
-        print(f"[Itinerary Generator] Days with activities: {sum(1 for d in days if d['activities'])}")
-        
-        # Debug: Print actual day numbers
-        print(f"[Itinerary Generator] Day numbers: {[d['day'] for d in days]}")
+        # Record the distribution
+        event("Deterministic itinerary created", days=len(days),
+              activities_per_day=[len(d["activities"]) for d in days],
+              minutes_per_day=[d["total_duration_mins"] for d in days])
         
         return {
             "chat_id": chat_id,
@@ -5,6 +5,7 @@ import json
 from typing import List, Dict, Optional
 from openai import AzureOpenAI
 from config import settings
+from utils.metrics import stage_timer
 
 
 class AzureItineraryService:
@@ -130,16 +131,17 @@ IMPORTANT:
             print(f"[AzureItineraryService] Generating itinerary for {num_days} days...")
             
             # Call Azure OpenAI
-            response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4000,
-                response_format={"type": "json_object"}  # Force JSON output
-            )
+            with stage_timer("azure_openai_call"):
+                response = self.client.chat.completions.create(
+                    model=self.deployment,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=4000,
+                    response_format={"type": "json_object"}  # Force JSON output
+                )
             
             # Parse response
             content = response.choices[0].message.content
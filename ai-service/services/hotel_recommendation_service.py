@@ -3,7 +3,9 @@ Hotel Recommendation Service
 Integrates hotel recommendation AI from hotel_rec 2 module (final working version)
 """
 import sys
-import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 
 # Add hotel_rec 2 to path
@@ -11,9 +13,11 @@ hotel_rec_path = Path(__file__).parent.parent.parent / "hotel_rec 2"
 if str(hotel_rec_path) not in sys.path:
     sys.path.insert(0, str(hotel_rec_path))
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import json
 
+from config import settings
+
 # Import from hotel_rec 2
 try:
     # Try direct import first
@@ -42,17 +46,62 @@ except ImportError:
 class HotelRecommendationService:
     """Service for hotel recommendations based on chat analysis using hotel_rec 2"""
     
-    def __init__(self):
-        # Change working directory to hotel_rec 2 so it can find hotel_data.json
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(hotel_rec_path)
-            # Initialize services with proper paths
-            self.hotel_service = HotelService()
-            self.chat_analyzer = ChatAnalyzer()
-            self.recommendation_service = RecommendationService(self.hotel_service)
-        finally:
-            os.chdir(original_cwd)
+    def __init__(
+        self,
+        max_chats: int = settings.CHAT_PREFERENCES_MAX_CHATS,
+        ttl_seconds: float = settings.CHAT_PREFERENCES_TTL_SECONDS
+    ):
+        # An absolute path: the working directory is shared by every thread
+        self.hotel_service = HotelService(data_path=str(hotel_rec_path / "hotel_data.json"))
+        self.chat_analyzer = ChatAnalyzer()
+        self.recommendation_service = RecommendationService(self.hotel_service)
+        # Preferences extracted so far per chat, updated one batch of messages at a time.
+        # Bounded LRU with an idle TTL: (preferences, last message key, expires_at) by chat_id
+        self.chat_preferences: "OrderedDict[str, Tuple[UserPreferences, Tuple[str, str], float]]" = OrderedDict()
+        self.max_chats = max_chats
+        self.ttl_seconds = ttl_seconds
+        self._preferences_lock = threading.Lock()
+    
+    def _evict(self, now: float) -> None:
+        """Drop expired chats and the least recently used beyond max_chats; holds the lock"""
+        while self.chat_preferences:
+            chat_id, (_, _, expires_at) = next(iter(self.chat_preferences.items()))
+            if expires_at > now and len(self.chat_preferences) <= self.max_chats:
+                break
+            del self.chat_preferences[chat_id]
+    
+    @staticmethod
+    def _message_key(message: Dict[str, str]) -> Tuple[str, str]:
+        """Sender and whitespace-insensitive text, to tell whether a chat's state has seen a message"""
+        return message.get("user_id", "unknown"), " ".join(message.get("text", "").split())
+    
+    @staticmethod
+    def _format_preferences(preferences: UserPreferences) -> Dict[str, Any]:
+        return {
+            "area": preferences.area,
+            "max_price": preferences.max_price,
+            "min_price": preferences.min_price,
+            "amenities": preferences.amenities,
+            "room_types": preferences.room_types,
+            "other_requirements": preferences.other_requirements
+        }
+    
+    @staticmethod
+    def _format_recommendations(recommendations: List[DetailedRecommendation]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "hotel": {
+                    "name": rec.hotel.name,
+                    "hotel_code": rec.hotel.hotel_code,
+                    "amenities": rec.hotel.amenities,
+                    "room_types": rec.hotel.room_types,
+                    "description": rec.hotel.description
+                },
+                "explanation": rec.explanation,
+                "matched_preferences": rec.matched_preferences
+            }
+            for rec in recommendations
+        ]
     
     def get_recommendations_from_chat(
         self, 
@@ -84,28 +133,101 @@ class HotelRecommendationService:
             
             # Convert to dict format
             return {
-                "extracted_preferences": {
-                    "area": preferences.area,
-                    "max_price": preferences.max_price,
-                    "min_price": preferences.min_price,
-                    "amenities": preferences.amenities,
-                    "room_types": preferences.room_types,
-                    "other_requirements": preferences.other_requirements
-                },
-                "recommendations": [
-                    {
-                        "hotel": {
-                            "name": rec.hotel.name,
-                            "hotel_code": rec.hotel.hotel_code,
-                            "amenities": rec.hotel.amenities,
-                            "room_types": rec.hotel.room_types,
-                            "description": rec.hotel.description
-                        },
-                        "explanation": rec.explanation,
-                        "matched_preferences": rec.matched_preferences
-                    }
-                    for rec in recommendations
-                ]
+                "extracted_preferences": self._format_preferences(preferences),
+                "recommendations": self._format_recommendations(recommendations)
+            }
+        except Exception as e:
+            raise Exception(f"Error getting recommendations: {str(e)}")
+    
+    def update_chat_preferences(
+        self,
+        chat_id: str,
+        messages: List[Dict[str, str]],
+        limit: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Apply new chat messages to the preferences extracted so far for a chat
+        
+        Only the new messages are analyzed; the result matches extracting from
+        the chat's whole history as seen by this worker. The state is per worker
+        and bounded (CHAT_PREFERENCES_MAX_CHATS, CHAT_PREFERENCES_TTL_SECONDS):
+        after eviction a chat starts again from its next messages, which is why
+        get_recommendations_for_chat only trusts state that saw the latest message.
+        
+        Args:
+            chat_id: Chat the messages belong to
+            messages: New messages with 'user_id' and 'text' keys, oldest first
+            limit: Number of recommendations to return (0 for none)
+            
+        Returns:
+            Dictionary with the updated preferences and, if requested, recommendations
+        """
+        try:
+            chat_messages = [
+                ChatMessage(user_id=msg.get("user_id", "unknown"), text=msg.get("text", ""))
+                for msg in messages
+            ]
+            with self._preferences_lock:
+                now = time.monotonic()
+                entry = self.chat_preferences.pop(chat_id, None)
+                preferences = self.chat_analyzer.extract_preferences(
+                    chat_messages, prefs=entry[0] if entry is not None and entry[2] > now else None
+                )
+                if messages:
+                    last_message = self._message_key(messages[-1])
+                else:
+                    last_message = entry[1] if entry is not None else ("", "")
+                self.chat_preferences[chat_id] = (preferences, last_message, now + self.ttl_seconds)
+                self._evict(now)
+            
+            result = {"extracted_preferences": self._format_preferences(preferences)}
+            if limit > 0:
+                recommendations = self.recommendation_service.get_recommendations(preferences, limit=limit)
+                result["recommendations"] = self._format_recommendations(recommendations)
+            return result
+        except Exception as e:
+            raise Exception(f"Error updating chat preferences: {str(e)}")
+    
+    def get_recommendations_for_chat(
+        self,
+        chat_id: str,
+        messages: List[Dict[str, str]],
+        limit: int = 5
+    ) -> Dict[str, Any]:
+        """
+        Get hotel recommendations for a chat from its incremental preferences
+        
+        The state kept by update_chat_preferences is used when its last message
+        is the last of the given messages, i.e. this worker has seen the chat up
+        to now; its preferences then cover every message it was sent. Otherwise
+        (no state, evicted, or newer messages went to another worker) the
+        preferences are extracted from the given messages.
+        
+        Args:
+            chat_id: Chat to recommend hotels for
+            messages: Recent messages with 'user_id' and 'text' keys, oldest first
+            limit: Maximum number of recommendations to return
+            
+        Returns:
+            Dictionary with recommendations and extracted preferences
+        """
+        preferences = None
+        if messages:
+            with self._preferences_lock:
+                now = time.monotonic()
+                entry = self.chat_preferences.get(chat_id)
+                if entry is not None and entry[2] > now and entry[1] == self._message_key(messages[-1]):
+                    preferences = entry[0]
+                    self.chat_preferences[chat_id] = (preferences, entry[1], now + self.ttl_seconds)
+                    self.chat_preferences.move_to_end(chat_id)
+        if preferences is None:
+            return self.get_recommendations_from_chat(messages, limit=limit)
+        
+        try:
+            recommendations = self.recommendation_service.get_recommendations(preferences, limit=limit)
+            return {
+                "extracted_preferences": self._format_preferences(preferences),
+                "recommendations": self._format_recommendations(recommendations)
             }
         except Exception as e:
             raise Exception(f"Error getting recommendations: {str(e)}")
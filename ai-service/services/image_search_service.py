@@ -4,14 +4,25 @@ Integrates visual search AI from image_search module
 """
 import sys
 import os
+import copy
+import time
 from pathlib import Path
 import numpy as np
 import pickle
 import torch
 from PIL import Image, ImageOps, ImageFilter
-import sqlite3
 from typing import List, Dict, Any, Optional, Tuple
 
+from config import settings
+from utils.batching import MicroBatcher
+from utils.image_cache import ImageResultCache, perceptual_hash
+from utils.metrics import stage_timer, record_cache
+from utils.model_registry import ARTIFACTS, model_source
+from utils.runtime_profile import (
+    get_runtime_profile, apply_process_settings, prepare_model, prepare_input, inference_context,
+    pool_thread_initializer
+)
+
 try:
     import clip
 except ImportError:
@@ -22,6 +33,15 @@ image_search_path = Path(__file__).parent.parent.parent / "image_search"
 if str(image_search_path) not in sys.path:
     sys.path.insert(0, str(image_search_path))
 
+from feature_store import load_features
+from hotel_catalog import HotelCatalog, ImageAttributes
+from text_embeddings import TABLE_FILE as TEXT_TABLE_FILE, TextEmbeddingTable
+from vector_index import load_index
+from visual_features import (
+    parse_crops, multi_scale_crops, best_crop_scores, backbone_feature_name, cascade_candidates,
+    color_texture_signature, HotelGroups
+)
+
 
 class ImageSearchService:
     """Service for visual image search using CLIP and color/texture matching"""
@@ -33,6 +53,31 @@ class ImageSearchService:
         self.ai_features = None
         self.color_features = None
         self.mapping = None
+        self.hotel_groups = None
+        self.vector_index = None
+        self.encoder = None
+        # Small backbone of the cascade search (CASCADE_ENABLED)
+        self.small_model = None
+        self.small_preprocess = None
+        self.small_features = None
+        self.small_encoder = None
+        self.crops = parse_crops(settings.IMAGE_SEARCH_CROPS)
+        self.catalog = HotelCatalog(image_search_path / "hotels.db")
+        self.result_cache = None
+        if settings.IMAGE_CACHE_ENABLED:
+            self.result_cache = ImageResultCache(
+                max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.IMAGE_CACHE_TTL_SECONDS,
+                radius=settings.IMAGE_CACHE_HAMMING_RADIUS
+            )
+        self._image_attributes = None
+        self.text_table = None
+        # Files whose changes invalidate the result cache, and their last observed version
+        self.index_dir = image_search_path
+        self.index_check_interval = 1.0
+        self._features_version = None
+        self._features_checked_at = float("-inf")
+        self.runtime_profile = get_runtime_profile("image")
         self._load_resources()
     
     def _load_resources(self):
@@ -43,70 +88,189 @@ class ImageSearchService:
                 return
             
             # Load CLIP model
-            self.model, self.preprocess = clip.load("ViT-L/14@336px", device=self.device)
+            apply_process_settings()
+            self.model, self.preprocess = clip.load(model_source("clip"), device=self.device)
+            prepare_model(self.model, self.runtime_profile)
+            print(f"Image search runtime profile: {self.runtime_profile.describe()}")
+            if settings.CLIP_BATCHING_ENABLED:
+                self.encoder = MicroBatcher(
+                    "clip_image",
+                    self._encode_batch,
+                    max_batch_size=settings.CLIP_MAX_BATCH_SIZE,
+                    max_wait_ms=settings.CLIP_MAX_WAIT_MS,
+                    thread_initializer=pool_thread_initializer("image")
+                )
             
             # Load feature vectors and mapping
             image_search_path = Path(__file__).parent.parent.parent / "image_search"
             
-            ai_features_path = image_search_path / "hotel_features_ai.npy"
-            color_features_path = image_search_path / "hotel_features_color.npy"
             mapping_path = image_search_path / "mapping.pkl"
             
-            if ai_features_path.exists():
-                self.ai_features = np.load(str(ai_features_path))
-            if color_features_path.exists():
-                self.color_features = np.load(str(color_features_path))
+            # Memory-map the feature matrices read-only so pre-forked workers
+            # share one copy of the pages instead of each holding its own
+            mmap_mode = "r" if settings.FEATURES_MMAP else None
+            self.ai_features = load_features(
+                str(image_search_path), "hotel_features_ai", settings.FEATURES_PRECISION, mmap_mode
+            )
+            self.color_features = load_features(
+                str(image_search_path), "hotel_features_color", settings.FEATURES_PRECISION, mmap_mode
+            )
+            if self.ai_features is not None:
+                self.vector_index = load_index(
+                    settings.VECTOR_INDEX, self.ai_features, str(image_search_path), settings.VECTOR_INDEX_NPROBE
+                )
+                # Persisted common phrases plus an LRU for text queries
+                self.text_table = TextEmbeddingTable(
+                    self._encode_text, self.ai_features.shape[1], str(image_search_path / TEXT_TABLE_FILE),
+                    max_entries=settings.TEXT_EMBEDDING_CACHE_SIZE, model_name=ARTIFACTS["clip"].name
+                )
+            if settings.CASCADE_ENABLED and self.ai_features is not None:
+                self._load_cascade(image_search_path, mmap_mode)
             if mapping_path.exists():
                 with open(mapping_path, "rb") as f:
                     self.mapping = pickle.load(f)
+            if self.mapping is not None and self.color_features is not None:
+                self.hotel_groups = HotelGroups(self.mapping, len(self.color_features))
                     
             print(f"Image search service loaded: {len(self.mapping) if self.mapping else 0} images indexed")
         except Exception as e:
             print(f"Error loading image search resources: {e}")
     
+    def _load_cascade(self, image_search_path: Path, mmap_mode: Optional[str]):
+        """Load the small backbone and its feature matrix, or leave the cascade off"""
+        name = backbone_feature_name(settings.CASCADE_BACKBONE)
+        features = load_features(str(image_search_path), name, settings.FEATURES_PRECISION, mmap_mode)
+        if features is None or len(features) != len(self.ai_features):
+            print(f"Warning: {name}.npy missing or stale, cascade search disabled. Rebuild it with: "
+                  f"python setup_db.py --backbone-only --backbone {settings.CASCADE_BACKBONE}")
+            return
+        self.small_model, self.small_preprocess = clip.load(model_source("clip_small"), device=self.device)
+        prepare_model(self.small_model, self.runtime_profile)
+        self.small_features = features
+        if settings.CLIP_BATCHING_ENABLED:
+            self.small_encoder = MicroBatcher(
+                "clip_small_image",
+                lambda inputs: self._encode_batch(inputs, self.small_model),
+                max_batch_size=settings.CLIP_MAX_BATCH_SIZE,
+                max_wait_ms=settings.CLIP_MAX_WAIT_MS,
+                thread_initializer=pool_thread_initializer("image")
+            )
+        print(f"Cascade search: {settings.CASCADE_BACKBONE} over all images, ViT-L re-ranks "
+              f"the top {settings.CASCADE_TOP_HOTELS} hotels")
+
+    def _encode_batch(self, inputs: List[torch.Tensor], model=None) -> np.ndarray:
+        """Encode preprocessed crops in one forward pass; one normalized row per crop"""
+        model = model or self.model
+        batch = torch.stack(inputs).to(self.device)
+        batch = prepare_input(batch, self.runtime_profile)
+        with inference_context(self.runtime_profile):
+            features = model.encode_image(batch).float()
+            features /= features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy()
+
+    def encode_crops(self, crops: List[Image.Image], backbone: str = "clip") -> List[np.ndarray]:
+        """
+        CLIP features of each crop, batched with concurrent searches when enabled.
+        ``backbone`` is "clip" (ViT-L) or "clip_small" (the cascade's first stage).
+        """
+        if backbone == "clip_small":
+            inputs = [self.small_preprocess(crop) for crop in crops]
+            if self.small_encoder is not None:
+                return self.small_encoder.submit(inputs)
+            return list(self._encode_batch(inputs, self.small_model))
+        inputs = [self.preprocess(crop) for crop in crops]
+        if self.encoder is not None:
+            return self.encoder.submit(inputs)
+        return list(self._encode_batch(inputs))
+
+    def start_batchers(self) -> None:
+        """Start the CLIP batcher threads now; raises if one cannot initialize"""
+        for batcher in (self.encoder, self.small_encoder):
+            if batcher is not None and not batcher.start():
+                raise RuntimeError(f"Batcher '{batcher.name}' failed to initialize")
+
+    def _encode_text(self, phrases: List[str]) -> np.ndarray:
+        """CLIP text embeddings of the phrases, one normalized row each"""
+        tokens = clip.tokenize(phrases, truncate=True).to(self.device)
+        with inference_context(self.runtime_profile):
+            features = self.model.encode_text(tokens).float()
+            features /= features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy()
+
+    def _query_embeddings(self, image: Image.Image, crops) -> Dict[str, np.ndarray]:
+        """
+        Crop embeddings keyed by backbone. With the cascade, the small model
+        encodes every crop and ViT-L only the first CASCADE_RERANK_CROPS.
+        """
+        if self.small_features is None:
+            return {"clip": np.stack(self.encode_crops(multi_scale_crops(image, crops)))}
+        regions = multi_scale_crops(image, crops)
+        return {
+            "clip_small": np.stack(self.encode_crops(regions, backbone="clip_small")),
+            "clip": np.stack(self.encode_crops(regions[:max(1, settings.CASCADE_RERANK_CROPS)]))
+        }
+
+    def _file_versions(self) -> Tuple:
+        """(name, mtime, size) of the feature, index and mapping files on disk"""
+        versions = []
+        for path in sorted(self.index_dir.glob("hotel_*.np[yz]")) + [self.index_dir / "mapping.pkl"]:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            versions.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(versions)
+
+    def features_version(self) -> Tuple:
+        """Version of the index files, re-read at most once per index_check_interval"""
+        now = time.monotonic()
+        if now - self._features_checked_at >= self.index_check_interval:
+            self._features_checked_at = now
+            self._features_version = self._file_versions()
+        return self._features_version
+
+    def index_version(self):
+        """Changes whenever cached search results could be stale"""
+        return (self.features_version(), self.catalog.snapshot().version)
+
+    def _eligible_images(
+        self, max_price: Optional[int], min_stars: Optional[int], hotel_ids: Optional[List[int]]
+    ) -> Optional[np.ndarray]:
+        """Indices of the images passing the filters, or None when there are no filters"""
+        if max_price is None and min_stars is None and hotel_ids is None:
+            return None
+        return self.image_attributes().eligible(max_price, min_stars, hotel_ids)
+
+    def image_attributes(self) -> ImageAttributes:
+        """Per-image price and stars for filtering, rebuilt when the catalog reloads"""
+        snapshot = self.catalog.snapshot()
+        attributes = self._image_attributes
+        if attributes is None or attributes.version != snapshot.version:
+            attributes = ImageAttributes(snapshot, self.hotel_groups.image_hotel)
+            self._image_attributes = attributes
+        return attributes
+
+    @staticmethod
+    def _rows(features, rows: Optional[np.ndarray]):
+        """The given rows of a feature matrix as an array, or the whole matrix for None"""
+        return features if rows is None else np.asarray(features[rows])
+
+    def _scatter(self, rows: Optional[np.ndarray], values: np.ndarray, fill: float) -> np.ndarray:
+        """Per-image scores from the scores of the given rows (all rows for None)"""
+        if rows is None:
+            return values
+        scores = np.full(len(self.color_features), fill, dtype=np.float32)
+        scores[rows] = values
+        return scores
+
     def extract_color_texture_signature(self, image: Image.Image) -> np.ndarray:
         """Extract color and texture signature from image"""
-        img_small = image.resize((64, 64))
-        img_arr = np.array(img_small)
-        
-        # Color histogram
-        hist, _ = np.histogramdd(img_arr.reshape(-1, 3), bins=(4, 4, 4), range=((0,256), (0,256), (0,256)))
-        hist = hist.flatten()
-        hist /= (hist.sum() + 1e-7)
-        
-        # Texture signature
-        img_gray = ImageOps.grayscale(img_small)
-        img_gray_arr = np.array(img_gray).astype(float)
-        dx = np.diff(img_gray_arr, axis=1)
-        dy = np.diff(img_gray_arr, axis=0)
-        texture_sig = np.array([np.mean(dx**2), np.std(dx**2), np.mean(dy**2), np.std(dy**2)])
-        texture_sig /= (np.linalg.norm(texture_sig) + 1e-7)
-        
-        return np.concatenate([hist, texture_sig]).astype("float32")
+        return color_texture_signature(image)
     
     def get_hotel_details(self, hotel_id: int) -> Optional[Dict[str, Any]]:
-        """Get hotel details from database"""
+        """Get hotel details from the in-memory catalog"""
         try:
-            image_search_path = Path(__file__).parent.parent.parent / "image_search"
-            db_path = image_search_path / "hotels.db"
-            
-            if not db_path.exists():
-                return None
-                
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
-            cursor.execute("SELECT name, stars, price, description FROM hotels WHERE id = ?", (hotel_id,))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                return {
-                    "name": row[0],
-                    "stars": row[1],
-                    "price": row[2],
-                    "description": row[3]
-                }
-            return None
+            return self.catalog.get(hotel_id)
         except Exception as e:
             print(f"Error getting hotel details: {e}")
             return None
@@ -123,10 +287,43 @@ class ImageSearchService:
             print(f"Error converting path to URL: {e}")
             return file_path
     
+    def _format_results(self, sorted_hotels: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """API results for ranked (hotel_id, best match) pairs, with details from the catalog"""
+        with stage_timer("hotel_details"):
+            details_by_id = self.catalog.get_many([hotel_id for hotel_id, _ in sorted_hotels])
+        results = []
+        for hotel_id, res in sorted_hotels:
+            hotel_details = details_by_id.get(hotel_id)
+            if hotel_details:
+                # Convert file system path to API endpoint URL
+                image_path = res["image_path"]
+                best_match_url = self._convert_path_to_api_url(image_path, hotel_details["name"])
+                
+                result = {
+                    "hotel_id": str(hotel_id),
+                    "name": hotel_details["name"],
+                    "stars": hotel_details["stars"],
+                    "price": hotel_details["price"],
+                    "description": hotel_details["description"],
+                    "similarity_score": res["score"],
+                    "score_breakdown": {
+                        "ai_semantic_score": res["ai_score"],
+                        "color_texture_score": res["color_score"]
+                    },
+                    "best_match_image_path": best_match_url,
+                    "image_index": res["image_index"]
+                }
+                results.append(result)
+        return results
+    
     def search_similar_hotels(
         self, 
         image: Image.Image, 
-        top_k: int = 3
+        top_k: int = 3,
+        quality_tier: str = "full",
+        max_price: Optional[int] = None,
+        min_stars: Optional[int] = None,
+        hotel_ids: Optional[List[int]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for similar hotels based on image
@@ -134,91 +331,186 @@ class ImageSearchService:
         Args:
             image: PIL Image object
             top_k: Number of top matches to return
+            quality_tier: "full" (every IMAGE_SEARCH_CROPS crop + color/texture),
+                "single_crop" (first crop only + color/texture) or "color_only" (no CLIP), chosen
+                by the degradation controller under load
+            max_price: Only hotels priced at most this
+            min_stars: Only hotels with at least this many stars
+            hotel_ids: Only these hotels
             
         Returns:
-            List of hotel matches with scores and details
+            List of hotel matches with scores and details; the top_k best eligible
+            hotels whenever that many pass the filters
         """
-        if self.model is None or self.ai_features is None or self.color_features is None:
+        use_clip = quality_tier != "color_only"
+        if self.color_features is None or self.hotel_groups is None:
+            return []
+        if use_clip and (self.model is None or self.ai_features is None):
             return []
         
         try:
+            # Repeated or near-identical uploads reuse an earlier search
+            cached = None
+            filtered = max_price is not None or min_stars is not None or hotel_ids is not None
+            if self.result_cache is not None:
+                with stage_timer("image_hash"):
+                    image_hash = perceptual_hash(image)
+                    version = self.index_version()
+                cached, exact = self.result_cache.lookup(image_hash, version)
+                # Cached results are unfiltered; a filtered search only reuses the embeddings
+                if exact and cached.top_k >= top_k and not filtered:
+                    record_cache("image_search", hit=True)
+                    return copy.deepcopy(cached.results[:top_k])
+                record_cache("image_search", hit=False, near_hit=cached is not None)
+
             # Pre-process image
             enhanced_image = image.filter(ImageFilter.SHARPEN)
             enhanced_image = ImageOps.autocontrast(enhanced_image)
             
-            # Multi-scale analysis
-            w, h = enhanced_image.size
-            crops = [
-                enhanced_image,
-                enhanced_image.crop((w*0.1, h*0.1, w*0.9, h*0.9)),
-                enhanced_image.crop((w*0.2, h*0.2, w*0.8, h*0.8))
-            ]
-            
             # AI Semantic Score
-            ai_scores_list = []
-            with torch.no_grad():
-                for crop in crops:
-                    crop_input = self.preprocess(crop).unsqueeze(0).to(self.device)
-                    feat = self.model.encode_image(crop_input)
-                    feat /= feat.norm(dim=-1, keepdim=True)
-                    ai_scores_list.append(np.dot(self.ai_features, feat.cpu().numpy().T).flatten())
-            ai_scores = np.max(np.vstack(ai_scores_list), axis=0)
-            
-            # Color/Texture Score
-            color_query = self.extract_color_texture_signature(enhanced_image)
-            color_scores = np.dot(self.color_features, color_query.T).flatten()
-            
-            # Hybrid Fusion: 70% AI + 30% Color/Texture
-            final_scores = (0.7 * ai_scores) + (0.3 * color_scores)
+            embeddings = {}
+            if use_clip and cached is not None:
+                embeddings = {
+                    backbone: rows if quality_tier == "full" else rows[:1]
+                    for backbone, rows in cached.embeddings.items()
+                }
+            elif use_clip:
+                # Multi-scale analysis
+                with stage_timer("clip_encode"):
+                    embeddings = self._query_embeddings(
+                        enhanced_image, self.crops if quality_tier == "full" else self.crops[:1]
+                    )
             
-            # Group by hotel and track best match
-            hotel_results = {}
-            for i, score in enumerate(final_scores):
-                if i in self.mapping:
-                    h_info = self.mapping[i]
-                    h_id = h_info["hotel_id"]
-                    ai_score = ai_scores[i]
-                    color_score = color_scores[i]
+            with stage_timer("feature_scoring"):
+                # Filters select the eligible images up front; only those are scored
+                eligible = self._eligible_images(max_price, min_stars, hotel_ids)
+                if eligible is not None and not len(eligible):
+                    return []
+                rows = slice(None) if eligible is None else eligible
+                n_images = len(self.color_features)
+
+                # Color/Texture Score
+                color_query = self.extract_color_texture_signature(enhanced_image)
+                color_scores = self._scatter(eligible, self._rows(self.color_features, eligible) @ color_query, 0.0)
+                
+                candidate_ids = None  # Images that were scored, when not all of them
+                if use_clip and "clip_small" in embeddings:
+                    # Cascade: the small backbone picks the hotels, ViT-L ranks their images
+                    coarse_scores = self._scatter(
+                        eligible,
+                        0.7 * best_crop_scores(self._rows(self.small_features, eligible), embeddings["clip_small"])
+                        + 0.3 * color_scores[rows],
+                        -np.inf
+                    )
+                    candidate_ids = cascade_candidates(self.hotel_groups, coarse_scores, settings.CASCADE_TOP_HOTELS)
+                    # With filters, fewer than N hotels may be eligible
+                    candidate_ids = candidate_ids[np.isfinite(coarse_scores[candidate_ids])]
+                    candidate_scores = best_crop_scores(
+                        np.asarray(self.ai_features[candidate_ids]), embeddings["clip"]
+                    )
+                elif use_clip and eligible is not None:
+                    # Filtered: every eligible image is scored exactly, so an approximate
+                    # index can't leave fewer than top_k eligible hotels
+                    candidate_ids = eligible
+                    candidate_scores = best_crop_scores(self._rows(self.ai_features, eligible), embeddings["clip"])
+                elif use_clip and self.vector_index.kind == "exact":
+                    # One product against the index for all crops, best crop per image
+                    ai_scores = best_crop_scores(self.ai_features, embeddings["clip"])
                     
-                    if h_id not in hotel_results or score > hotel_results[h_id]["score"]:
-                        hotel_results[h_id] = {
-                            "score": float(score),
-                            "ai_score": float(ai_score),
-                            "color_score": float(color_score),
-                            "image_path": h_info["image_path"],
-                            "image_index": i
-                        }
-            
-            # Sort and get top k
-            sorted_hotels = sorted(hotel_results.items(), key=lambda x: x[1]["score"], reverse=True)[:top_k]
+                    # Hybrid Fusion: 70% AI + 30% Color/Texture
+                    final_scores = (0.7 * ai_scores) + (0.3 * color_scores)
+                elif use_clip:
+                    # Approximate index: only the best AI candidates are fused and ranked
+                    candidate_ids, candidate_scores = self.vector_index.search(
+                        embeddings["clip"], settings.VECTOR_INDEX_CANDIDATES
+                    )
+                else:
+                    ai_scores = None
+                    final_scores = self._scatter(eligible, color_scores[rows], -np.inf)
+
+                if candidate_ids is not None:
+                    ai_scores = np.zeros(n_images, dtype=np.float32)
+                    ai_scores[candidate_ids] = candidate_scores
+                    final_scores = np.full(n_images, -np.inf, dtype=np.float32)
+                    final_scores[candidate_ids] = 0.7 * candidate_scores + 0.3 * color_scores[candidate_ids]
+                
+                # Best image per hotel and top k hotels, vectorized over the index
+                top_ids, best_scores, best_images = self.hotel_groups.top_hotels(final_scores, top_k)
+                sorted_hotels = [
+                    (int(h_id), {
+                        "score": float(score),
+                        "ai_score": float(ai_scores[i]) if ai_scores is not None else None,
+                        "color_score": float(color_scores[i]),
+                        "image_path": self.mapping[int(i)]["image_path"],
+                        "image_index": int(i)
+                    })
+                    for h_id, score, i in zip(top_ids, best_scores, best_images)
+                    if np.isfinite(score)  # Hotels with no candidate image
+                ]
             
-            # Format results
-            results = []
-            for hotel_id, res in sorted_hotels:
-                hotel_details = self.get_hotel_details(hotel_id)
-                if hotel_details:
-                    # Convert file system path to API endpoint URL
-                    image_path = res["image_path"]
-                    best_match_url = self._convert_path_to_api_url(image_path, hotel_details["name"])
-                    
-                    result = {
-                        "hotel_id": str(hotel_id),
-                        "name": hotel_details["name"],
-                        "stars": hotel_details["stars"],
-                        "price": hotel_details["price"],
-                        "description": hotel_details["description"],
-                        "similarity_score": res["score"],
-                        "score_breakdown": {
-                            "ai_semantic_score": res["ai_score"],
-                            "color_texture_score": res["color_score"]
-                        },
-                        "best_match_image_path": best_match_url,
-                        "image_index": res["image_index"]
-                    }
-                    results.append(result)
+            results = self._format_results(sorted_hotels)
             
+            # Only embeddings computed from this image are cached, so near
+            # hits never chain away from the original query
+            if self.result_cache is not None and cached is None and quality_tier == "full" and not filtered:
+                self.result_cache.store(image_hash, version, top_k, copy.deepcopy(results), embeddings)
             return results
             
         except Exception as e:
             print(f"Error in image search: {e}")
             return []
+
+    def search_by_text(
+        self,
+        query: str,
+        top_k: int = 3,
+        max_price: Optional[int] = None,
+        min_stars: Optional[int] = None,
+        hotel_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search hotels whose photos match a text description, e.g. "infinity pool"
+        
+        The query's CLIP text embedding comes from the phrase table (persisted
+        common phrases, an LRU for the rest) and scores the image index with one
+        matrix product; filters work as in search_similar_hotels.
+        """
+        if self.text_table is None or self.hotel_groups is None:
+            return []
+        
+        try:
+            with stage_timer("text_embedding"):
+                embedding, hit = self.text_table.lookup(query)
+            record_cache("text_embedding", hit)
+            
+            with stage_timer("feature_scoring"):
+                eligible = self._eligible_images(max_price, min_stars, hotel_ids)
+                if eligible is not None and not len(eligible):
+                    return []
+                if eligible is None and self.vector_index.kind != "exact":
+                    candidate_ids, candidate_scores = self.vector_index.search(
+                        embedding[None], settings.VECTOR_INDEX_CANDIDATES
+                    )
+                else:
+                    candidate_ids = eligible
+                    candidate_scores = best_crop_scores(self._rows(self.ai_features, eligible), embedding[None])
+                scores = self._scatter(candidate_ids, candidate_scores, -np.inf)
+                
+                top_ids, best_scores, best_images = self.hotel_groups.top_hotels(scores, top_k)
+                sorted_hotels = [
+                    (int(h_id), {
+                        "score": float(score),
+                        "ai_score": float(score),
+                        "color_score": None,
+                        "image_path": self.mapping[int(i)]["image_path"],
+                        "image_index": int(i)
+                    })
+                    for h_id, score, i in zip(top_ids, best_scores, best_images)
+                    if np.isfinite(score)
+                ]
+            
+            return self._format_results(sorted_hotels)
+            
+        except Exception as e:
+            print(f"Error in text search: {e}")
+            return []
@@ -5,9 +5,12 @@ Integrates content moderation from moderation module (Node.js)
 import subprocess
 import json
 import os
+import tempfile
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+from utils.metrics import stage_timer
+
 
 class ModerationService:
     """Service for content moderation using Node.js module"""
@@ -57,21 +60,24 @@ async function moderate() {{
 moderate();
 """
             
-            # Write temporary script
-            temp_script = self.moderation_path / "temp_moderate.js"
-            with open(temp_script, "w") as f:
+            # Write temporary script; one file per call, since calls run concurrently on the moderation pool
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.moderation_path, prefix="temp_moderate_", suffix=".js", delete=False
+            ) as f:
                 f.write(script_content)
+            temp_script = Path(f.name)
             
             try:
                 # Run Node.js script
                 # Use absolute path to node if available, otherwise rely on PATH
-                result = subprocess.run(
-                    ["node", str(temp_script)],
-                    cwd=str(self.moderation_path),
-                    capture_output=True,
-                    text=True,
-                    timeout=30  # Increased timeout for AI model loading (first-time can take longer)
-                )
+                with stage_timer("moderation_node_spawn"):
+                    result = subprocess.run(
+                        ["node", str(temp_script)],
+                        cwd=str(self.moderation_path),
+                        capture_output=True,
+                        text=True,
+                        timeout=30  # Increased timeout for AI model loading (first-time can take longer)
+                    )
                 
                 if result.returncode != 0:
                     raise Exception(f"Node.js error: {result.stderr}")
@@ -87,8 +93,7 @@ moderate();
                 
             finally:
                 # Clean up temp script
-                if temp_script.exists():
-                    temp_script.unlink()
+                temp_script.unlink(missing_ok=True)
                     
         except subprocess.TimeoutExpired as e:
             raise Exception("Moderation service timeout")
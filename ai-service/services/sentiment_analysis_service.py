@@ -7,32 +7,57 @@ import os
 from pathlib import Path
 from typing import List, Dict, Any
 
-# Add sentiment_analysis to path
-sentiment_analysis_path = Path(__file__).parent.parent.parent / "sentiment_analysis"
-if str(sentiment_analysis_path) not in sys.path:
-    sys.path.insert(0, str(sentiment_analysis_path))
+from utils.runtime_profile import (
+    get_runtime_profile, apply_process_settings, prepare_model, inference_context
+)
 
-# Import from sentiment_analysis modules
-try:
-    from sentiment_analysis.sentiment_pipeline import process_message
-    from sentiment_analysis.sentiment_aggregator import aggregate_sentiment_by_tags
-except ImportError:
-    # Fallback if relative imports don't work
-    import importlib.util
+# Cache for the imported sentiment_analysis functions
+_sentiment_functions = None
+
+
+def _get_sentiment_functions():
+    """
+    Lazy import of the sentiment_analysis pipeline (torch and transformers)
+    so importing this module stays cheap.
+
+    Returns:
+        Tuple of (process_message, get_sentiment_analyzer, aggregate_sentiment_by_tags)
+    """
+    global _sentiment_functions
     
-    # Import pipeline
-    pipeline_path = sentiment_analysis_path / "sentiment_pipeline" / "pipeline.py"
-    spec = importlib.util.spec_from_file_location("pipeline", pipeline_path)
-    pipeline_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(pipeline_module)
-    process_message = pipeline_module.process_message
+    if _sentiment_functions is None:
+        # Add sentiment_analysis to path
+        sentiment_analysis_path = Path(__file__).parent.parent.parent / "sentiment_analysis"
+        if str(sentiment_analysis_path) not in sys.path:
+            sys.path.insert(0, str(sentiment_analysis_path))
+        
+        # Import from sentiment_analysis modules
+        try:
+            from sentiment_analysis.sentiment_pipeline import process_message
+            from sentiment_analysis.sentiment_analyzer import get_sentiment_analyzer
+            from sentiment_analysis.sentiment_aggregator import aggregate_sentiment_by_tags
+        except ImportError:
+            # Fallback if relative imports don't work
+            import importlib.util
+            
+            # Import pipeline
+            pipeline_path = sentiment_analysis_path / "sentiment_pipeline" / "pipeline.py"
+            spec = importlib.util.spec_from_file_location("pipeline", pipeline_path)
+            pipeline_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(pipeline_module)
+            process_message = pipeline_module.process_message
+            get_sentiment_analyzer = sys.modules["sentiment_analysis.sentiment_analyzer"].get_sentiment_analyzer
+            
+            # Import aggregator
+            aggregator_path = sentiment_analysis_path / "sentiment_aggregator" / "aggregator.py"
+            spec2 = importlib.util.spec_from_file_location("aggregator", aggregator_path)
+            aggregator_module = importlib.util.module_from_spec(spec2)
+            spec2.loader.exec_module(aggregator_module)
+            aggregate_sentiment_by_tags = aggregator_module.aggregate_sentiment_by_tags
+        
+        _sentiment_functions = (process_message, get_sentiment_analyzer, aggregate_sentiment_by_tags)
     
-    # Import aggregator
-    aggregator_path = sentiment_analysis_path / "sentiment_aggregator" / "aggregator.py"
-    spec2 = importlib.util.spec_from_file_location("aggregator", aggregator_path)
-    aggregator_module = importlib.util.module_from_spec(spec2)
-    spec2.loader.exec_module(aggregator_module)
-    aggregate_sentiment_by_tags = aggregator_module.aggregate_sentiment_by_tags
+    return _sentiment_functions
 
 
 class SentimentAnalysisService:
@@ -40,7 +65,22 @@ class SentimentAnalysisService:
     
     def __init__(self):
         """Initialize the sentiment analysis service"""
-        pass
+        self.runtime_profile = get_runtime_profile("sentiment")
+        self._model_prepared = False
+    
+    def warm_up(self):
+        """Load the sentiment model ahead of the first request (used by startup warm-up)"""
+        self._prepare_model()
+    
+    def _prepare_model(self):
+        """Load the sentiment model once and apply the runtime profile to it"""
+        if self._model_prepared:
+            return
+        apply_process_settings()
+        _, get_sentiment_analyzer, _ = _get_sentiment_functions()
+        model, _ = get_sentiment_analyzer()
+        prepare_model(model, self.runtime_profile)
+        self._model_prepared = True
     
     def analyze_message(
         self,
@@ -60,7 +100,10 @@ class SentimentAnalysisService:
                 - has_tags: bool indicating if tags were extracted
         """
         try:
-            result = process_message(message_text)
+            self._prepare_model()
+            process_message, _, _ = _get_sentiment_functions()
+            with inference_context(self.runtime_profile):
+                result = process_message(message_text)
             return result
         except Exception as e:
             raise Exception(f"Error analyzing message sentiment: {str(e)}")
@@ -131,6 +174,7 @@ class SentimentAnalysisService:
                             "tags": msg["tags"]
                         })
             
+            _, _, aggregate_sentiment_by_tags = _get_sentiment_functions()
             result = aggregate_sentiment_by_tags(formatted_messages)
             return result
         except Exception as e:
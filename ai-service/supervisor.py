@@ -0,0 +1,173 @@
+"""
+Pre-fork supervisor for running several ai-service workers.
+
+The parent process loads the warm-up services (CLIP, MiniLM corpus
+embeddings, memory-mapped feature matrices) once, then forks workers that
+inherit them copy-on-write and serve the same listening socket. With N
+workers the model weights are resident once instead of N times.
+
+Usage:
+    python supervisor.py serve --workers 4
+    python supervisor.py report <supervisor_pid>
+
+While serving, send SIGUSR1 to the supervisor to print a shared/private
+memory report for every worker, or pass --report-interval to log one
+periodically.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from config import settings
+from utils.memory import child_pids, format_memory_report
+
+
+class Supervisor:
+    """Loads models once, forks workers and keeps them running"""
+
+    def __init__(self, host: str, port: int, workers: int, report_interval: int = 0):
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.report_interval = report_interval
+        self.workers = {}
+        self.sock = None
+        self.shutting_down = False
+        self.report_requested = False
+
+    def preload(self):
+        """Import the app and load the warm-up services in the parent"""
+        import main
+
+        started = time.perf_counter()
+        threads = main.readiness.start(settings.WARMUP_SERVICES)
+        for thread in threads:
+            thread.join()
+        snapshot = main.readiness.snapshot()
+        print(f"[Supervisor] Preloaded {', '.join(snapshot['services']) or 'no services'} "
+              f"in {time.perf_counter() - started:.1f}s, ready={snapshot['ready']}")
+
+        # Move everything allocated so far out of the collector's generations so
+        # the workers' garbage collections don't write to (and un-share) it
+        gc.collect()
+        gc.freeze()
+        return main.app
+
+    def bind(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+
+    def spawn(self, app):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.time()
+            return
+
+        # Worker: restore default signal handling and serve until told to stop
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        import uvicorn
+        config = uvicorn.Config(app, log_level="info", lifespan="on")
+        server = uvicorn.Server(config)
+        try:
+            server.run(sockets=[self.sock])
+        finally:
+            os._exit(0)
+
+    def _handle_stop(self, signum, frame):
+        self.shutting_down = True
+
+    def _handle_report(self, signum, frame):
+        self.report_requested = True
+
+    def print_report(self):
+        pids = [os.getpid()] + sorted(self.workers)
+        print(format_memory_report(pids, {os.getpid(): "supervisor"}), flush=True)
+
+    def reap(self, app):
+        """Collect exited workers and replace them"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.workers.pop(pid, None)
+            if not self.shutting_down:
+                print(f"[Supervisor] Worker {pid} exited with status {status}, restarting")
+                self.spawn(app)
+
+    def run(self):
+        app = self.preload()
+        self.bind()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGUSR1, self._handle_report)
+
+        for _ in range(self.num_workers):
+            self.spawn(app)
+        print(f"[Supervisor] {self.num_workers} workers serving on {self.host}:{self.port} "
+              f"(supervisor pid {os.getpid()})")
+
+        last_report = time.time()
+        while not self.shutting_down:
+            time.sleep(0.5)
+            self.reap(app)
+            due = self.report_interval and time.time() - last_report >= self.report_interval
+            if self.report_requested or due:
+                self.report_requested = False
+                last_report = time.time()
+                self.print_report()
+
+        print("[Supervisor] Stopping workers")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork supervisor for the AI microservice")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Preload models and fork workers")
+    serve.add_argument("--host", default=settings.HOST)
+    serve.add_argument("--port", type=int, default=settings.PORT)
+    serve.add_argument("--workers", type=int, default=settings.WORKERS)
+    serve.add_argument("--report-interval", type=int, default=0,
+                       help="Print a memory report every N seconds (0 disables)")
+
+    report = sub.add_parser("report", help="Print shared/private memory for a running supervisor")
+    report.add_argument("pid", type=int, help="Supervisor process id")
+
+    args = parser.parse_args()
+    if args.command == "report":
+        pids = [args.pid] + child_pids(args.pid)
+        print(format_memory_report(pids, {args.pid: "supervisor"}))
+        return
+
+    Supervisor(args.host, args.port, args.workers, args.report_interval).run()
+
+
+if __name__ == "__main__":
+    main()
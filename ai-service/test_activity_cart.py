@@ -0,0 +1,63 @@
+"""
+Tests for the shared chat state in ActivityCartManager (services/activity_recommendation_service.py)
+"""
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.activity_recommendation_service import ActivityCartManager
+
+
+def run_concurrently(fn, calls: int):
+    """Run fn(i) from many threads at once"""
+    start = threading.Barrier(8)
+
+    def call(i):
+        if i < 8:
+            start.wait()
+        return fn(i)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(call, range(calls)))
+
+
+def test_concurrent_messages_are_all_counted():
+    """Concurrent messages for one chat are all counted and buffered"""
+    print("Testing concurrent message counting...")
+    manager = ActivityCartManager()
+    counts = run_concurrently(
+        lambda i: manager.increment_message("test-messages", f"user{i % 5}", f"line {i}\nsecond {i}"), 400
+    )
+    assert manager.message_counts["test-messages"] == 800 and sorted(counts) == list(range(2, 801, 2))
+    assert len(manager.message_buffers["test-messages"]) == 800
+    assert manager.get_participant_count("test-messages") == 5
+
+    queries = run_concurrently(lambda i: manager.get_buffer("test-messages", limit=7), 8)
+    assert sum(1 for q in queries if len(q.split()) == 14) == 1, "Only one reader takes the full buffer"
+    print("✓ Counts and buffers are updated atomically")
+
+
+def test_cart_changes_are_atomic():
+    """Concurrent adds respect the cap, removals are not lost and get_cart returns a copy"""
+    print("Testing concurrent cart changes...")
+    manager = ActivityCartManager()
+    added = run_concurrently(lambda i: manager.add_to_cart("test-cart", f"place {i}", "alice", max_items=10), 50)
+    assert sum(added) == 10 and len(manager.get_cart("test-cart")["items"]) == 10
+
+    run_concurrently(lambda i: manager.add_to_cart("test-cart", "place shared", "bob"), 40)
+    run_concurrently(lambda i: manager.remove_from_cart("test-cart", "place shared"), 39)
+    cart = manager.get_cart("test-cart")
+    assert [item["count"] for item in cart["items"] if item["place_name"] == "place shared"] == [1]
+
+    cart["items"].clear()
+    assert len(manager.get_cart("test-cart")["items"]) == 11, "get_cart returns a copy"
+    print("✓ Cart updates hold the lock")
+
+
+if __name__ == "__main__":
+    test_concurrent_messages_are_all_counted()
+    test_cart_changes_are_atomic()
+    print("\n✅ All activity cart tests passed!")
@@ -0,0 +1,127 @@
+"""
+Unit tests for priority-class admission control in utils/admission.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.admission import AdmissionController, AdmissionRejectedError, PriorityClass
+
+
+class FixedCpu:
+    """CPU monitor stand-in that reports a set utilization"""
+
+    def __init__(self, value: float):
+        self.value = value
+
+    def utilization(self) -> float:
+        return self.value
+
+
+def build_controller(cpu: float = 0.0) -> AdmissionController:
+    classes = {
+        "critical": PriorityClass("critical", max_concurrent=2, max_queue=4, max_wait_ms=1000),
+        "batch": PriorityClass("batch", max_concurrent=1, max_queue=1, max_wait_ms=100, shed_cpu=0.85, retry_after=5),
+    }
+    return AdmissionController(
+        classes, {"/moderate": "critical", "/itinerary": "batch"}, "batch", FixedCpu(cpu)
+    )
+
+
+async def hold(controller, route, release: asyncio.Event, admitted: list):
+    async with controller.admit(route) as priority:
+        admitted.append(priority.name)
+        await release.wait()
+
+
+def test_queue_limits_and_timeouts():
+    """A full class queues up to max_queue, then times out or rejects"""
+    print("Testing queueing and rejection...")
+
+    async def scenario():
+        controller = build_controller()
+        release = asyncio.Event()
+        admitted = []
+        running = asyncio.ensure_future(hold(controller, "/itinerary", release, admitted))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(hold(controller, "/itinerary", release, admitted))
+        await asyncio.sleep(0)
+
+        try:
+            await hold(controller, "/itinerary", release, admitted)
+            overflow = None
+        except AdmissionRejectedError as e:
+            overflow = e
+        try:
+            await queued
+            timed_out = None
+        except AdmissionRejectedError as e:
+            timed_out = e
+        stats = controller.stats()["batch"]
+        release.set()
+        await running
+        return overflow, timed_out, stats, controller.stats()["batch"]
+
+    overflow, timed_out, during, after = asyncio.run(scenario())
+    assert overflow is not None and overflow.reason == "queue_full" and overflow.retry_after == 5
+    assert timed_out is not None and timed_out.reason == "timeout"
+    assert during["active"] == 1 and during["queued"] == 0, during
+    assert after["active"] == 0 and after["admitted"] == 1, after
+    print("✓ Overflow is rejected and queued requests time out after max_wait_ms")
+
+
+def test_slots_are_handed_to_waiters_in_order():
+    """Releasing a slot admits the oldest waiter without exceeding the limit"""
+    print("Testing slot hand-over...")
+
+    async def scenario():
+        controller = build_controller()
+        controller.classes["batch"].max_wait_ms = 1000
+        release = asyncio.Event()
+        admitted = []
+        first = asyncio.ensure_future(hold(controller, "/itinerary", release, admitted))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(hold(controller, "/other", release, admitted))
+        await asyncio.sleep(0.01)
+        waiting = controller.stats()["batch"]
+        release.set()
+        await asyncio.gather(first, second)
+        return waiting, admitted, controller.stats()["batch"]
+
+    waiting, admitted, after = asyncio.run(scenario())
+    assert waiting["active"] == 1 and waiting["queued"] == 1, waiting
+    assert admitted == ["batch", "batch"]
+    assert after["active"] == 0 and after["admitted"] == 2, after
+    print("✓ Waiters are admitted as slots free up")
+
+
+def test_cpu_saturation_sheds_low_priority_only():
+    """Above the shed threshold batch is rejected while critical still runs"""
+    print("Testing CPU shedding...")
+
+    async def scenario():
+        controller = build_controller(cpu=0.95)
+        release = asyncio.Event()
+        release.set()
+        admitted = []
+        await hold(controller, "/moderate", release, admitted)
+        try:
+            await hold(controller, "/itinerary", release, admitted)
+            shed = None
+        except AdmissionRejectedError as e:
+            shed = e
+        return admitted, shed
+
+    admitted, shed = asyncio.run(scenario())
+    assert admitted == ["critical"]
+    assert shed is not None and shed.priority == "batch" and shed.reason == "cpu"
+    print("✓ Batch requests are shed first when the CPU is saturated")
+
+
+if __name__ == "__main__":
+    test_queue_limits_and_timeouts()
+    test_slots_are_handed_to_waiters_in_order()
+    test_cpu_saturation_sheds_low_priority_only()
+    print("\n✅ All admission tests passed!")
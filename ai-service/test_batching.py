@@ -0,0 +1,135 @@
+"""
+Unit tests for the micro-batcher in utils/batching.py
+"""
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.batching import BatcherUnavailableError, MicroBatcher
+
+
+def test_concurrent_submissions_share_batches():
+    """Inputs from concurrent callers run together and each caller gets its own rows back"""
+    print("Testing micro-batch formation...")
+    batch_sizes = []
+
+    def run_batch(inputs):
+        batch_sizes.append(len(inputs))
+        time.sleep(0.02)  # Stand-in for a forward pass
+        return [value * 10 for value in inputs]
+
+    batcher = MicroBatcher("test", run_batch, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def caller(index):
+        results[index] = batcher.submit([index, index + 100, index + 200])
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(8):
+        assert results[i] == [i * 10, (i + 100) * 10, (i + 200) * 10], results[i]
+    assert sum(batch_sizes) == 24
+    assert max(batch_sizes) <= 8, "Batches must respect max_batch_size"
+    assert all(size % 3 == 0 for size in batch_sizes), "A caller's inputs are never split"
+    assert len(batch_sizes) < 8, f"Expected shared batches, got {batch_sizes}"
+    print(f"✓ 8 callers ran in {len(batch_sizes)} batches: {batch_sizes}")
+
+
+def test_lone_caller_skips_wait_and_errors_propagate():
+    print("Testing lone callers and errors...")
+    batcher = MicroBatcher("test", lambda inputs: [x + 1 for x in inputs], max_batch_size=16, max_wait_ms=500)
+    started = time.perf_counter()
+    assert batcher.submit([1, 2]) == [2, 3]
+    assert time.perf_counter() - started < 0.25, "A lone caller should not wait for max_wait_ms"
+
+    def failing(inputs):
+        raise ValueError("model failed")
+
+    broken = MicroBatcher("broken", failing)
+    try:
+        broken.submit([1])
+        raised = False
+    except ValueError:
+        raised = True
+    assert raised
+    assert broken.submit([]) == []
+    print("✓ Lone callers dispatch at once and batch errors reach every caller")
+
+
+def test_failed_initializer_fails_submissions():
+    """A batcher whose thread initializer raises fails callers instead of blocking them"""
+    print("Testing a failed batcher thread...")
+    release = threading.Event()
+
+    def initializer():
+        release.wait()
+        raise RuntimeError("no torch")
+
+    batcher = MicroBatcher("test", lambda inputs: inputs, thread_initializer=initializer)
+    errors = []
+
+    def caller():
+        try:
+            batcher.submit([1])
+        except BatcherUnavailableError as e:
+            errors.append(e)
+
+    pending = threading.Thread(target=caller)
+    pending.start()
+    time.sleep(0.05)
+    release.set()
+    pending.join(timeout=2)
+    assert not pending.is_alive() and len(errors) == 1, "The pending caller is failed"
+
+    assert not batcher.start() and not batcher.ready and batcher.stats()["ready"] is False
+    started = time.perf_counter()
+    try:
+        batcher.submit([2])
+        raised = False
+    except BatcherUnavailableError:
+        raised = True
+    assert raised and time.perf_counter() - started < 0.5, "Later callers fail at once"
+    assert MicroBatcher("ok", lambda inputs: inputs).start()
+    print("✓ A batcher that cannot start fails its callers and reports not ready")
+
+
+def test_forked_child_restarts_the_batcher():
+    """A child forked after start() gets its own batcher thread instead of hanging on the parent's"""
+    print("Testing a batcher across fork...")
+    batcher = MicroBatcher("test", lambda inputs: [x * 2 for x in inputs])
+    assert batcher.start() and batcher.submit([1]) == [2]
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: report the result, or time out instead of hanging the test run
+        os.close(read_fd)
+        result = []
+        worker = threading.Thread(target=lambda: result.append(batcher.submit([3, 4])), daemon=True)
+        worker.start()
+        worker.join(timeout=5)
+        os.write(write_fd, repr(result).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        child_result = f.read()
+    os.waitpid(pid, 0)
+    assert child_result == "[[6, 8]]", child_result
+    assert batcher.submit([5]) == [10], "The parent's batcher keeps working"
+    print("✓ Forked workers start their own batcher thread")
+
+
+if __name__ == "__main__":
+    test_concurrent_submissions_share_batches()
+    test_lone_caller_skips_wait_and_errors_propagate()
+    test_failed_initializer_fails_submissions()
+    test_forked_child_restarts_the_batcher()
+    print("\n✅ All batching tests passed!")
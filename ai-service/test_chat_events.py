@@ -0,0 +1,128 @@
+"""
+Tests for the /api/v1/chat/events fan-out endpoint and incremental hotel preferences
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("WARMUP_SERVICES", "none")
+
+from fastapi.testclient import TestClient
+
+import main
+
+CHAT = [
+    {"user_id": "u1", "text": "Let's stay near the beach, a pool would be great"},
+    {"user_id": "u2", "text": "I found one for $300 but that is too expensive"},
+    {"user_id": "u3", "text": "No pool needed, but I want a spa. $150 max"},
+    {"user_id": "u1", "text": "Actually barcelona city centre is better"},
+]
+
+
+def test_incremental_preferences_match_full_history():
+    """Applying messages one at a time gives the same preferences as the whole chat"""
+    print("Testing incremental hotel preferences...")
+    main.init_hotel_recommendation_service()
+    service = main.hotel_recommendation_service
+
+    full = service.get_recommendations_from_chat(CHAT, limit=3)
+    for message in CHAT:
+        incremental = service.update_chat_preferences("test-incremental", [message], limit=3)
+
+    assert incremental["extracted_preferences"] == full["extracted_preferences"], incremental
+    assert incremental["recommendations"] == full["recommendations"]
+    print("✓ Incremental preferences match extraction over the full history")
+
+
+def test_chat_preferences_are_bounded():
+    """Per-chat preferences are evicted least recently used and after the idle TTL"""
+    print("Testing chat preference eviction...")
+    main.init_hotel_recommendation_service()
+    service = main.hotel_recommendation_service
+    saved = service.chat_preferences, service.max_chats, service.ttl_seconds
+    service.chat_preferences, service.max_chats = type(saved[0])(), 2
+    try:
+        for chat_id in ("a", "b", "a", "c"):
+            service.update_chat_preferences(chat_id, CHAT[:1])
+        assert list(service.chat_preferences) == ["a", "c"], "b was least recently used"
+        assert service.update_chat_preferences("a", CHAT[1:2])["extracted_preferences"]["area"] == "beach"
+
+        service.ttl_seconds = 0.05
+        service.update_chat_preferences("a", CHAT[:1])
+        time.sleep(0.1)
+        service.update_chat_preferences("c", CHAT[1:2])
+        assert list(service.chat_preferences) == ["c"], "Idle chats expire"
+        time.sleep(0.1)
+        fresh = service.update_chat_preferences("c", CHAT[1:2])["extracted_preferences"]
+        assert fresh["area"] is None, "An expired chat starts again from its next messages"
+    finally:
+        service.chat_preferences, service.max_chats, service.ttl_seconds = saved
+    print("✓ Chat preferences are kept in a bounded LRU")
+
+
+def test_recommendations_use_up_to_date_chat_state():
+    """/hotels/recommend with a chat_id uses the chat's state only when it has seen the last message"""
+    print("Testing recommendations from chat state...")
+    main.init_hotel_recommendation_service()
+    service = main.hotel_recommendation_service
+    client = TestClient(main.app)
+    for message in CHAT[:3]:
+        service.update_chat_preferences("test-state", [message])
+
+    def recommend(messages, chat_id="test-state"):
+        response = client.post("/api/v1/hotels/recommend", json={"messages": messages, "limit": 3, "chat_id": chat_id})
+        assert response.status_code == 200, response.text
+        data = response.json()
+        return {"extracted_preferences": data["extracted_preferences"], "recommendations": data["recommendations"]}
+
+    # The backend only sends recent messages; the state still covers the whole chat
+    recent = [dict(CHAT[2], text="  No pool needed, but I want a spa.   $150 max ")]
+    from_state = recommend(recent)
+    assert from_state == service.get_recommendations_from_chat(CHAT[:3], limit=3)
+    assert from_state["extracted_preferences"]["area"] == "beach"
+
+    # A message this worker has not seen, or an unknown chat: use the messages sent
+    assert recommend(CHAT[2:4]) == service.get_recommendations_from_chat(CHAT[2:4], limit=3)
+    assert recommend(recent, chat_id="test-unknown")["extracted_preferences"]["area"] is None
+    print("✓ Up-to-date chat state is used, otherwise the messages sent")
+
+
+def test_chat_events_fan_out():
+    """One call updates the activity buffer and hotel preferences together"""
+    print("Testing chat event fan-out...")
+    client = TestClient(main.app)
+    response = client.post("/api/v1/chat/events", json={
+        "chat_id": "test-events",
+        "events": [
+            {"user": "alice", "user_id": "u1", "message": "  Hotel with a spa please \n\n near the beach "},
+            {"user": "bob", "user_id": "u2", "message": "   "},
+            {"user": "bob", "user_id": "u2", "message": "Budget is $120"},
+        ],
+        "features": ["activities", "hotel_preferences"]
+    })
+    assert response.status_code == 200, response.text
+    data = response.json()
+
+    assert data["event_count"] == 2, "Blank messages should be skipped"
+    assert data["errors"] == {} and data["error_status"] == {}, data["errors"]
+    assert data["moderation"] is None and data["sentiment"] is None
+    assert data["activities"]["message_count"] == 3  # One count per non-blank line
+    preferences = data["hotel_preferences"]["extracted_preferences"]
+    assert preferences["area"] == "beach" and preferences["max_price"] == 120.0
+    assert "Spa" in preferences["amenities"]
+
+    rejected = client.post("/api/v1/chat/events", json={
+        "chat_id": "test-events", "events": [{"user": "bob", "message": "hi"}], "features": ["weather"]
+    })
+    assert rejected.status_code == 400
+    print("✓ Features run together and report in one response")
+
+
+if __name__ == "__main__":
+    test_incremental_preferences_match_full_history()
+    test_chat_preferences_are_bounded()
+    test_recommendations_use_up_to_date_chat_state()
+    test_chat_events_fan_out()
+    print("\n✅ All chat event tests passed!")
@@ -0,0 +1,96 @@
+"""
+Unit tests for request coalescing and idempotency keys in utils/coalesce.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.coalesce import RequestCoalescer, IdempotencyKeyConflictError, canonical_key, bytes_key
+
+
+def test_concurrent_duplicates_share_one_computation():
+    """Identical in-flight requests run the work once and share result and errors"""
+    print("Testing in-flight coalescing...")
+    calls = []
+
+    async def scenario():
+        coalescer = RequestCoalescer()
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"hotels": [1, 2, 3]}
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("model failed")
+
+        key = canonical_key("/recommend", {"messages": ["a"], "limit": 5})
+        results = await asyncio.gather(*[coalescer.run("/recommend", key, compute) for _ in range(5)])
+
+        errors = await asyncio.gather(
+            *[coalescer.run("/recommend", "other", failing) for _ in range(3)], return_exceptions=True
+        )
+        # Nothing is kept once the computation finishes
+        after, outcome = await coalescer.run("/recommend", key, compute)
+        return results, errors, outcome, coalescer.stats()
+
+    results, errors, outcome, stats = asyncio.run(scenario())
+    assert len(calls) == 3, f"Expected one run per key plus the later request, got {len(calls)}"
+    assert all(r[0] == {"hotels": [1, 2, 3]} for r in results)
+    assert sorted(r[1] for r in results) == ["leader", "shared", "shared", "shared", "shared"]
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert outcome == "leader" and stats == {"in_flight": 0, "retained": 0}, stats
+    print("✓ Duplicates share one computation, including its error")
+
+
+def test_idempotency_key_replays_and_detects_conflicts():
+    """Results with an idempotency key are replayed; reuse with another body fails"""
+    print("Testing idempotency keys...")
+    calls = []
+
+    async def scenario():
+        coalescer = RequestCoalescer(retention_seconds=60)
+
+        async def compute():
+            calls.append(1)
+            return "itinerary"
+
+        key = bytes_key("/similar", b"\x89PNG same photo")
+        first = await coalescer.run("/similar", key, compute, idempotency_key="retry-1")
+        replay = await coalescer.run("/similar", key, compute, idempotency_key="retry-1")
+        try:
+            await coalescer.run("/similar", bytes_key("/similar", b"other"), compute, idempotency_key="retry-1")
+            conflict = None
+        except IdempotencyKeyConflictError as e:
+            conflict = e
+
+        coalescer.retention_seconds = 0
+        await coalescer.run("/similar", key, compute, idempotency_key="retry-2")
+        await asyncio.sleep(0.01)
+        expired = await coalescer.run("/similar", key, compute, idempotency_key="retry-2")
+        return first, replay, conflict, expired
+
+    first, replay, conflict, expired = asyncio.run(scenario())
+    assert first == ("itinerary", "leader") and replay == ("itinerary", "replayed")
+    assert conflict is not None
+    assert expired[1] == "leader", "Expired results should not be replayed"
+    assert len(calls) == 3
+    print("✓ Retries replay within the window and conflicting reuse is rejected")
+
+
+def test_canonical_key_ignores_key_order():
+    print("Testing canonical keys...")
+    assert canonical_key("/r", {"a": 1, "b": [1, 2]}) == canonical_key("/r", {"b": [1, 2], "a": 1})
+    assert canonical_key("/r", {"a": 1}) != canonical_key("/other", {"a": 1})
+    print("✓ Keys depend on route and content, not key order")
+
+
+if __name__ == "__main__":
+    test_concurrent_duplicates_share_one_computation()
+    test_idempotency_key_replays_and_detects_conflicts()
+    test_canonical_key_ignores_key_order()
+    print("\n✅ All coalescing tests passed!")
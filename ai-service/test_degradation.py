@@ -0,0 +1,77 @@
+"""
+Unit tests for the load-aware quality tiers in utils/degradation.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.degradation import DegradationController, IMAGE_SEARCH_TIERS, percentile
+
+
+def build_controller(queue):
+    controller = DegradationController(
+        lambda pool: {"workers": 1, "queue_depth": 8, "active": 1, "queued": queue["queued"]},
+        queue_ratio_limit=0.5,
+        eval_seconds=0,
+        recovery_seconds=0.05
+    )
+    controller.register("image_search", IMAGE_SEARCH_TIERS, "image", p95_limit_seconds=1.0)
+    return controller
+
+
+def test_queue_depth_steps_down_one_tier_at_a_time():
+    """A backed-up pool lowers the tier step by step, and recovery restores it"""
+    print("Testing queue-driven degradation...")
+    queue = {"queued": 0}
+    controller = build_controller(queue)
+    assert controller.tier("image_search") == "full"
+
+    queue["queued"] = 6
+    assert controller.tier("image_search") == "single_crop"
+    assert controller.tier("image_search") == "color_only"
+    assert controller.tier("image_search") == "color_only", "Cheapest tier is the floor"
+
+    queue["queued"] = 3  # Below the limit but not yet healthy: hold
+    time.sleep(0.06)
+    assert controller.tier("image_search") == "color_only"
+
+    queue["queued"] = 0
+    assert controller.tier("image_search") == "single_crop"
+    assert controller.tier("image_search") == "single_crop", "Recovery waits recovery_seconds per step"
+    time.sleep(0.06)
+    assert controller.tier("image_search") == "full"
+    print("✓ Tiers step down under queue pressure and recover one step at a time")
+
+
+def test_p95_latency_degrades_and_force_pins():
+    """Slow recent requests lower the tier; a forced tier overrides the controller"""
+    print("Testing latency-driven degradation...")
+    controller = build_controller({"queued": 0})
+
+    controller.observe("image_search", 5.0)
+    assert controller.tier("image_search") == "full", "One slow request is not enough samples"
+    for _ in range(9):
+        controller.observe("image_search", 1.5)
+    assert controller.tier("image_search") == "single_crop"
+    assert controller.snapshot()["image_search"]["level"] == 1
+
+    controller.force("image_search", "color_only")
+    assert controller.tier("image_search") == "color_only"
+    controller.force("image_search", None)
+    assert controller.tier("image_search") == "single_crop"
+    try:
+        controller.force("image_search", "thumbnail")
+        raised = False
+    except ValueError:
+        raised = True
+    assert raised
+    assert percentile([0.1 * i for i in range(1, 21)], 0.95) == 0.1 * 19
+    print("✓ p95 above the limit degrades, and forced tiers take precedence")
+
+
+if __name__ == "__main__":
+    test_queue_depth_steps_down_one_tier_at_a_time()
+    test_p95_latency_degrades_and_force_pins()
+    print("\n✅ All degradation tests passed!")
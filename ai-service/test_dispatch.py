@@ -0,0 +1,96 @@
+"""
+Unit tests for the bounded service pools in utils/dispatch.py
+"""
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.dispatch import Dispatcher, PoolSaturatedError, ServicePool
+
+
+def test_pool_runs_blocking_work_off_the_loop():
+    """Blocking calls run on pool threads, not on the event loop thread"""
+    print("Testing pool execution thread...")
+
+    async def scenario():
+        pool = ServicePool("image", max_workers=1, queue_depth=1)
+        loop_thread = threading.get_ident()
+        worker_thread = await pool.run(threading.get_ident)
+        pool.shutdown()
+        return loop_thread, worker_thread
+
+    loop_thread, worker_thread = asyncio.run(scenario())
+    assert loop_thread != worker_thread, "Work should not run on the event loop thread"
+    print("✓ Blocking work runs on a pool thread")
+
+
+def test_pool_rejects_when_queue_is_full():
+    """Once workers and queue are full, new calls fail fast"""
+    print("Testing saturation rejection...")
+    release = threading.Event()
+
+    async def scenario():
+        pool = ServicePool("image", max_workers=1, queue_depth=1, retry_after=3)
+        running = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        try:
+            await pool.run(release.wait)
+            rejected = None
+        except PoolSaturatedError as e:
+            rejected = e
+        elapsed = time.perf_counter() - started
+        stats = pool.stats()
+
+        release.set()
+        await asyncio.gather(running, queued)
+        pool.shutdown()
+        return rejected, elapsed, stats
+
+    rejected, elapsed, stats = asyncio.run(scenario())
+    assert rejected is not None, "Third call should be rejected"
+    assert rejected.retry_after == 3
+    assert elapsed < 0.05, f"Rejection should be immediate, took {elapsed:.3f}s"
+    assert stats["active"] == 1 and stats["queued"] == 1 and stats["rejected"] == 1, stats
+    print("✓ Saturated pool rejects immediately")
+
+
+def test_saturated_pool_does_not_block_other_pools():
+    """A busy pool leaves the loop and other pools responsive"""
+    print("Testing pool isolation...")
+    release = threading.Event()
+
+    async def scenario():
+        dispatcher = Dispatcher({
+            "itinerary": ServicePool("itinerary", max_workers=1, queue_depth=0),
+            "moderation": ServicePool("moderation", max_workers=1, queue_depth=0),
+        })
+        slow = asyncio.ensure_future(dispatcher.run("itinerary", release.wait))
+        await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        result = await dispatcher.run("moderation", lambda: "ok")
+        elapsed = time.perf_counter() - started
+
+        release.set()
+        await slow
+        dispatcher.shutdown()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == "ok"
+    assert elapsed < 0.5, f"Moderation should not wait on itinerary, took {elapsed:.3f}s"
+    print("✓ Busy itinerary pool does not delay moderation")
+
+
+if __name__ == "__main__":
+    test_pool_runs_blocking_work_off_the_loop()
+    test_pool_rejects_when_queue_is_full()
+    test_saturated_pool_does_not_block_other_pools()
+    print("\n✅ All dispatch tests passed!")
@@ -0,0 +1,76 @@
+"""
+Unit tests for the quantized feature matrices in image_search/feature_store.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "image_search"))
+
+import feature_store
+from feature_store import QuantizedFeatures, load_features, save_array, write_quantized
+from visual_features import best_crop_scores
+
+
+def test_quantized_copies_score_like_float32():
+    print("Testing float16 and int8 feature matrices...")
+    rng = np.random.default_rng(0)
+    features = rng.standard_normal((1000, 48)).astype(np.float32)
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+    queries = features[:3] + 0.1 * rng.standard_normal((3, 48)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = best_crop_scores(features, queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(os.path.join(tmp, "feats.npy"), features)
+        write_quantized(features, tmp, "feats")
+        assert isinstance(load_features(tmp, "feats", "float32"), np.memmap)
+        for precision, tolerance, nbytes in (("float16", 2e-3, 1000 * 48 * 2), ("int8", 3e-2, 1000 * 48 + 48 * 4)):
+            loaded = load_features(tmp, "feats", precision)
+            assert isinstance(loaded, QuantizedFeatures) and loaded.shape == (1000, 48) and len(loaded) == 1000
+            assert loaded.nbytes == nbytes
+            assert isinstance(loaded.data, np.memmap), "Quantized copies are memory-mapped"
+
+            original_chunk, feature_store.SCORE_CHUNK = feature_store.SCORE_CHUNK, 128
+            try:
+                scores = best_crop_scores(loaded, queries)  # Several chunks
+            finally:
+                feature_store.SCORE_CHUNK = original_chunk
+            np.testing.assert_allclose(scores, exact, atol=tolerance)
+            np.testing.assert_allclose(loaded @ queries[0], features @ queries[0], atol=tolerance)
+            np.testing.assert_allclose(loaded[[5, 2]], features[[5, 2]], atol=tolerance)
+            top = set(np.argsort(-exact)[:10])
+            assert len(top & set(np.argsort(-scores)[:10])) >= 9, precision
+
+        os.remove(os.path.join(tmp, "feats_i8.npy"))
+        assert isinstance(load_features(tmp, "feats", "int8"), np.ndarray), "Missing copies fall back to float32"
+        assert load_features(tmp, "missing") is None
+    print("✓ Quantized matrices are memory-mapped and score within tolerance of float32")
+
+
+def test_rewrites_leave_mapped_files_intact():
+    """A running worker's memory map keeps the old matrix while the indexer writes a new one"""
+    print("Testing feature rewrites under a live memory map...")
+    with tempfile.TemporaryDirectory() as tmp:
+        old = np.arange(4000, dtype=np.float32).reshape(100, 40)
+        save_array(os.path.join(tmp, "feats.npy"), old)
+        write_quantized(old, tmp, "feats")
+        mapped = load_features(tmp, "feats", "float32")
+        mapped_f16 = load_features(tmp, "feats", "float16")
+
+        new = -np.ones((10, 40), dtype=np.float32)
+        save_array(os.path.join(tmp, "feats.npy"), new)
+        write_quantized(new, tmp, "feats")
+        assert np.array_equal(mapped, old) and np.array_equal(mapped_f16[:], old.astype(np.float16))
+        assert np.array_equal(load_features(tmp, "feats", "float32"), new)
+        assert sorted(os.listdir(tmp)) == ["feats.npy", "feats_f16.npy", "feats_i8.npy", "feats_i8_scale.npy"]
+    print("✓ Feature files are replaced, not truncated in place")
+
+
+if __name__ == "__main__":
+    test_quantized_copies_score_like_float32()
+    test_rewrites_leave_mapped_files_intact()
+    print("\n✅ All feature store tests passed!")
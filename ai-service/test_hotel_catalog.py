@@ -0,0 +1,145 @@
+"""
+Unit tests for the in-memory hotel catalog in image_search/hotel_catalog.py
+"""
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "image_search"))
+
+from hotel_catalog import HotelCatalog, ImageAttributes
+
+IMAGE_SEARCH_DIR = Path(__file__).parent.parent / "image_search"
+
+
+def write_db(path, rows):
+    """Build a hotels.db the way setup_db.py does and move it into place"""
+    tmp_path = f"{path}.tmp"
+    conn = sqlite3.connect(tmp_path)
+    conn.execute(
+        "CREATE TABLE hotels (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, stars INTEGER, "
+        "price INTEGER, description TEXT, external_link TEXT)"
+    )
+    conn.executemany("INSERT INTO hotels VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+
+def test_catalog_serves_details_and_reloads_on_change():
+    print("Testing hotel catalog...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "hotels.db")
+        write_db(db_path, [
+            (7, "Sea Breeze", 4, 12000, "Long description of Sea Breeze", "https://example.com/7"),
+            (3, "Hill Lodge", None, None, "Quiet lodge", None),
+        ])
+        catalog = HotelCatalog(db_path, check_interval=0)
+
+        hotels = catalog.get_many([7, 3, 99])
+        assert set(hotels) == {7, 3}, "Unknown ids are left out"
+        assert hotels[7]["name"] == "Sea Breeze" and hotels[7]["price"] == 12000 and hotels[7]["stars"] == 4
+        assert hotels[7]["description"] == "Long description of Sea Breeze"
+        assert hotels[3]["stars"] is None and hotels[3]["price"] is None
+        assert catalog.get(99) is None
+        assert "description" not in catalog.get(3, with_description=False)
+        snapshot = catalog.snapshot()
+        assert list(snapshot.positions([3, 7, 5])) == [0, 1, -1]
+
+        # Rewriting the database swaps in a new snapshot and new connections
+        write_db(db_path, [(7, "Sea Breeze Resort", 5, 15000, "Renovated", None)])
+        os.utime(db_path, ns=(0, 10**18))
+        hotels = catalog.get_many([7, 3])
+        assert set(hotels) == {7}
+        assert hotels[7]["name"] == "Sea Breeze Resort" and hotels[7]["description"] == "Renovated"
+        assert catalog.snapshot() is not snapshot
+    print("✓ Details come from memory and reload when hotels.db changes")
+
+
+def test_missing_database_is_empty_and_read_only():
+    print("Testing missing and read-only databases...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "hotels.db")
+        catalog = HotelCatalog(db_path, check_interval=0)
+        assert catalog.get(1) is None and len(catalog.snapshot()) == 0
+
+        write_db(db_path, [(1, "New", 3, 5000, "Fresh", None)])
+        assert catalog.get(1)["name"] == "New", "A database created later is picked up"
+
+        generation, conn = catalog._acquire()
+        try:
+            conn.execute("DELETE FROM hotels")
+            wrote = True
+        except sqlite3.OperationalError:
+            wrote = False
+        catalog._release(generation, conn)
+        assert not wrote, "Pooled connections must be read-only"
+    print("✓ A missing database gives an empty catalog and connections are read-only")
+
+
+def test_image_filters_apply_before_top_k():
+    """Per-image masks pick eligible images; filtered search returns the top_k eligible hotels"""
+    print("Testing filtered image search...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "hotels.db")
+        write_db(db_path, [
+            (1, "Budget", 3, 4000, "", None),
+            (2, "Mid", 4, 7500, "", None),
+            (3, "Luxury", 5, 20000, "", None),
+            (4, "Unpriced", 5, None, "", None),
+        ])
+        snapshot = HotelCatalog(db_path).snapshot()
+    # Images 0-1 Budget, 2 Mid, 3 unmapped, 4 Luxury, 5 Unpriced, 6 not in the catalog
+    attributes = ImageAttributes(snapshot, [1, 1, 2, -1, 3, 4, 9])
+    assert list(attributes.eligible()) == [0, 1, 2, 4, 5]
+    assert list(attributes.eligible(max_price=8000)) == [0, 1, 2]
+    assert list(attributes.eligible(min_stars=4)) == [2, 4, 5]
+    assert list(attributes.eligible(max_price=8000, min_stars=4)) == [2]
+    assert list(attributes.eligible(hotel_ids=[3, 9])) == [4]
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    from services.image_search_service import ImageSearchService
+    from vector_index import ExactIndex
+    from visual_features import HotelGroups
+
+    service = ImageSearchService()
+    service.result_cache = None
+    service.color_features = np.load(IMAGE_SEARCH_DIR / "hotel_features_color.npy")
+    with open(IMAGE_SEARCH_DIR / "mapping.pkl", "rb") as f:
+        service.mapping = pickle.load(f)
+    service.hotel_groups = HotelGroups(service.mapping, len(service.color_features))
+    rng = np.random.default_rng(0)
+    service.ai_features = rng.standard_normal((len(service.color_features), 16)).astype(np.float32)
+    service.ai_features /= np.linalg.norm(service.ai_features, axis=1, keepdims=True)
+    service.vector_index = ExactIndex(service.ai_features)
+    service.model = object()
+    service.encode_crops = lambda crops: list(service.ai_features[:len(crops)])
+    image = Image.fromarray(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8))
+
+    def passes(result, filters):
+        return result["price"] <= filters.get("max_price", result["price"]) \
+            and result["stars"] >= filters.get("min_stars", 0)
+
+    for tier in ("full", "color_only"):
+        everything = service.search_similar_hotels(image, top_k=len(service.hotel_groups), quality_tier=tier)
+        for filters in ({"max_price": 8000}, {"min_stars": 4}, {"max_price": 12000, "min_stars": 5}):
+            expected = [r for r in everything if passes(r, filters)][:3]
+            assert len(expected) == 3, "The test database has enough hotels for each filter"
+            assert service.search_similar_hotels(image, top_k=3, quality_tier=tier, **filters) == expected
+    chosen = [int(r["hotel_id"]) for r in everything[-2:]]
+    assert [int(r["hotel_id"]) for r in service.search_similar_hotels(image, top_k=3, hotel_ids=chosen)] == chosen
+    assert service.search_similar_hotels(image, top_k=3, max_price=0) == []
+    print("✓ Filters are applied before top-k and return the best eligible hotels")
+
+
+if __name__ == "__main__":
+    test_catalog_serves_details_and_reloads_on_change()
+    test_missing_database_is_empty_and_read_only()
+    test_image_filters_apply_before_top_k()
+    print("\n✅ All hotel catalog tests passed!")
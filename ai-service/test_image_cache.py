@@ -0,0 +1,113 @@
+"""
+Tests for the perceptual-hash image search cache (utils/image_cache.py)
+"""
+import io
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.image_cache import ImageResultCache, hamming, perceptual_hash
+
+IMAGE_SEARCH_DIR = Path(__file__).parent.parent / "image_search"
+
+
+def make_photo(seed: int) -> Image.Image:
+    """Smooth synthetic 'photo' with large-scale structure"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize((640, 480), Image.BICUBIC).filter(ImageFilter.GaussianBlur(8))
+
+
+def recompress(image: Image.Image, quality: int = 60, size=(600, 450)) -> Image.Image:
+    buffer = io.BytesIO()
+    image.resize(size).save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+
+
+def test_hash_survives_recompression_and_cache_rules():
+    print("Testing perceptual hash and cache lookups...")
+    photo, other = make_photo(1), make_photo(2)
+    h = perceptual_hash(photo)
+    assert h == perceptual_hash(photo.copy())
+    assert hamming(h, perceptual_hash(recompress(photo))) <= 4, "Recompressed copies hash close together"
+    assert hamming(h, perceptual_hash(other)) > 12, "Different photos hash far apart"
+
+    cache = ImageResultCache(max_entries=2, ttl_seconds=60, radius=6)
+    cache.store(h, "v1", 3, ["result"], np.zeros((3, 4)))
+    entry, exact = cache.lookup(h, "v1")
+    assert exact and entry.results == ["result"]
+    entry, exact = cache.lookup(h ^ 0b111, "v1")
+    assert entry is not None and not exact, "Within the radius: near hit"
+    assert cache.lookup(h ^ 0b1111111, "v1") == (None, False), "Beyond the radius: miss"
+    assert cache.lookup(h, "v2") == (None, False) and len(cache) == 0, "A new index version drops everything"
+
+    cache.store(1, "v2", 3, [], np.zeros(1))
+    cache.store(2, "v2", 3, [], np.zeros(1))
+    cache.lookup(1, "v2")
+    cache.store(3, "v2", 3, [], np.zeros(1))
+    assert cache.lookup(2, "v2")[1] is False and cache.lookup(1, "v2")[1], "Least recently used goes first"
+    expiring = ImageResultCache(ttl_seconds=0)
+    expiring.store(4, "v1", 3, [], np.zeros(1))
+    time.sleep(0.01)
+    assert expiring.lookup(4, "v1") == (None, False) and len(expiring) == 0, "Expired entries are dropped"
+    print("✓ Hash is stable under recompression; exact, near, version, LRU and TTL rules hold")
+
+
+def test_service_skips_clip_on_repeated_uploads():
+    """Exact hits return cached results; near hits reuse embeddings but rescore color"""
+    print("Testing image search cache in the service...")
+    sys.path.insert(0, str(IMAGE_SEARCH_DIR))
+    from services.image_search_service import ImageSearchService
+    from vector_index import ExactIndex
+    from visual_features import HotelGroups
+
+    service = ImageSearchService()
+    service.color_features = np.load(IMAGE_SEARCH_DIR / "hotel_features_color.npy")
+    with open(IMAGE_SEARCH_DIR / "mapping.pkl", "rb") as f:
+        service.mapping = pickle.load(f)
+    service.hotel_groups = HotelGroups(service.mapping, len(service.color_features))
+    rng = np.random.default_rng(0)
+    service.ai_features = rng.standard_normal((len(service.color_features), 16)).astype(np.float32)
+    service.ai_features /= np.linalg.norm(service.ai_features, axis=1, keepdims=True)
+    service.vector_index = ExactIndex(service.ai_features)
+    service.model = object()
+    encoded = []
+
+    def fake_encode(crops):
+        encoded.append(len(crops))
+        return list(service.ai_features[:len(crops)])
+    service.encode_crops = fake_encode
+
+    photo = make_photo(3)
+    first = service.search_similar_hotels(photo, top_k=3)
+    assert first and encoded == [3]
+    assert service.search_similar_hotels(photo.copy(), top_k=2) == first[:2] and encoded == [3], "Exact hit"
+    near = service.search_similar_hotels(recompress(photo), top_k=3)
+    assert near and encoded == [3], "Near hit reuses the cached embeddings"
+
+    # Rebuilding the index on disk invalidates the cache within index_check_interval
+    with tempfile.TemporaryDirectory() as tmp:
+        features_path = Path(tmp) / "hotel_features_ai.npy"
+        np.save(features_path, service.ai_features)
+        service.index_dir, service.index_check_interval = Path(tmp), 0.0
+        service.search_similar_hotels(photo, top_k=3)
+        assert encoded == [3, 3], "A new index version invalidates the cache"
+        service.search_similar_hotels(photo, top_k=3)
+        assert encoded == [3, 3]
+        np.save(features_path, service.ai_features[:-1])
+        service.search_similar_hotels(photo, top_k=3)
+        assert encoded == [3, 3, 3], "Rewritten feature files invalidate the cache"
+    print("✓ Repeated uploads skip CLIP until the index changes")
+
+
+if __name__ == "__main__":
+    test_hash_survives_recompression_and_cache_rules()
+    test_service_skips_clip_on_repeated_uploads()
+    print("\n✅ All image cache tests passed!")
@@ -0,0 +1,123 @@
+"""
+Tests for the upload decode path in utils/helpers.py
+"""
+import io
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("WARMUP_SERVICES", "none")
+
+from fastapi.testclient import TestClient
+
+import main
+from utils import helpers
+from utils.helpers import decode_image, validate_image, ImageTooLargeError
+
+LIMITS = {"max_bytes": 20 * 1024 * 1024, "max_pixels": 50_000_000}
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def phone_photo(size=(4032, 3024)) -> Image.Image:
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)).resize(size, Image.BICUBIC)
+
+
+def test_large_uploads_decode_to_the_target_size():
+    """JPEG and PNG uploads come back as RGB with the shorter side at min_side; small ones are untouched"""
+    print("Testing image decode sizes...")
+    photo = phone_photo()
+    for image_format, image in (("JPEG", photo), ("PNG", photo.resize((2000, 1500)))):
+        decoded = decode_image(encode(image, image_format), 560, **LIMITS)
+        assert decoded.mode == "RGB" and decoded.size == (747, 560), (image_format, decoded.size)
+
+    small = phone_photo((300, 200)).convert("L")
+    decoded = decode_image(encode(small, "PNG"), 560, **LIMITS)
+    assert decoded.size == (300, 200) and decoded.mode == "RGB"
+
+    # The draft decode stays close to a full decode followed by the same resize
+    drafted = np.asarray(decode_image(encode(photo, "JPEG"), 560, **LIMITS), dtype=float)
+    reference = np.asarray(photo.resize((747, 560), Image.BICUBIC), dtype=float)
+    assert np.abs(drafted - reference).mean() < 4
+    print("✓ A 12 MP upload decodes to 747x560 with the aspect ratio kept")
+
+
+def test_limits_and_invalid_uploads():
+    """Byte and pixel limits raise ImageTooLargeError; garbage raises ValueError"""
+    print("Testing upload limits...")
+    data = encode(phone_photo((2000, 1500)), "JPEG")
+    for limits in ({"max_bytes": len(data) - 1, "max_pixels": 10 ** 9}, {"max_bytes": 10 ** 9, "max_pixels": 2999999}):
+        try:
+            decode_image(data, 560, **limits)
+            raised = False
+        except ImageTooLargeError:
+            raised = True
+        assert raised, limits
+    assert decode_image(data, 560, max_bytes=len(data), max_pixels=3000000).size == (747, 560)
+
+    try:
+        decode_image(b"not an image", 560, **LIMITS)
+        raised = False
+    except ImageTooLargeError:
+        raised = False
+    except ValueError:
+        raised = True
+    assert raised, "Garbage is an invalid image, not a too-large one"
+    assert validate_image(data) and not validate_image(b"not an image")
+    print("✓ Limits are enforced before decoding")
+
+
+def test_similar_endpoint_decodes_on_the_image_pool():
+    """/hotels/similar decodes uploads on the image pool, not the event loop, and keeps 413 and 400"""
+    print("Testing where /hotels/similar decodes...")
+    threads = {}
+
+    def recording_decode(*args, **kwargs):
+        threads["decode"] = threading.current_thread().name
+        return decode_image(*args, **kwargs)
+
+    class FakeImageSearch:
+        def search_similar_hotels(self, image, top_k=3, quality_tier="full", **filters):
+            threads["search"] = threading.current_thread().name
+            return []
+
+    client = TestClient(main.app)
+    saved_service, saved_max_bytes = main.image_search_service, main.settings.IMAGE_MAX_UPLOAD_BYTES
+    saved_admission = main.settings.ADMISSION_ENABLED
+    main.settings.ADMISSION_ENABLED = False  # Not shed because the test machine is busy
+    main.image_search_service = FakeImageSearch()
+    helpers.decode_image = recording_decode
+    try:
+        data = encode(phone_photo((600, 400)), "JPEG")
+        response = client.post("/api/v1/hotels/similar", files={"image": ("photo.jpg", data, "image/jpeg")})
+        assert response.status_code == 200, response.text
+        assert threads["decode"].startswith("pool-image") and threads["search"] == threads["decode"]
+
+        garbage = client.post("/api/v1/hotels/similar", files={"image": ("x.jpg", b"not an image", "image/jpeg")})
+        assert garbage.status_code == 400, garbage.text
+        main.settings.IMAGE_MAX_UPLOAD_BYTES = len(data) - 1
+        too_large = client.post("/api/v1/hotels/similar", files={"image": ("big.jpg", data + b"!", "image/jpeg")})
+        assert too_large.status_code == 413, too_large.text
+    finally:
+        helpers.decode_image = decode_image
+        main.image_search_service = saved_service
+        main.settings.IMAGE_MAX_UPLOAD_BYTES = saved_max_bytes
+        main.settings.ADMISSION_ENABLED = saved_admission
+    print("✓ Uploads decode in the image pool job")
+
+
+if __name__ == "__main__":
+    test_large_uploads_decode_to_the_target_size()
+    test_limits_and_invalid_uploads()
+    test_similar_endpoint_decodes_on_the_image_pool()
+    print("\n✅ All image decode tests passed!")
@@ -0,0 +1,78 @@
+"""
+Import-time budget for the AI microservice
+
+Importing main (and the light moderation and cart paths) must not load
+torch, transformers, sentence_transformers or PIL, and must finish within
+IMPORT_TIME_BUDGET_SECONDS (default 1.0s) in a fresh interpreter.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+AI_SERVICE_DIR = Path(__file__).parent
+BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "1.0"))
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "clip", "PIL.Image"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement: str, runs: int = 3, env: dict = None) -> dict:
+    """Best of several fresh-interpreter runs, to ride out a cold disk cache"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+            cwd=str(AI_SERVICE_DIR),
+            capture_output=True,
+            text=True,
+            env={**os.environ, "WARMUP_SERVICES": "none", **(env or {})}
+        )
+        assert result.returncode == 0, result.stderr[-2000:]
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None or sample["seconds"] < best["seconds"]:
+            best = sample
+    return best
+
+
+def test_main_imports_within_budget():
+    """import main stays under the budget without heavy model libraries"""
+    print("Testing import main...")
+    result = measure("import main")
+    assert not result["loaded"], f"import main loaded heavy modules: {result['loaded']}"
+    assert result["seconds"] < BUDGET_SECONDS, \
+        f"import main took {result['seconds']:.3f}s, budget {BUDGET_SECONDS}s (see benchmarks/import_time.py)"
+    print(f"✓ import main: {result['seconds']:.3f}s")
+
+
+def test_thread_budgets_do_not_load_torch():
+    """Pools built with per-service torch thread budgets leave torch to their threads"""
+    print("Testing import main with thread budgets...")
+    result = measure("import main", runs=1, env={"TORCH_IMAGE_THREADS": "2", "TORCH_ACTIVITIES_THREADS": "1"})
+    assert not result["loaded"], f"import main with thread budgets loaded heavy modules: {result['loaded']}"
+    print(f"✓ import main with thread budgets: {result['seconds']:.3f}s")
+
+
+def test_light_services_do_not_load_models():
+    """Moderation and activity-service imports stay free of torch/transformers"""
+    print("Testing light service imports...")
+    result = measure(
+        "import main; main.init_moderation_service(); import services.activity_recommendation_service",
+        runs=1
+    )
+    assert not result["loaded"], f"Light service imports loaded heavy modules: {result['loaded']}"
+    print(f"✓ moderation + activity service imports: {result['seconds']:.3f}s")
+
+
+if __name__ == "__main__":
+    test_main_imports_within_budget()
+    test_thread_budgets_do_not_load_torch()
+    test_light_services_do_not_load_models()
+    print("\n✅ All import budget tests passed!")
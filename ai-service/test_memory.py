@@ -0,0 +1,111 @@
+"""
+Tests for the /proc memory parsing in utils/memory.py used by supervisor.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import memory
+
+# A worker that still shares most of its pages with the supervisor
+SMAPS_ROLLUP = """\
+55d0c0a00000-7ffd2b5fe000 ---p 00000000 00:00 0                          [rollup]
+Rss:              409600 kB
+Pss:              153600 kB
+Pss_Anon:          51200 kB
+Shared_Clean:     256000 kB
+Shared_Dirty:      51200 kB
+Private_Clean:     20480 kB
+Private_Dirty:     81920 kB
+Referenced:       409600 kB
+Anonymous:        102400 kB
+Swap:               1024 kB
+SwapPss:            1024 kB
+"""
+
+# Older kernels: one block per mapping, summed
+SMAPS = """\
+00400000-00452000 r-xp 00000000 08:02 173521      /usr/bin/python3
+Size:                328 kB
+Rss:                2048 kB
+Pss:                1024 kB
+Shared_Clean:       2048 kB
+Shared_Dirty:          0 kB
+Private_Clean:         0 kB
+Private_Dirty:         0 kB
+Swap:                  0 kB
+7f2c10000000-7f2c14000000 rw-p 00000000 00:00 0
+Size:              65536 kB
+Rss:               10240 kB
+Pss:               10240 kB
+Shared_Clean:          0 kB
+Shared_Dirty:          0 kB
+Private_Clean:         0 kB
+Private_Dirty:     10240 kB
+Swap:                512 kB
+"""
+
+
+def write_proc(root: str, pid: int, files: dict) -> None:
+    for name, content in files.items():
+        path = os.path.join(root, str(pid), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+
+def test_memory_breakdown_parses_smaps():
+    """smaps_rollup and per-mapping smaps both parse to shared/private MiB; gone processes give None"""
+    print("Testing smaps parsing...")
+    saved = memory.PROC_ROOT
+    with tempfile.TemporaryDirectory() as root:
+        write_proc(root, 101, {"smaps_rollup": SMAPS_ROLLUP, "smaps": "ignored when the rollup exists"})
+        write_proc(root, 102, {"smaps": SMAPS})
+        memory.PROC_ROOT = root
+        try:
+            assert memory.memory_breakdown(101) == {
+                "rss_mb": 400.0, "pss_mb": 150.0, "shared_clean_mb": 250.0, "shared_dirty_mb": 50.0,
+                "private_clean_mb": 20.0, "private_dirty_mb": 80.0, "swap_mb": 1.0,
+                "shared_mb": 300.0, "private_mb": 100.0
+            }, "SwapPss and Pss_Anon must not be counted as Swap and Pss"
+            older = memory.memory_breakdown(102)
+            assert older["rss_mb"] == 12.0 and older["pss_mb"] == 11.0 and older["swap_mb"] == 0.5
+            assert older["shared_mb"] == 2.0 and older["private_mb"] == 10.0
+            assert memory.memory_breakdown(103) is None
+        finally:
+            memory.PROC_ROOT = saved
+    print("✓ smaps_rollup and smaps parse to the same fields")
+
+
+def test_child_pids_and_report():
+    """Children come from the children file or a stat scan; the report sums PSS and private memory"""
+    print("Testing child discovery and the memory report...")
+    saved = memory.PROC_ROOT
+    with tempfile.TemporaryDirectory() as root:
+        write_proc(root, 100, {"task/100/children": "101 102 ", "smaps_rollup": SMAPS_ROLLUP})
+        write_proc(root, 101, {"smaps_rollup": SMAPS_ROLLUP, "stat": "101 (python main) S 100 101 1 0"})
+        write_proc(root, 102, {"smaps": SMAPS, "stat": "102 (uvicorn) R 100 102 1 0"})
+        write_proc(root, 200, {"stat": "200 (other) S 1 200 1 0"})
+        memory.PROC_ROOT = root
+        try:
+            assert memory.child_pids(100) == [101, 102]
+            os.remove(os.path.join(root, "100", "task", "100", "children"))
+            assert memory.child_pids(100) == [101, 102], "Falls back to scanning stat files"
+
+            report = memory.format_memory_report([100, 101, 102, 103], {100: "supervisor"})
+        finally:
+            memory.PROC_ROOT = saved
+    lines = report.splitlines()
+    assert lines[2].split() == ["100", "supervisor", "400.0M", "150.0M", "300.0M", "100.0M", "1.0M"]
+    assert lines[3].split()[1] == "worker" and lines[5].split() == ["103", "worker", "(exited)"]
+    assert lines[-1].split() == ["total", "311.0M", "210.0M"], "PSS and private memory summed"
+    print("✓ Children are found and the report totals PSS and private memory")
+
+
+if __name__ == "__main__":
+    test_memory_breakdown_parses_smaps()
+    test_child_pids_and_report()
+    print("\n✅ All memory tests passed!")
@@ -0,0 +1,72 @@
+"""
+Unit tests for the Prometheus metrics registry in utils/metrics.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.metrics import MetricsRegistry, registry, stage_timer, record_cache, stage_duration, cache_requests_total
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Histogram buckets are cumulative and end with +Inf, _sum and _count"""
+    print("Testing histogram rendering...")
+    reg = MetricsRegistry()
+    hist = reg.histogram("test_latency_seconds", "Test latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, stage="encode")
+
+    text = reg.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{stage="encode",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="encode",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{stage="encode",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{stage="encode"} 4' in text
+    assert 'test_latency_seconds_sum{stage="encode"} 4.05' in text
+    print("✓ Histogram exposition is well formed")
+
+
+def test_stage_timer_and_cache_helpers():
+    """stage_timer records one observation even when the block raises"""
+    print("Testing stage timer and cache counters...")
+    before = stage_duration.snapshot(stage="test_stage")["count"]
+    with stage_timer("test_stage"):
+        pass
+    try:
+        with stage_timer("test_stage"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert stage_duration.snapshot(stage="test_stage")["count"] == before + 2
+
+    record_cache("test_cache", hit=True)
+    record_cache("test_cache", hit=False)
+    record_cache("test_cache", hit=True)
+    record_cache("test_cache", hit=False, near_hit=True)
+    assert cache_requests_total.value(cache="test_cache", result="hit") == 2
+    assert cache_requests_total.value(cache="test_cache", result="miss") == 1
+    assert cache_requests_total.value(cache="test_cache", result="near_hit") == 1
+    assert 'ai_service_stage_errors_total{stage="test_stage"} 1' in registry.render()
+    print("✓ Stages and cache lookups are counted")
+
+
+def test_labels_must_match():
+    """Observations with the wrong label set are rejected"""
+    print("Testing label validation...")
+    reg = MetricsRegistry()
+    counter = reg.counter("test_requests_total", "Test requests", ("route",))
+    try:
+        counter.inc(path="/x")
+        raised = False
+    except ValueError:
+        raised = True
+    assert raised, "Unknown label names should raise"
+    print("✓ Label names are validated")
+
+
+if __name__ == "__main__":
+    test_histogram_renders_cumulative_buckets()
+    test_stage_timer_and_cache_helpers()
+    test_labels_must_match()
+    print("\n✅ All metrics tests passed!")
@@ -0,0 +1,112 @@
+"""
+Unit tests for the model artifact cache in utils/model_registry.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import settings
+from utils import model_registry
+
+
+def with_cache(directory, offline=True):
+    """Point settings at a cache directory; returns the values to restore"""
+    original = (settings.MODEL_CACHE_DIR, settings.MODELS_OFFLINE)
+    settings.MODEL_CACHE_DIR = str(directory) if directory else ""
+    settings.MODELS_OFFLINE = offline
+    return original
+
+
+def fake_prefetch(directory: Path, key: str):
+    """Write a small stand-in artifact and its manifest entry"""
+    artifact = model_registry.ARTIFACTS[key]
+    root = directory / artifact.relative_path
+    root.mkdir(parents=True)
+    (root / "config.json").write_text('{"model_type": "test"}')
+    (root / "model.safetensors").write_bytes(b"\x00" * 1024)
+    manifest = model_registry.load_manifest(directory)
+    manifest[key] = {
+        **artifact.to_dict(),
+        "revision": "0123456789abcdef",
+        "path": artifact.relative_path,
+        "files": model_registry.checksum_artifact(directory, artifact.relative_path),
+        "bytes": 1046
+    }
+    model_registry.save_manifest(manifest, directory)
+
+
+def test_model_source_prefers_cache_and_fails_fast_offline():
+    """Cached artifacts resolve to their path; uncached ones raise when offline"""
+    print("Testing model source resolution...")
+    with tempfile.TemporaryDirectory() as tmp:
+        original = with_cache(None)
+        try:
+            assert model_registry.model_source("qwen") == "Qwen/Qwen2.5-0.5B-Instruct"
+
+            with_cache(tmp, offline=True)
+            fake_prefetch(Path(tmp), "minilm")
+            assert model_registry.model_source("minilm") == str(Path(tmp) / "hf/sentence-transformers--all-MiniLM-L6-v2")
+            try:
+                model_registry.model_source("qwen")
+                raised = False
+            except model_registry.ModelNotCachedError:
+                raised = True
+            assert raised, "Offline mode should not fall back to a download"
+
+            with_cache(tmp, offline=False)
+            assert model_registry.model_source("qwen") == "Qwen/Qwen2.5-0.5B-Instruct"
+        finally:
+            settings.MODEL_CACHE_DIR, settings.MODELS_OFFLINE = original
+    print("✓ Models resolve to the cache, and offline misses fail fast")
+
+
+def test_verify_detects_tampered_files():
+    """verify reports ok, then corrupt after a cached file changes"""
+    print("Testing checksum verification...")
+    with tempfile.TemporaryDirectory() as tmp:
+        original = with_cache(tmp)
+        try:
+            fake_prefetch(Path(tmp), "sentiment")
+            report = {row["key"]: row for row in model_registry.verify(["sentiment", "image"])}
+            assert report["sentiment"]["status"] == "ok", report
+            assert report["clip"]["status"] == "missing"
+
+            weights = Path(tmp) / "hf/cardiffnlp--twitter-roberta-base-sentiment/model.safetensors"
+            weights.write_bytes(b"\x01" * 1024)
+            report = {row["key"]: row for row in model_registry.verify(["sentiment"])}
+            assert report["sentiment"]["status"] == "corrupt"
+            assert any("checksum mismatch" in p for p in report["sentiment"]["problems"])
+        finally:
+            settings.MODEL_CACHE_DIR, settings.MODELS_OFFLINE = original
+    print("✓ Tampered artifacts fail verification")
+
+
+def test_configure_environment_forces_offline():
+    """Offline mode sets the hub variables and the sentiment model path"""
+    print("Testing offline environment...")
+    keys = ["HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE", "SENTIMENT_MODEL_NAME"]
+    saved = {key: os.environ.pop(key, None) for key in keys}
+    with tempfile.TemporaryDirectory() as tmp:
+        original = with_cache(tmp)
+        try:
+            fake_prefetch(Path(tmp), "sentiment")
+            model_registry.configure_environment()
+            assert os.environ["HF_HUB_OFFLINE"] == "1" and os.environ["TRANSFORMERS_OFFLINE"] == "1"
+            assert os.environ["SENTIMENT_MODEL_NAME"].endswith("hf/cardiffnlp--twitter-roberta-base-sentiment")
+        finally:
+            settings.MODEL_CACHE_DIR, settings.MODELS_OFFLINE = original
+            for key, value in saved.items():
+                os.environ.pop(key, None)
+                if value is not None:
+                    os.environ[key] = value
+    print("✓ Hubs are forced offline when loading from the cache")
+
+
+if __name__ == "__main__":
+    test_model_source_prefers_cache_and_fails_fast_offline()
+    test_verify_detects_tampered_files()
+    test_configure_environment_forces_offline()
+    print("\n✅ All model registry tests passed!")
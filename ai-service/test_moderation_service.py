@@ -0,0 +1,52 @@
+"""
+Tests for the Node.js bridge in services/moderation_service.py
+"""
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services import moderation_service
+from services.moderation_service import ModerationService
+
+
+def test_concurrent_calls_use_their_own_script():
+    """Concurrent moderation calls never read or delete each other's temporary script"""
+    print("Testing concurrent moderation calls...")
+    scripts = set()
+    lock = threading.Lock()
+
+    def fake_node(args, **kwargs):
+        # Stands in for node: reads the script it was given, after the other calls have written theirs
+        script = Path(args[1])
+        with lock:
+            scripts.add(script)
+        time.sleep(0.05)
+        text = json.loads(re.search(r"moderate\(\s*(\".*?\"),", script.read_text(), re.S).group(1))
+        return subprocess.CompletedProcess(args, 0, stdout=json.dumps({"text": text}), stderr="")
+
+    service = ModerationService()
+    original_run = moderation_service.subprocess.run
+    moderation_service.subprocess.run = fake_node
+    try:
+        texts = [f"message {i}" for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(service._call_node_moderation, texts))
+    finally:
+        moderation_service.subprocess.run = original_run
+
+    assert [r["text"] for r in results] == texts, "Each call gets the verdict for its own text"
+    assert len(scripts) == 8 and all(s.parent == service.moderation_path for s in scripts)
+    assert not any(s.exists() for s in scripts), "Temporary scripts are removed"
+    print("✓ Each call writes, runs and removes its own script")
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_use_their_own_script()
+    print("\n✅ All moderation service tests passed!")
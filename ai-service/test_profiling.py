@@ -0,0 +1,95 @@
+"""
+Unit tests for the on-demand profilers in utils/profiling.py
+"""
+import asyncio
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import settings
+from utils import profiling
+from utils.dispatch import ServicePool
+
+
+def busy_work():
+    return sum(i * i for i in range(20000))
+
+
+def test_route_session_profiles_pool_work_of_n_requests():
+    """Pool calls of claimed requests are merged into one pstats file"""
+    print("Testing request profiling...")
+    original = settings.PROFILE_OUTPUT_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.PROFILE_OUTPUT_DIR = tmp
+        try:
+            profiler = profiling.RouteProfiler()
+            session = profiler.arm("/api/v1/hotels/similar", requests=2)
+            assert profiler.armed()
+
+            async def request():
+                claimed = profiler.claim("/api/v1/hotels/similar")
+                token = profiling.activate_request_profile(claimed)
+                try:
+                    await pool.run(busy_work)
+                finally:
+                    profiling.deactivate_request_profile(token)
+                    claimed.request_finished()
+
+            async def scenario():
+                await request()
+                await request()
+
+            pool = ServicePool("image", max_workers=1, queue_depth=1)
+            asyncio.run(scenario())
+            pool.shutdown()
+
+            assert profiler.claim("/api/v1/hotels/similar") is None, "Only N requests are profiled"
+            assert not profiler.armed()
+            assert session.done and session.file_name.endswith(".pstats")
+            stats = pstats.Stats(str(profiling.resolve_output_file(session.file_name)))
+            calls = [key for key in stats.stats if key[2] == "busy_work"]
+            assert calls and stats.stats[calls[0]][1] == 2, "busy_work should be profiled twice"
+            assert profiling.resolve_output_file("../config.py") is None
+        finally:
+            settings.PROFILE_OUTPUT_DIR = original
+    print("✓ Next N requests are profiled and merged")
+
+
+def test_stack_sampler_writes_folded_stacks():
+    """Folded stacks include a busy thread's frames"""
+    print("Testing stack sampler...")
+    original = settings.PROFILE_OUTPUT_DIR
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            time.sleep(0.001)
+
+    worker = threading.Thread(target=spin, name="spinner")
+    worker.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.PROFILE_OUTPUT_DIR = tmp
+        try:
+            result = profiling.StackSampler().sample(0.1, interval=0.005)
+            lines = (Path(tmp) / result["file"]).read_text().splitlines()
+        finally:
+            stop.set()
+            worker.join()
+            settings.PROFILE_OUTPUT_DIR = original
+
+    assert result["samples"] > 0
+    spinner = [line for line in lines if line.startswith("spinner;")]
+    assert spinner and "spin (test_profiling.py" in spinner[0]
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    print("✓ Stack samples are written as folded stacks")
+
+
+if __name__ == "__main__":
+    test_route_session_profiles_pool_work_of_n_requests()
+    test_stack_sampler_writes_folded_stacks()
+    print("\n✅ All profiling tests passed!")
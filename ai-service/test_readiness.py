@@ -0,0 +1,127 @@
+"""
+Tests for warm-up readiness tracking in utils/readiness.py and the /ready endpoint
+"""
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("WARMUP_SERVICES", "none")
+
+from fastapi.testclient import TestClient
+
+import main
+from utils.readiness import FAILED, LOADING, PENDING, READY, ReadinessRegistry
+
+
+def gated_loader(release: threading.Event, error: str = None):
+    """Loader that blocks until released, then succeeds or raises"""
+    def load():
+        release.wait(timeout=5)
+        if error:
+            raise RuntimeError(error)
+    return load
+
+
+def test_registry_tracks_loading_ready_and_failed():
+    """Services move from loading to ready or failed; the registry is ready only when all are"""
+    print("Testing readiness states...")
+    registry = ReadinessRegistry()
+    release_image, release_moderation = threading.Event(), threading.Event()
+    registry.register("image", gated_loader(release_image))
+    registry.register("moderation", gated_loader(release_moderation, error="model missing"))
+    registry.register("sentiment", gated_loader(threading.Event()))
+    assert registry.available == ["image", "moderation", "sentiment"]
+
+    try:
+        registry.start(["image", "unknown"])
+        raised = False
+    except ValueError:
+        raised = True
+    assert raised and registry.snapshot()["services"] == {}, "Unknown names start nothing"
+
+    threads = registry.start(["image", "moderation"])
+    assert registry.start(["image"]) == [], "A service is only loaded once"
+    snapshot = registry.snapshot()
+    assert not snapshot["ready"] and set(snapshot["services"]) == {"image", "moderation"}
+    assert {s["status"] for s in snapshot["services"].values()} <= {PENDING, LOADING}
+
+    release_image.set()
+    threads[0].join(timeout=5)
+    image = registry.snapshot()["services"]["image"]
+    assert image["status"] == READY and image["load_seconds"] is not None and image["error"] is None
+    assert not registry.is_ready(), "Moderation is still loading"
+
+    release_moderation.set()
+    threads[1].join(timeout=5)
+    moderation = registry.snapshot()["services"]["moderation"]
+    assert moderation["status"] == FAILED and moderation["error"] == "model missing"
+    assert not registry.is_ready(), "A failed service keeps the registry not ready"
+    print("✓ Loading, ready and failed states are reported per service")
+
+
+def test_ready_endpoint_returns_503_until_warm():
+    """/ready answers 503 while warming up or after a failure and 200 once everything loaded"""
+    print("Testing /ready...")
+    client = TestClient(main.app)
+    saved = main.readiness
+    try:
+        main.readiness = ReadinessRegistry()
+        assert client.get("/ready").status_code == 200, "Nothing to warm up"
+
+        release = threading.Event()
+        main.readiness.register("image", gated_loader(release))
+        threads = main.readiness.start(["image"])
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["services"]["image"]["status"] in (PENDING, LOADING)
+        release.set()
+        threads[0].join(timeout=5)
+        response = client.get("/ready")
+        assert response.status_code == 200 and response.json()["ready"] is True
+
+        main.readiness = ReadinessRegistry()
+        main.readiness.register("image", gated_loader(release, error="CLIP not installed"))
+        main.readiness.start(["image"])[0].join(timeout=5)
+        response = client.get("/ready")
+        image = response.json()["services"]["image"]
+        assert response.status_code == 503
+        assert image["status"] == FAILED and image["error"] == "CLIP not installed"
+    finally:
+        main.readiness = saved
+    print("✓ /ready is 503 before warm-up finishes and after a failure")
+
+
+def test_recommendation_loader_keeps_the_working_directory():
+    """Loading hotel recommendations uses absolute paths instead of changing the shared working directory"""
+    print("Testing the recommendation loader's paths...")
+    from services import hotel_recommendation_service as module
+
+    saved_cwd, saved_instance = os.getcwd(), module.HotelService._instance
+    seen = []
+    try:
+        with tempfile.TemporaryDirectory() as elsewhere:
+            os.chdir(elsewhere)
+            module.HotelService._instance = None
+            original_chdir = os.chdir
+            os.chdir = lambda path: seen.append(path)
+            try:
+                service = module.HotelRecommendationService()
+            finally:
+                os.chdir = original_chdir
+            assert os.getcwd() == os.path.realpath(elsewhere)
+    finally:
+        os.chdir(saved_cwd)
+        module.HotelService._instance = saved_instance
+    assert seen == [], "The loader must not chdir while other services load"
+    assert len(service.hotel_service.get_all_hotels()) > 0, "hotel_data.json found from any directory"
+    print("✓ Hotel data loads without changing directory")
+
+
+if __name__ == "__main__":
+    test_registry_tracks_loading_ready_and_failed()
+    test_ready_endpoint_returns_503_until_warm()
+    test_recommendation_loader_keeps_the_working_directory()
+    print("\n✅ All readiness tests passed!")
@@ -0,0 +1,54 @@
+"""
+Tests for the per-pool torch thread budgets in utils/runtime_profile.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import torch
+
+from config import settings
+from utils.dispatch import ServicePool
+from utils.runtime_profile import apply_process_settings, pool_thread_initializer
+
+
+def test_pool_threads_keep_their_own_budget():
+    """Each pool's threads keep their service's intra-op budget; the process default is untouched"""
+    print("Testing per-pool thread budgets...")
+    saved = dict(settings.TORCH_THREADS)
+    default = torch.get_num_threads()
+    settings.TORCH_THREADS.update({"image": 3, "activities": 2, "llm": 0, "sentiment": 0})
+    try:
+        pools = {
+            name: ServicePool(name, max_workers=2, queue_depth=4, initializer=pool_thread_initializer(name))
+            for name in ("image", "activities", "itinerary", "moderation")
+        }
+
+        def budget():
+            torch.ones(256, 256).sum()  # A parallel op, after which lazy initialization has run
+            apply_process_settings()  # What a service does at load
+            return torch.get_num_threads()
+
+        async def scenario():
+            # Interleave the pools so each one's initializer runs between the others' work
+            runs = [pools[name].run(budget) for _ in range(4) for name in pools]
+            return await asyncio.gather(*runs)
+
+        budgets = asyncio.run(scenario())
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+    finally:
+        settings.TORCH_THREADS.clear()
+        settings.TORCH_THREADS.update(saved)
+
+    expected = {"image": 3, "activities": 2, "itinerary": default, "moderation": default}
+    assert budgets == [expected[name] for _ in range(4) for name in pools], budgets
+    assert torch.get_num_threads() == default, "Pools don't change the process-wide count"
+    print("✓ Pool threads keep their own intra-op budget")
+
+
+if __name__ == "__main__":
+    test_pool_threads_keep_their_own_budget()
+    print("\n✅ All runtime profile tests passed!")
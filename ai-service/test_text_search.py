@@ -0,0 +1,121 @@
+"""
+Tests for text-to-image hotel search: the phrase embedding table in
+image_search/text_embeddings.py and ImageSearchService.search_by_text
+"""
+import os
+import pickle
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "image_search"))
+
+from text_embeddings import COMMON_PHRASES, TextEmbeddingTable, load_table, normalize_phrase
+
+IMAGE_SEARCH_DIR = Path(__file__).parent.parent / "image_search"
+
+
+class FakeEncoder:
+    """Deterministic unit vectors per phrase; records every phrase it encodes"""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.encoded = []
+
+    def __call__(self, phrases):
+        self.encoded.extend(phrases)
+        rows = [np.random.default_rng(zlib.crc32(p.encode())).standard_normal(self.dim) for p in phrases]
+        rows = np.array(rows, dtype=np.float32)
+        return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_common_phrases_are_persisted_and_reloaded():
+    """The first load encodes and writes COMMON_PHRASES; later loads read them back"""
+    print("Testing the persisted phrase table...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "phrases.npz")
+        encode = FakeEncoder()
+        table = TextEmbeddingTable(encode, 16, path, model_name="model-a")
+        assert os.path.exists(path) and len(encode.encoded) == len(COMMON_PHRASES) == len(table)
+
+        encode = FakeEncoder()
+        reloaded = TextEmbeddingTable(encode, 16, path, model_name="model-a")
+        embedding, hit = reloaded.lookup("  Infinity   POOL ")
+        assert hit and encode.encoded == [], "Loaded from disk, nothing encoded"
+        assert np.array_equal(embedding, FakeEncoder()(["infinity pool"])[0])
+
+        # Vectors from another model or dimension are not comparable: rebuild
+        assert load_table(path, 16, "model-b") is None and load_table(path, 32, "model-a") is None
+        TextEmbeddingTable(encode, 16, path, model_name="model-b")
+        assert len(encode.encoded) == len(COMMON_PHRASES)
+        assert load_table(path, 16, "model-b") is not None and load_table(path, 16, "model-a") is None
+    print("✓ Common phrases are encoded once and rebuilt for another model")
+
+
+def test_other_phrases_use_a_bounded_lru():
+    """Unknown phrases are encoded once, share entries after normalization and are evicted LRU"""
+    print("Testing the phrase LRU...")
+    encode = FakeEncoder()
+    table = TextEmbeddingTable(encode, 16, max_entries=2)
+    first, hit = table.lookup("Rooftop bar")
+    assert not hit and encode.encoded == ["rooftop bar"]
+    again, hit = table.lookup("rooftop   bar")
+    assert hit and again is first and normalize_phrase("Rooftop  Bar ") == "rooftop bar"
+
+    table.lookup("kids club")
+    table.lookup("rooftop bar")  # Most recent again, so "kids club" is the oldest
+    table.lookup("tennis court")
+    assert len(table) == 2
+    assert table.lookup("rooftop bar")[1] and not table.lookup("kids club")[1]
+    assert encode.encoded == ["rooftop bar", "kids club", "tennis court", "kids club"]
+    print("✓ The LRU keeps the most recent phrases")
+
+
+def test_search_by_text_ranks_hotels_by_best_image():
+    """search_by_text matches a manual ranking over the index, with and without filters"""
+    print("Testing search_by_text...")
+    sys.path.insert(0, str(Path(__file__).parent))
+    from services.image_search_service import ImageSearchService
+    from vector_index import ExactIndex
+    from visual_features import HotelGroups
+
+    service = ImageSearchService()
+    service.color_features = np.load(IMAGE_SEARCH_DIR / "hotel_features_color.npy")
+    with open(IMAGE_SEARCH_DIR / "mapping.pkl", "rb") as f:
+        service.mapping = pickle.load(f)
+    service.hotel_groups = HotelGroups(service.mapping, len(service.color_features))
+    rng = np.random.default_rng(0)
+    service.ai_features = rng.standard_normal((len(service.color_features), 16)).astype(np.float32)
+    service.ai_features /= np.linalg.norm(service.ai_features, axis=1, keepdims=True)
+    service.vector_index = ExactIndex(service.ai_features)
+    service.text_table = TextEmbeddingTable(FakeEncoder(), 16)
+
+    query = "Infinity pool"
+    scores = service.ai_features @ service.text_table.lookup(query)[0]
+    best = {}
+    for i, score in enumerate(scores):
+        hotel_id = service.mapping[i]["hotel_id"]
+        if hotel_id not in best or score > scores[best[hotel_id]]:
+            best[hotel_id] = i
+    ranked = sorted(best.items(), key=lambda item: scores[item[1]], reverse=True)
+
+    results = service.search_by_text(query, top_k=3)
+    assert [(int(r["hotel_id"]), r["image_index"]) for r in results] == ranked[:3]
+    assert all(np.isclose(r["similarity_score"], scores[r["image_index"]]) for r in results)
+    assert all(r["score_breakdown"]["color_texture_score"] is None for r in results)
+
+    everything = service.search_by_text(query, top_k=len(service.hotel_groups))
+    expected = [r for r in everything if r["price"] <= 8000][:3]
+    assert service.search_by_text(query, top_k=3, max_price=8000) == expected
+    assert service.search_by_text(query, top_k=3, max_price=0) == []
+    print("✓ Text search ranks hotels by their best matching image")
+
+
+if __name__ == "__main__":
+    test_common_phrases_are_persisted_and_reloaded()
+    test_other_phrases_use_a_bounded_lru()
+    test_search_by_text_ranks_hotels_by_best_image()
+    print("\n✅ All text search tests passed!")
@@ -0,0 +1,105 @@
+"""
+Unit tests for request tracing in utils/tracing.py
+"""
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import settings
+from utils import tracing
+from utils.dispatch import ServicePool
+
+
+def test_spans_are_noops_outside_a_trace():
+    """Without an active trace, spans and events record nothing"""
+    print("Testing untraced spans...")
+    with tracing.span("outside") as s:
+        s.set(value=1)
+        tracing.event("ignored", value=2)
+    assert s is tracing.NOOP_SPAN
+    assert tracing.current_trace() is None
+    print("✓ Untraced code records nothing")
+
+
+def test_nested_spans_follow_into_pool_threads():
+    """Spans opened on a pool thread attach under the request's span"""
+    print("Testing span propagation into pools...")
+
+    def blocking_work():
+        with tracing.span("encode"):
+            tracing.event("encoded", items=3)
+        return tracing.current_request_id()
+
+    async def scenario():
+        pool = ServicePool("image", max_workers=1, queue_depth=1)
+        with tracing.start_trace("req-123", "POST /api/v1/hotels/similar") as trace:
+            with tracing.span("handler"):
+                request_id = await pool.run(blocking_work)
+        pool.shutdown()
+        return trace, request_id
+
+    trace, request_id = asyncio.run(scenario())
+    assert request_id == "req-123", "Request ID should be visible on the pool thread"
+    tree = trace.to_dict()["root"]
+    handler = tree["children"][0]
+    assert handler["name"] == "handler"
+    pool_span = handler["children"][0]
+    assert pool_span["name"] == "pool.image" and "wait_ms" in pool_span["attrs"]
+    encode = pool_span["children"][0]
+    assert encode["name"] == "encode"
+    assert encode["events"][0]["message"] == "encoded" and encode["events"][0]["items"] == 3
+    assert encode["thread"].startswith("pool-image")
+    print("✓ Span tree crosses into pool threads")
+
+
+def test_unsampled_trace_keeps_request_id_only():
+    """An unsampled request still carries its request ID but records no spans"""
+    print("Testing unsampled requests...")
+    with tracing.start_trace("req-456", "GET /health", sampled=False) as trace:
+        assert trace is None
+        assert tracing.current_request_id() == "req-456"
+        with tracing.span("work") as s:
+            pass
+        assert s is tracing.NOOP_SPAN
+    assert tracing.current_request_id() is None
+    print("✓ Unsampled requests record nothing")
+
+
+def test_slow_requests_are_logged_as_json_lines():
+    """Requests over the threshold are appended with their span tree"""
+    print("Testing slow-request log...")
+    original = (settings.SLOW_REQUEST_LOG_PATH, settings.SLOW_REQUEST_THRESHOLD_MS)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.SLOW_REQUEST_LOG_PATH = str(Path(tmp) / "slow.jsonl")
+        settings.SLOW_REQUEST_THRESHOLD_MS = 0
+        try:
+            with tracing.start_trace("req-789", "POST /api/v1/activities/itinerary/generate") as trace:
+                with tracing.span("deterministic_schedule"):
+                    pass
+            assert tracing.is_slow(trace)
+            tracing.write_slow_request(trace, status=200)
+
+            settings.SLOW_REQUEST_THRESHOLD_MS = 60_000
+            assert not tracing.is_slow(trace)
+
+            lines = Path(settings.SLOW_REQUEST_LOG_PATH).read_text().splitlines()
+        finally:
+            settings.SLOW_REQUEST_LOG_PATH, settings.SLOW_REQUEST_THRESHOLD_MS = original
+
+    record = json.loads(lines[0])
+    assert len(lines) == 1
+    assert record["request_id"] == "req-789" and record["status"] == 200
+    assert record["root"]["children"][0]["name"] == "deterministic_schedule"
+    print("✓ Slow requests are written with their span tree")
+
+
+if __name__ == "__main__":
+    test_spans_are_noops_outside_a_trace()
+    test_nested_spans_follow_into_pool_threads()
+    test_unsampled_trace_keeps_request_id_only()
+    test_slow_requests_are_logged_as_json_lines()
+    print("\n✅ All tracing tests passed!")
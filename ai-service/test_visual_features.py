@@ -0,0 +1,184 @@
+"""
+Unit tests for the shared multi-scale crop helpers in image_search/visual_features.py
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "image_search"))
+
+from visual_features import (
+    DEFAULT_CROPS, parse_crops, multi_scale_crops, best_crop_scores, cascade_candidates,
+    color_texture_signature, color_texture_signatures, signature_pixels, HotelGroups
+)
+
+IMAGE_SEARCH_DIR = Path(__file__).parent.parent / "image_search"
+
+
+def test_crops_follow_the_configured_geometry():
+    print("Testing crop geometry...")
+    assert parse_crops("") == DEFAULT_CROPS
+    assert parse_crops("0,0,1,1; 0.25,0.25,0.75,0.75") == ((0, 0, 1, 1), (0.25, 0.25, 0.75, 0.75))
+    for bad in ("0,0,1", "0.5,0,0.4,1", "0,0,1,1.5", ";"):
+        try:
+            parse_crops(bad)
+            raised = False
+        except ValueError:
+            raised = True
+        assert raised, bad
+
+    image = Image.new("RGB", (400, 200))
+    sizes = [crop.size for crop in multi_scale_crops(image)]
+    # Center crops scale each axis by its own size, also for non-square images
+    assert sizes == [(400, 200), (320, 160), (240, 120)], sizes
+    print("✓ Crops are parsed, validated and cut per axis")
+
+
+def test_one_product_matches_per_crop_scoring():
+    """Scoring all crops in one matrix product equals the old per-crop loop"""
+    print("Testing batched crop scoring...")
+    rng = np.random.default_rng(0)
+    features = rng.standard_normal((500, 64)).astype("float32")
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+    queries = rng.standard_normal((3, 64)).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    expected = np.max(np.vstack([np.dot(features, q[None, :].T).flatten() for q in queries]), axis=0)
+    np.testing.assert_allclose(best_crop_scores(features, queries), expected, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(best_crop_scores(features, queries[0]), features @ queries[0], rtol=1e-5, atol=1e-6)
+    print("✓ Batched scores match per-crop scores")
+
+
+def loop_top_hotels(mapping, scores, top_k):
+    """The per-image loop and sort that HotelGroups replaces"""
+    hotel_results = {}
+    for i, score in enumerate(scores):
+        if i in mapping:
+            h_id = mapping[i]["hotel_id"]
+            if h_id not in hotel_results or score > hotel_results[h_id]["score"]:
+                hotel_results[h_id] = {"score": score, "image_index": i}
+    ranked = sorted(hotel_results.items(), key=lambda x: x[1]["score"], reverse=True)[:top_k]
+    return [(h_id, float(res["score"]), res["image_index"]) for h_id, res in ranked]
+
+
+def test_hotel_groups_match_the_loop_including_ties():
+    """Vectorized grouping and top-k give exactly the loop's hotels, scores and best images"""
+    print("Testing vectorized hotel aggregation...")
+    rng = np.random.default_rng(1)
+    n_images = 2000
+    # Shuffled hotels, some unmapped images and a mapping entry past the index
+    mapping = {i: {"hotel_id": int(h)} for i, h in enumerate(rng.integers(1, 300, n_images)) if i % 17}
+    mapping[n_images + 5] = {"hotel_id": 999}
+    groups = HotelGroups(mapping, n_images)
+
+    for trial in range(20):
+        scores = rng.random(n_images).astype("float32")
+        if trial % 2:
+            scores = np.round(scores * 20) / 20  # Coarse scores: many ties within and between hotels
+        for top_k in (1, 3, 10, 299, 500):
+            hotel_ids, best, images = groups.top_hotels(scores, top_k)
+            vectorized = [(int(h), float(s), int(i)) for h, s, i in zip(hotel_ids, best, images)]
+            assert vectorized == loop_top_hotels(mapping, scores, top_k), (trial, top_k)
+
+    empty = HotelGroups({}, 10)
+    assert len(empty.top_hotels(np.ones(10), 3)[0]) == 0
+    print("✓ Vectorized top-k matches the per-image loop exactly")
+
+
+def histogramdd_signature(image):
+    """The per-image signature that color_texture_signatures replaces"""
+    img_small = image.resize((64, 64))
+    img_arr = np.array(img_small)
+    hist, _ = np.histogramdd(img_arr.reshape(-1, 3), bins=(4, 4, 4), range=((0, 256), (0, 256), (0, 256)))
+    hist = hist.flatten()
+    hist /= (hist.sum() + 1e-7)
+    img_gray_arr = np.array(ImageOps.grayscale(img_small)).astype(float)
+    dx = np.diff(img_gray_arr, axis=1)
+    dy = np.diff(img_gray_arr, axis=0)
+    texture_sig = np.array([np.mean(dx**2), np.std(dx**2), np.mean(dy**2), np.std(dy**2)])
+    texture_sig /= (np.linalg.norm(texture_sig) + 1e-7)
+    return np.concatenate([hist, texture_sig]).astype("float32")
+
+
+def test_color_signature_is_bit_identical_single_and_batched():
+    """bincount histogram and batched gradients reproduce the histogramdd signature exactly"""
+    print("Testing color/texture signatures...")
+    rng = np.random.default_rng(3)
+    sizes = rng.integers(20, 200, (300, 2))
+    images = [Image.fromarray(rng.integers(0, 256, (h, w, 3), dtype=np.uint8)) for h, w in sizes]
+    # Flat images (zero gradients) and bin edges
+    images += [Image.new("RGB", (80, 60), (63, 64, 255)), Image.new("RGB", (64, 64), (0, 0, 0))]
+    expected = np.stack([histogramdd_signature(image) for image in images])
+
+    batched = color_texture_signatures(np.stack([signature_pixels(image) for image in images]))
+    assert batched.dtype == np.float32 and batched.tobytes() == expected.tobytes()
+    assert all(color_texture_signature(image).tobytes() == row.tobytes() for image, row in zip(images, expected))
+    assert color_texture_signatures(np.zeros((0, 64, 64, 3), dtype=np.uint8)).shape == (0, 68)
+    print("✓ Signatures match the histogramdd implementation bit for bit")
+
+
+def test_cascade_reranks_only_the_best_hotels():
+    """The small backbone picks whole hotels; with every hotel kept the cascade equals the full ranking"""
+    print("Testing cascade search...")
+    import pickle
+    sys.path.insert(0, str(Path(__file__).parent))
+    from config import settings
+    from services.image_search_service import ImageSearchService
+    from vector_index import ExactIndex
+
+    rng = np.random.default_rng(2)
+    mapping = {i: {"hotel_id": int(h)} for i, h in enumerate(rng.integers(1, 40, 500))}
+    groups = HotelGroups(mapping, 500)
+    coarse = rng.random(500).astype("float32")
+    candidates = cascade_candidates(groups, coarse, 5)
+    top_ids = groups.top_hotels(coarse, 5)[0]
+    assert set(groups.image_hotel[candidates]) == set(top_ids)
+    assert np.array_equal(candidates, np.flatnonzero(np.isin(groups.image_hotel, top_ids)))
+
+    service = ImageSearchService()
+    service.result_cache = None
+    service.color_features = np.load(IMAGE_SEARCH_DIR / "hotel_features_color.npy")
+    with open(IMAGE_SEARCH_DIR / "mapping.pkl", "rb") as f:
+        service.mapping = pickle.load(f)
+    service.hotel_groups = HotelGroups(service.mapping, len(service.color_features))
+    service.ai_features = rng.standard_normal((len(service.color_features), 16)).astype(np.float32)
+    service.ai_features /= np.linalg.norm(service.ai_features, axis=1, keepdims=True)
+    service.vector_index = ExactIndex(service.ai_features)
+    service.model = object()
+    encoded = []
+
+    def fake_encode(crops, backbone="clip"):
+        encoded.append((backbone, len(crops)))
+        return list(service.ai_features[10:10 + len(crops)])
+    service.encode_crops = fake_encode
+
+    image = Image.fromarray(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8))
+    full = service.search_similar_hotels(image, top_k=3)
+    original = (settings.CASCADE_TOP_HOTELS, settings.CASCADE_RERANK_CROPS)
+    try:
+        # Same features for both stages, every hotel kept: identical results
+        service.small_features = service.ai_features
+        settings.CASCADE_TOP_HOTELS, settings.CASCADE_RERANK_CROPS = len(service.hotel_groups), 3
+        assert service.search_similar_hotels(image, top_k=3) == full
+
+        encoded.clear()
+        settings.CASCADE_TOP_HOTELS, settings.CASCADE_RERANK_CROPS = 3, 1
+        cascade = service.search_similar_hotels(image, top_k=3)
+        assert encoded == [("clip_small", 3), ("clip", 1)], "ViT-L encodes only the re-rank crops"
+        assert len(cascade) == min(3, len(service.hotel_groups))
+        filtered = service.search_similar_hotels(image, top_k=3, max_price=8000)
+        assert len(filtered) == 3 and all(r["price"] <= 8000 for r in filtered)
+    finally:
+        settings.CASCADE_TOP_HOTELS, settings.CASCADE_RERANK_CROPS = original
+    print("✓ Cascade re-ranks the best hotels' images and matches the full search when it keeps every hotel")
+
+
+if __name__ == "__main__":
+    test_crops_follow_the_configured_geometry()
+    test_one_product_matches_per_crop_scoring()
+    test_hotel_groups_match_the_loop_including_ties()
+    test_color_signature_is_bit_identical_single_and_batched()
+    test_cascade_reranks_only_the_best_hotels()
+    print("\n✅ All visual feature tests passed!")
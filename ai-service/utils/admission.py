@@ -0,0 +1,229 @@
+"""
+Admission control: priority classes with their own concurrency limits.
+
+Every routed request belongs to a priority class ("critical", "interactive"
+or "batch" by default). A class admits up to ``max_concurrent`` requests;
+further requests wait in that class's queue for at most ``max_wait_ms`` and
+are rejected once ``max_queue`` are already waiting. Classes never share
+slots, so a burst of itinerary or image-search calls cannot hold up
+moderation checks on the chat send path.
+
+When the host CPU is saturated a class is shed outright once utilization
+reaches its ``shed_cpu`` threshold. Lower classes have lower thresholds, so
+batch work is turned away first and critical work (no threshold) never is.
+Rejections raise AdmissionRejectedError; the middleware in main.py turns
+them into 503 responses with a Retry-After header.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is not admitted to its priority class"""
+
+    def __init__(self, priority: str, reason: str, retry_after: int = 1):
+        super().__init__(f"Request rejected by admission control ({priority}: {reason})")
+        self.priority = priority
+        self.reason = reason  # "cpu", "queue_full" or "timeout"
+        self.retry_after = retry_after
+
+
+class CpuMonitor:
+    """
+    Host CPU utilization (0.0-1.0), sampled at most every ``interval`` seconds.
+
+    Reads the busy fraction from /proc/stat between samples, which reacts
+    within a second; elsewhere falls back to the 1-minute load average
+    divided by the CPU count.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # The first reading covers a full interval after startup
+        self._last_sample = time.monotonic()
+        self._last_times = self._read_proc_stat()
+        self._utilization = 0.0
+
+    @staticmethod
+    def _read_proc_stat():
+        try:
+            with open("/proc/stat", "r") as f:
+                fields = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        return sum(fields), idle
+
+    def utilization(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sample < self.interval:
+                return self._utilization
+            self._last_sample = now
+            times = self._read_proc_stat()
+            if times is not None and self._last_times is not None:
+                total = times[0] - self._last_times[0]
+                idle = times[1] - self._last_times[1]
+                if total > 0:
+                    self._utilization = max(0.0, min(1.0, 1.0 - idle / total))
+                self._last_times = times
+            elif hasattr(os, "getloadavg"):
+                self._utilization = os.getloadavg()[0] / (os.cpu_count() or 1)
+            return self._utilization
+
+
+class PriorityClass:
+    """Concurrency slots and a bounded wait queue for one priority"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_wait_ms: int,
+        shed_cpu: Optional[float] = None,
+        retry_after: int = 1
+    ):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_ms = max(0, max_wait_ms)
+        self.shed_cpu = shed_cpu
+        self.retry_after = retry_after
+        self._active = 0
+        self._waiters: deque = deque()
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {"cpu": 0, "queue_full": 0, "timeout": 0}
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        self._rejected[reason] += 1
+        return AdmissionRejectedError(self.name, reason, self.retry_after)
+
+    async def acquire(self, cpu_utilization: float = 0.0) -> float:
+        """
+        Take a slot, waiting up to max_wait_ms. Returns the seconds waited.
+
+        Runs on the event loop only, so the counters need no lock.
+
+        Raises:
+            AdmissionRejectedError: If shed for CPU, the queue is full or the wait timed out
+        """
+        if self.shed_cpu is not None and cpu_utilization >= self.shed_cpu:
+            raise self._reject("cpu")
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._admitted += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the wait expired; keep it
+                self._admitted += 1
+                return time.perf_counter() - started
+            waiter.cancel()
+            raise self._reject("timeout")
+        except asyncio.CancelledError:
+            # The client went away; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self._admitted += 1
+        return time.perf_counter() - started
+
+    def release(self) -> None:
+        """Hand the slot to the oldest waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected)
+        }
+
+
+class AdmissionController:
+    """Maps route templates to priority classes and admits requests"""
+
+    def __init__(
+        self,
+        classes: Dict[str, PriorityClass],
+        route_classes: Dict[str, str],
+        default_class: str,
+        cpu_monitor: Optional[CpuMonitor] = None
+    ):
+        unknown = ({default_class} | set(route_classes.values())) - set(classes)
+        if unknown:
+            raise ValueError(f"Unknown priority classes: {', '.join(sorted(unknown))}")
+        self.classes = classes
+        self.route_classes = route_classes
+        self.default_class = default_class
+        self.cpu_monitor = cpu_monitor or CpuMonitor()
+
+    def class_for(self, route_path: str) -> PriorityClass:
+        return self.classes[self.route_classes.get(route_path, self.default_class)]
+
+    @asynccontextmanager
+    async def admit(self, route_path: str):
+        """
+        Hold a slot of the route's priority class for the duration of the block.
+
+        Yields the PriorityClass the request was admitted to.
+        """
+        priority = self.class_for(route_path)
+        cpu = self.cpu_monitor.utilization() if priority.shed_cpu is not None else 0.0
+        await priority.acquire(cpu)
+        try:
+            yield priority
+        finally:
+            priority.release()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: priority.stats() for name, priority in self.classes.items()}
+
+
+def build_admission_controller(settings) -> AdmissionController:
+    """Create the priority classes and route mapping from config.Settings"""
+    classes = {
+        name: PriorityClass(
+            name,
+            max_concurrent=max_concurrent,
+            max_queue=max_queue,
+            max_wait_ms=max_wait_ms,
+            shed_cpu=shed_cpu,
+            retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS
+        )
+        for name, (max_concurrent, max_queue, max_wait_ms, shed_cpu) in settings.ADMISSION_CLASSES.items()
+    }
+    return AdmissionController(
+        classes,
+        settings.ADMISSION_ROUTE_CLASSES,
+        settings.ADMISSION_DEFAULT_CLASS,
+        CpuMonitor(settings.ADMISSION_CPU_SAMPLE_SECONDS)
+    )
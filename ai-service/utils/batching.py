@@ -0,0 +1,226 @@
+"""
+Dynamic micro-batching in front of a model.
+
+CLIP's image tower is far more efficient on a batch than on one crop at a
+time, but every image search request encodes only a few crops of its own.
+``MicroBatcher`` collects inputs from concurrent callers on one background
+thread, runs them through the model in a single forward pass and hands each
+caller back its own rows.
+
+A batch is dispatched when it reaches ``max_batch_size`` inputs, when the
+first input has waited ``max_wait_ms``, or as soon as every caller that is
+currently submitting is already in the batch. The last rule keeps a lone
+request from paying the wait; under load the queue fills while the previous
+forward pass runs, so batches form without waiting.
+
+A forked child does not inherit the batcher thread (supervisor.py warms the
+image service, which starts it, before forking the workers), so every
+batcher is reset in the child and starts a fresh thread on first use.
+"""
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from utils.metrics import batch_size_histogram, batch_wait_duration
+
+
+# Live batchers, reset in forked children
+_batchers: "weakref.WeakSet[MicroBatcher]" = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    for batcher in list(_batchers):
+        batcher._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class BatcherUnavailableError(RuntimeError):
+    """The batcher's thread could not be initialized, so it cannot run batches"""
+
+    def __init__(self, name: str, cause: BaseException):
+        super().__init__(f"Batcher '{name}' is unavailable: {cause}")
+        self.name = name
+
+
+class _Submission:
+    """Inputs from one caller and the future its results arrive on"""
+
+    __slots__ = ("items", "future", "enqueued_at")
+
+    def __init__(self, items: Sequence[Any]):
+        self.items = list(items)
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Runs ``run_batch`` on inputs gathered from concurrent callers.
+
+    ``run_batch`` takes a list of inputs and returns one result per input, in
+    order. It always runs on the batcher's own thread, so per-thread state
+    (torch thread counts, grad mode) must be set there via
+    ``thread_initializer``. If the initializer raises, the batcher is not
+    ``ready``: pending and later submissions fail with
+    BatcherUnavailableError instead of waiting forever.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        thread_initializer: Optional[Callable[[], None]] = None
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000
+        self.thread_initializer = thread_initializer
+        self._reset()
+        _batchers.add(self)
+
+    def _reset(self) -> None:
+        """Fresh queue, lock and (not yet started) thread; also run in forked children"""
+        self._queue: "queue.Queue[_Submission]" = queue.Queue()
+        # A submission that did not fit the previous batch
+        self._carried: Optional[_Submission] = None
+        self._lock = threading.Lock()
+        self._submitting = 0
+        self._thread: Optional[threading.Thread] = None
+        self._initialized = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._batches = 0
+        self._items = 0
+
+    @property
+    def ready(self) -> bool:
+        """False once the batcher thread failed to initialize"""
+        return self._error is None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+
+    def start(self) -> bool:
+        """Start the batcher thread now rather than on first submit; returns whether it is ready"""
+        self._ensure_started()
+        self._initialized.wait()
+        return self.ready
+
+    def submit(self, items: Sequence[Any]) -> List[Any]:
+        """Queue inputs for the next batch and block until their results are ready"""
+        if not items:
+            return []
+        self._ensure_started()
+        submission = _Submission(items)
+        with self._lock:
+            # Checked under the lock _fail drains the queue with, so no submission is stranded
+            if self._error is not None:
+                raise BatcherUnavailableError(self.name, self._error)
+            self._submitting += 1
+            self._queue.put(submission)
+        try:
+            return submission.future.result()
+        finally:
+            with self._lock:
+                self._submitting -= 1
+
+    def _next_submission(self, timeout: Optional[float]) -> Optional[_Submission]:
+        if self._carried is not None:
+            submission, self._carried = self._carried, None
+            return submission
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _collect(self) -> List[_Submission]:
+        """Block for the first submission, then gather more until a dispatch rule fires"""
+        first = self._next_submission(None)
+        batch = [first]
+        size = len(first.items)
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while size < self.max_batch_size:
+            with self._lock:
+                everyone_in = self._submitting <= len(batch)
+            if everyone_in and self._queue.empty():
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            submission = self._next_submission(remaining)
+            if submission is None:
+                break
+            if size + len(submission.items) > self.max_batch_size:
+                # Keep each caller's inputs together; it leads the next batch
+                self._carried = submission
+                break
+            batch.append(submission)
+            size += len(submission.items)
+        return batch
+
+    def _fail(self, error: BaseException) -> None:
+        """Mark the batcher unavailable and fail every submission already queued"""
+        print(f"[Batcher] {self.name} failed to initialize: {error}")
+        with self._lock:
+            self._error = error
+            pending = [self._carried] if self._carried is not None else []
+            self._carried = None
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+        for submission in pending:
+            submission.future.set_exception(BatcherUnavailableError(self.name, error))
+
+    def _loop(self) -> None:
+        try:
+            if self.thread_initializer is not None:
+                self.thread_initializer()
+        except Exception as e:
+            self._fail(e)
+            return
+        finally:
+            self._initialized.set()
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            inputs = [item for submission in batch for item in submission.items]
+            batch_size_histogram.observe(len(inputs), batcher=self.name)
+            for submission in batch:
+                batch_wait_duration.observe(started - submission.enqueued_at, batcher=self.name)
+            try:
+                results = list(self.run_batch(inputs))
+                if len(results) != len(inputs):
+                    raise RuntimeError(f"Batch of {len(inputs)} inputs returned {len(results)} results")
+            except Exception as e:
+                for submission in batch:
+                    submission.future.set_exception(e)
+                continue
+            offset = 0
+            for submission in batch:
+                count = len(submission.items)
+                submission.future.set_result(results[offset:offset + count])
+                offset += count
+            self._batches += 1
+            self._items += len(inputs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "queued": self._queue.qsize() + (1 if self._carried is not None else 0),
+            "ready": self.ready
+        }
@@ -0,0 +1,127 @@
+"""
+Singleflight coalescing of identical in-flight requests, with optional
+idempotency keys.
+
+Double-clicks, re-uploads of the same photo and backend retries on timeout
+all send requests that repeat work already in progress. Handlers wrap
+their expensive part in ``RequestCoalescer.run`` with a canonical key (a
+hash of the route and body, or of the image bytes for image search):
+while one computation for a key is running, identical requests await it
+and share its result or error instead of starting their own.
+
+Nothing is cached once the computation finishes, unless the client sends
+an ``Idempotency-Key`` header. Then the result is kept for
+IDEMPOTENCY_TTL_SECONDS, and a retry with the same key replays it. Reusing
+a key with a different body is rejected with
+IdempotencyKeyConflictError, because it is almost certainly a client bug.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyKeyConflictError(Exception):
+    """Raised when an idempotency key is reused with a different request"""
+
+    def __init__(self, idempotency_key: str):
+        super().__init__(f"Idempotency key '{idempotency_key}' was already used with a different request")
+        self.idempotency_key = idempotency_key
+
+
+def canonical_key(route: str, payload: Any) -> str:
+    """Stable hash of a route and a JSON-compatible payload (key order ignored)"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{route}\n{body}".encode("utf-8")).hexdigest()
+
+
+def bytes_key(route: str, data: bytes) -> str:
+    """Hash of a route and raw bytes, e.g. an uploaded image"""
+    digest = hashlib.sha256(data)
+    digest.update(route.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RequestCoalescer:
+    """
+    Shares in-flight computations between identical requests.
+
+    Only used from the event loop, so the dictionaries need no lock.
+    """
+
+    def __init__(self, retention_seconds: float = 120.0, max_retained: int = 1024):
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # (route, idempotency key) -> (request key, expires at, result)
+        self._retained: "OrderedDict[Tuple[str, str], Tuple[str, float, Any]]" = OrderedDict()
+
+    def _lookup_retained(self, route: str, idempotency_key: str, key: str):
+        entry = self._retained.get((route, idempotency_key))
+        if entry is None:
+            return False, None
+        stored_key, expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._retained[(route, idempotency_key)]
+            return False, None
+        if stored_key != key:
+            raise IdempotencyKeyConflictError(idempotency_key)
+        return True, result
+
+    def _retain(self, route: str, idempotency_key: str, key: str, result: Any) -> None:
+        self._retained[(route, idempotency_key)] = (key, time.monotonic() + self.retention_seconds, result)
+        self._retained.move_to_end((route, idempotency_key))
+        while len(self._retained) > self.max_retained:
+            self._retained.popitem(last=False)
+
+    def _finished(self, key: str, done: asyncio.Future) -> None:
+        self._in_flight.pop(key, None)
+        if not done.cancelled():
+            # Mark the error as retrieved even if every waiter has gone away
+            done.exception()
+
+    async def run(
+        self,
+        route: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Any, str]:
+        """
+        Run ``compute`` unless an identical request is already running it.
+
+        Returns:
+            (result, outcome) where outcome is "leader" for the request that
+            ran the computation, "shared" for one that waited on it and
+            "replayed" for an idempotent retry answered from retention
+
+        Raises:
+            IdempotencyKeyConflictError: If the idempotency key was used with another request
+        """
+        if idempotency_key:
+            found, result = self._lookup_retained(route, idempotency_key, key)
+            if found:
+                return result, "replayed"
+
+        future = self._in_flight.get(key)
+        outcome = "shared"
+        if future is None:
+            # Run as its own task so the work survives the leader's client going away
+            future = asyncio.ensure_future(compute())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+            outcome = "leader"
+
+        # shield: a request that disconnects must not cancel the shared work.
+        # Errors propagate to every waiter but are never retained.
+        result = await asyncio.shield(future)
+        if idempotency_key:
+            self._retain(route, idempotency_key, key, result)
+        return result, outcome
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._in_flight), "retained": len(self._retained)}
@@ -0,0 +1,176 @@
+"""
+Load-aware quality tiers for the expensive pipelines.
+
+Under saturation a cheaper answer beats a timeout. Each pipeline declares
+its quality tiers from best to cheapest, for example image search:
+"full" (three CLIP crops plus color/texture), then "single_crop", then
+"color_only". ``DegradationController.tier`` picks the tier for the next
+request from two signals:
+
+- the occupancy of the pipeline's dispatch pool queue;
+- the p95 of the pipeline's recent latencies (reported with ``observe``).
+
+When either signal crosses its limit the pipeline steps down one tier. It
+steps back up one tier once both signals have stayed well under their
+limits for ``recovery_seconds``. Decisions are re-evaluated at most every
+``eval_seconds``, so one burst moves the pipeline a single step at a time.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Both signals must fall below this fraction of their limits before recovering
+RECOVERY_MARGIN = 0.5
+# Fewer recent latencies than this are too noisy for a p95
+MIN_LATENCY_SAMPLES = 5
+
+
+class PipelineState:
+    """Current tier and recent latencies of one pipeline"""
+
+    def __init__(self, name: str, tiers: Sequence[str], pool: str, p95_limit_seconds: float):
+        self.name = name
+        self.tiers = list(tiers)
+        self.pool = pool
+        self.p95_limit_seconds = p95_limit_seconds
+        self.level = 0
+        self.forced: Optional[str] = None
+        self.latencies: deque = deque()  # (monotonic time, seconds)
+        self.last_evaluated = 0.0
+        self.last_changed = time.monotonic()
+        self.last_signals: Dict[str, Optional[float]] = {"queue_ratio": 0.0, "p95_seconds": None}
+
+    @property
+    def tier(self) -> str:
+        return self.forced or self.tiers[self.level]
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class DegradationController:
+    """Steps pipelines through their quality tiers based on load"""
+
+    def __init__(
+        self,
+        queue_stats: Callable[[str], Dict[str, int]],
+        queue_ratio_limit: float = 0.5,
+        window_seconds: float = 60.0,
+        eval_seconds: float = 5.0,
+        recovery_seconds: float = 30.0,
+        enabled: bool = True
+    ):
+        self.queue_stats = queue_stats
+        self.queue_ratio_limit = queue_ratio_limit
+        self.window_seconds = window_seconds
+        self.eval_seconds = eval_seconds
+        self.recovery_seconds = recovery_seconds
+        self.enabled = enabled
+        self.pipelines: Dict[str, PipelineState] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, tiers: Sequence[str], pool: str, p95_limit_seconds: float) -> None:
+        self.pipelines[name] = PipelineState(name, tiers, pool, p95_limit_seconds)
+
+    def force(self, name: str, tier: Optional[str]) -> None:
+        """Pin a pipeline to a tier (None returns it to automatic control)"""
+        state = self.pipelines[name]
+        if tier is not None and tier not in state.tiers:
+            raise ValueError(f"Unknown tier '{tier}' for {name}; expected one of {', '.join(state.tiers)}")
+        state.forced = tier
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record the latency of one request served by the pipeline"""
+        now = time.monotonic()
+        with self._lock:
+            latencies = self.pipelines[name].latencies
+            latencies.append((now, seconds))
+            self._trim(latencies, now)
+
+    def _trim(self, latencies: deque, now: float) -> None:
+        while latencies and latencies[0][0] < now - self.window_seconds:
+            latencies.popleft()
+
+    def _queue_ratio(self, pool: str) -> float:
+        stats = self.queue_stats(pool)
+        if not stats.get("queue_depth"):
+            return 1.0 if stats.get("active", 0) >= stats.get("workers", 1) else 0.0
+        return stats.get("queued", 0) / stats["queue_depth"]
+
+    def tier(self, name: str) -> str:
+        """Quality tier to use for the pipeline's next request"""
+        state = self.pipelines[name]
+        if state.forced or not self.enabled:
+            return state.tier
+        now = time.monotonic()
+        with self._lock:
+            if now - state.last_evaluated >= self.eval_seconds:
+                state.last_evaluated = now
+                self._evaluate(state, now)
+            return state.tier
+
+    def _evaluate(self, state: PipelineState, now: float) -> None:
+        self._trim(state.latencies, now)
+        queue_ratio = self._queue_ratio(state.pool)
+        p95 = None
+        if len(state.latencies) >= MIN_LATENCY_SAMPLES:
+            p95 = percentile([seconds for _, seconds in state.latencies], 0.95)
+        state.last_signals = {"queue_ratio": round(queue_ratio, 3), "p95_seconds": p95}
+
+        overloaded = queue_ratio >= self.queue_ratio_limit or (p95 is not None and p95 > state.p95_limit_seconds)
+        healthy = (
+            queue_ratio < self.queue_ratio_limit * RECOVERY_MARGIN
+            and (p95 is None or p95 < state.p95_limit_seconds * RECOVERY_MARGIN)
+        )
+        if overloaded and state.level < len(state.tiers) - 1:
+            state.level += 1
+            state.last_changed = now
+            # Latencies from the old tier would keep the new tier pinned down
+            state.latencies.clear()
+            print(f"[Degradation] {state.name} -> {state.tier} (queue {queue_ratio:.2f}, p95 {p95})")
+        elif healthy and state.level > 0 and now - state.last_changed >= self.recovery_seconds:
+            state.level -= 1
+            state.last_changed = now
+            state.latencies.clear()
+            print(f"[Degradation] {state.name} -> {state.tier} (recovered)")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "tier": state.tier,
+                "level": state.tiers.index(state.tier),
+                "tiers": state.tiers,
+                "forced": state.forced is not None,
+                **state.last_signals
+            }
+            for name, state in self.pipelines.items()
+        }
+
+
+# Tiers per pipeline, best first
+IMAGE_SEARCH_TIERS = ("full", "single_crop", "color_only")
+ITINERARY_TIERS = ("full", "no_local_llm", "deterministic")
+
+
+def build_degradation_controller(settings, dispatcher) -> DegradationController:
+    """Create the controller and register the pipelines from config.Settings"""
+    controller = DegradationController(
+        lambda pool: dispatcher.pool(pool).stats(),
+        queue_ratio_limit=settings.DEGRADE_QUEUE_RATIO,
+        window_seconds=settings.DEGRADE_WINDOW_SECONDS,
+        eval_seconds=settings.DEGRADE_EVAL_SECONDS,
+        recovery_seconds=settings.DEGRADE_RECOVERY_SECONDS,
+        enabled=settings.DEGRADATION_ENABLED
+    )
+    controller.register("image_search", IMAGE_SEARCH_TIERS, "image", settings.DEGRADE_IMAGE_P95_MS / 1000)
+    controller.register("itinerary", ITINERARY_TIERS, "itinerary", settings.DEGRADE_ITINERARY_P95_MS / 1000)
+    for name, tier in settings.DEGRADE_FORCE_TIERS.items():
+        controller.force(name, tier)
+    return controller
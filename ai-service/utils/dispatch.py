@@ -0,0 +1,157 @@
+"""
+Bounded executor pools for blocking service work.
+
+Every FastAPI handler runs on the event loop, so CPU-bound model calls
+(CLIP, MiniLM, the local LLM) and blocking subprocess calls (Node.js
+moderation) are handed to a per-service thread pool instead. Each pool has
+a fixed number of workers and a bounded queue; once both are full new work
+is rejected immediately so the caller can answer with 503 instead of piling
+up requests behind a saturated model.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.metrics import pool_wait_duration
+from utils.profiling import run_profiled
+from utils.tracing import span
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a pool has no free worker and its queue is full"""
+
+    def __init__(self, pool_name: str, retry_after: int = 1):
+        super().__init__(f"Service pool '{pool_name}' is saturated")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class ServicePool:
+    """A sized thread pool with a bounded queue in front of it"""
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        queue_depth: int,
+        retry_after: int = 1,
+        initializer: Optional[Callable[[], None]] = None
+    ):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.queue_depth = max(0, queue_depth)
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"pool-{name}",
+            initializer=initializer
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of calls running or waiting at once"""
+        return self.max_workers + self.queue_depth
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on this pool and await its result.
+
+        Raises:
+            PoolSaturatedError: If all workers are busy and the queue is full
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise PoolSaturatedError(self.name, self.retry_after)
+            self._in_flight += 1
+
+        call = functools.partial(fn, *args, **kwargs)
+        submitted = time.perf_counter()
+
+        def timed_call():
+            waited = time.perf_counter() - submitted
+            pool_wait_duration.observe(waited, pool=self.name)
+            with span(f"pool.{self.name}", wait_ms=round(waited * 1000, 3)):
+                return run_profiled(call)
+
+        # Run in a copy of the caller's context so the request's trace and
+        # request ID carry over into the pool thread
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, timed_call)
+        except BaseException:
+            self._release(None)
+            raise
+        # Release the slot when the work itself finishes, not when the awaiting
+        # request goes away, so a disconnected client cannot free capacity that
+        # is still busy.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        """Current occupancy and counters for this pool"""
+        with self._lock:
+            active = min(self._in_flight, self.max_workers)
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "active": active,
+                "queued": self._in_flight - active,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class Dispatcher:
+    """Routes blocking calls to the pool that owns the service"""
+
+    def __init__(self, pools: Dict[str, ServicePool]):
+        self.pools = pools
+
+    def pool(self, name: str) -> ServicePool:
+        if name not in self.pools:
+            raise KeyError(f"Unknown service pool: {name}")
+        return self.pools[name]
+
+    async def run(self, pool_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.pool(pool_name).run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def shutdown(self, wait: bool = False) -> None:
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
+
+
+def build_dispatcher(settings) -> Dispatcher:
+    """Create one pool per service from the sizes in config.Settings"""
+    from utils.runtime_profile import pool_thread_initializer
+
+    pools = {
+        name: ServicePool(
+            name,
+            max_workers=workers,
+            queue_depth=queue_depth,
+            retry_after=settings.POOL_RETRY_AFTER_SECONDS,
+            initializer=pool_thread_initializer(name)
+        )
+        for name, (workers, queue_depth) in settings.SERVICE_POOLS.items()
+    }
+    return Dispatcher(pools)
@@ -3,16 +3,67 @@ Helper utility functions
 """
 from typing import Optional
 import base64
+import math
 from PIL import Image
 import io
 
 
+class ImageTooLargeError(ValueError):
+    """Upload exceeds the byte or pixel limit"""
+
+
+def open_image(image_data: bytes, max_bytes: int, max_pixels: int) -> Image.Image:
+    """
+    Parse the image header and enforce the upload limits without decoding pixels.
+    Raises ImageTooLargeError over a limit and ValueError if it is not an image.
+    """
+    if len(image_data) > max_bytes:
+        raise ImageTooLargeError(f"Image is {len(image_data)} bytes; the limit is {max_bytes}")
+    try:
+        image = Image.open(io.BytesIO(image_data))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    except Exception as e:
+        raise ValueError(f"Not a supported image: {e}")
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLargeError(f"Image is {width}x{height} pixels; the limit is {max_pixels}")
+    return image
+
+
+def decode_image(image_data: bytes, min_side: int, max_bytes: int, max_pixels: int) -> Image.Image:
+    """
+    Decode an upload to an RGB image whose shorter side is about ``min_side``.
+
+    JPEGs are decoded in draft mode, which lets libjpeg scale by 1/2, 1/4 or
+    1/8 while decoding, so a 12 MP phone photo never exists at full size.
+    Whatever is still larger than needed is then resized down. Images that
+    are already small are returned at their own size.
+    """
+    image = open_image(image_data, max_bytes, max_pixels)
+    width, height = image.size
+    scale = min_side / min(width, height)
+    if scale < 1 and image.format == "JPEG":
+        # draft picks the largest reduction that keeps at least this size
+        image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+    try:
+        image = image.convert("RGB")
+    except Exception as e:
+        raise ValueError(f"Cannot decode image: {e}")
+    width, height = image.size
+    scale = min_side / min(width, height)
+    if scale < 1:
+        image = image.resize((round(width * scale), round(height * scale)), Image.BICUBIC, reducing_gap=3.0)
+    return image
+
+
 def validate_image(image_data: bytes) -> bool:
-    """Validate that the uploaded file is a valid image"""
+    """Validate that the uploaded file is a valid image within the upload limits"""
+    from config import settings
     try:
-        Image.open(io.BytesIO(image_data))
+        open_image(image_data, settings.IMAGE_MAX_UPLOAD_BYTES, settings.IMAGE_MAX_PIXELS)
         return True
-    except Exception:
+    except ValueError:
         return False
 
 
@@ -0,0 +1,123 @@
+"""
+Result cache for image search, keyed by a perceptual hash of the query.
+
+Users often upload the same screenshot again, or a recompressed or resized
+copy of it. The bytes differ, so request coalescing does not catch these.
+A 64-bit pHash of the decoded image survives those edits:
+
+- an exact hash match within the TTL returns the cached results;
+- a hash within ``radius`` bits of a cached one reuses that query's CLIP
+  crop embeddings. The search then skips preprocessing and CLIP, and only
+  recomputes color/texture and scoring for the new image.
+
+Entries belong to an index version (feature files and hotel catalog). When
+the version changes the whole cache is dropped.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 low frequencies -> 64-bit hash
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n)).astype(np.float32)
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """64-bit pHash: signs of the 8x8 lowest DCT frequencies against their median"""
+    gray = image.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.float32)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term carries overall brightness, not structure
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class CachedSearch:
+    """One cached query: its results and its crop embeddings, keyed by CLIP backbone"""
+
+    __slots__ = ("image_hash", "top_k", "results", "embeddings", "expires_at")
+
+    def __init__(self, image_hash: int, top_k: int, results: List[Any], embeddings: Dict[str, np.ndarray],
+                 expires_at: float):
+        self.image_hash = image_hash
+        self.top_k = top_k
+        self.results = results
+        self.embeddings = embeddings
+        self.expires_at = expires_at
+
+
+class ImageResultCache:
+    """Bounded LRU/TTL cache of image searches, shared by the image pool threads"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0, radius: int = 6):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.radius = radius
+        self._entries: "OrderedDict[int, CachedSearch]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def lookup(self, image_hash: int, version: Hashable) -> Tuple[Optional[CachedSearch], bool]:
+        """
+        Find a cached search for this hash.
+
+        Returns:
+            (entry, exact): the exact-hash entry with exact=True, else the
+            closest entry within ``radius`` bits with exact=False, else (None, False)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            expired = [h for h, entry in self._entries.items() if entry.expires_at < now]
+            for h in expired:
+                del self._entries[h]
+
+            entry = self._entries.get(image_hash)
+            if entry is not None:
+                self._entries.move_to_end(image_hash)
+                return entry, True
+            if self.radius <= 0:
+                return None, False
+            best, best_distance = None, self.radius + 1
+            for entry in self._entries.values():
+                distance = hamming(image_hash, entry.image_hash)
+                if distance < best_distance:
+                    best, best_distance = entry, distance
+            if best is not None:
+                self._entries.move_to_end(best.image_hash)
+            return best, False
+
+    def store(self, image_hash: int, version: Hashable, top_k: int, results: List[Any],
+              embeddings: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._check_version(version)
+            self._entries[image_hash] = CachedSearch(
+                image_hash, top_k, results, embeddings, time.monotonic() + self.ttl_seconds
+            )
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,124 @@
+"""
+Process memory helpers
+"""
+import os
+from typing import Dict, List, Optional
+
+# Mount point of procfs; tests point it at a fixture directory
+PROC_ROOT = "/proc"
+
+
+def current_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """
+    Resident set size of a process in MiB.
+
+    Reads /proc on Linux; falls back to the peak RSS from getrusage for the
+    current process elsewhere. Returns None when neither is available.
+    """
+    pid = pid or os.getpid()
+    try:
+        with open(f"{PROC_ROOT}/{pid}/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+
+    if pid != os.getpid():
+        return None
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and KiB on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+# Fields of /proc/<pid>/smaps_rollup reported for each worker
+_SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+    "Swap": "swap_mb",
+}
+
+
+def memory_breakdown(pid: int) -> Optional[Dict[str, float]]:
+    """
+    Shared versus private memory of a process, in MiB.
+
+    Uses /proc/<pid>/smaps_rollup (Linux 4.14+), summing /proc/<pid>/smaps on
+    older kernels. Pages a forked worker still shares copy-on-write with its
+    parent show up as shared; pages it has written to become private.
+    Returns None if the process is gone or /proc is unavailable.
+    """
+    totals = {key: 0.0 for key in _SMAPS_FIELDS.values()}
+    for filename in ("smaps_rollup", "smaps"):
+        try:
+            with open(f"{PROC_ROOT}/{pid}/{filename}", "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) >= 2 and parts[0].rstrip(":") in _SMAPS_FIELDS:
+                        totals[_SMAPS_FIELDS[parts[0].rstrip(":")]] += int(parts[1]) / 1024
+            break
+        except (OSError, ValueError):
+            continue
+    else:
+        return None
+
+    totals["shared_mb"] = totals["shared_clean_mb"] + totals["shared_dirty_mb"]
+    totals["private_mb"] = totals["private_clean_mb"] + totals["private_dirty_mb"]
+    return {key: round(value, 1) for key, value in totals.items()}
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of a process, read from /proc"""
+    try:
+        with open(f"{PROC_ROOT}/{pid}/task/{pid}/children", "r") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+
+    # Kernels without CONFIG_PROC_CHILDREN: scan every process for its parent
+    children = []
+    for entry in os.listdir(PROC_ROOT):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{PROC_ROOT}/{entry}/stat", "r") as f:
+                # The command name may contain spaces, so split after its closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def format_memory_report(pids: List[int], labels: Optional[Dict[int, str]] = None) -> str:
+    """Render a shared/private memory table for a set of processes"""
+    labels = labels or {}
+    header = f"{'pid':>8} {'role':<10} {'rss':>9} {'pss':>9} {'shared':>9} {'private':>9} {'swap':>8}"
+    lines = [header, "-" * len(header)]
+    total_private = 0.0
+    total_pss = 0.0
+    for pid in pids:
+        info = memory_breakdown(pid)
+        if info is None:
+            lines.append(f"{pid:>8} {labels.get(pid, 'worker'):<10} {'(exited)':>9}")
+            continue
+        total_private += info["private_mb"]
+        total_pss += info["pss_mb"]
+        lines.append(
+            f"{pid:>8} {labels.get(pid, 'worker'):<10} {info['rss_mb']:>8.1f}M {info['pss_mb']:>8.1f}M "
+            f"{info['shared_mb']:>8.1f}M {info['private_mb']:>8.1f}M {info['swap_mb']:>7.1f}M"
+        )
+    lines.append("-" * len(header))
+    # PSS splits shared pages between the processes mapping them, so its sum is
+    # the real footprint of the whole group
+    lines.append(f"{'total':>8} {'':<10} {'':>9} {total_pss:>8.1f}M {'':>9} {total_private:>8.1f}M")
+    return "\n".join(lines)
@@ -0,0 +1,325 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small registry of counters, gauges and histograms served by ``/metrics``.
+Endpoints are timed by the HTTP middleware in main.py; internal stages
+(CLIP encode, feature scoring, LLM calls, ...) are timed with
+``stage_timer``. Values that live elsewhere, such as pool occupancy, are
+copied in by collectors registered with ``registry.register_collector``
+just before each scrape.
+
+Metrics are per process: with several pre-forked workers each worker keeps
+its own values.
+"""
+import contextlib
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.tracing import span
+
+# Latency buckets in seconds, wide enough for LLM generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class: a named metric with a fixed set of label names"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        """Mirror a running total that is counted somewhere else"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts, sum, count]
+                state = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """Count and sum for one label set"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": state[2], "sum": state[1]}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them for a scrape"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before every render to refresh mirrored values"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"[Metrics] Collector failed: {e}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Content type Prometheus expects for the text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "ai_service_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "ai_service_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+stage_duration = registry.histogram(
+    "ai_service_stage_duration_seconds", "Latency of internal processing stages", ("stage",)
+)
+stage_errors_total = registry.counter(
+    "ai_service_stage_errors_total", "Internal stages that raised", ("stage",)
+)
+cache_requests_total = registry.counter(
+    "ai_service_cache_requests_total", "Cache lookups by result (hit, near_hit or miss)", ("cache", "result")
+)
+pool_wait_duration = registry.histogram(
+    "ai_service_pool_wait_seconds", "Time blocking work waited in a service pool queue", ("pool",)
+)
+coalesced_requests_total = registry.counter(
+    "ai_service_coalesced_requests_total",
+    "Coalesced requests by outcome (leader, shared or replayed)",
+    ("route", "outcome")
+)
+quality_tier_responses_total = registry.counter(
+    "ai_service_quality_tier_responses_total", "Responses served per pipeline and quality tier", ("pipeline", "tier")
+)
+batch_size_histogram = registry.histogram(
+    "ai_service_batch_size", "Inputs per model forward pass by micro-batcher", ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+batch_wait_duration = registry.histogram(
+    "ai_service_batch_wait_seconds", "Time inputs waited for their micro-batch to start", ("batcher",)
+)
+admission_wait_duration = registry.histogram(
+    "ai_service_admission_wait_seconds", "Time requests queued for admission by priority class", ("priority",)
+)
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str):
+    """Time a block as one observation of ``stage`` (and as a trace span)"""
+    started = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except BaseException:
+        stage_errors_total.inc(stage=stage)
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - started, stage=stage)
+
+
+def record_cache(cache: str, hit: bool, near_hit: bool = False) -> None:
+    """Count one lookup against a named cache; near_hit is a partial reuse on a miss"""
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "near_hit" if near_hit else "miss")
+
+
+def register_pool_collector(dispatcher) -> None:
+    """Export the dispatcher's pool occupancy and counters on every scrape"""
+    workers = registry.gauge("ai_service_pool_workers", "Worker threads per service pool", ("pool",))
+    capacity = registry.gauge("ai_service_pool_queue_capacity", "Queue depth per service pool", ("pool",))
+    active = registry.gauge("ai_service_pool_active", "Calls running on a service pool", ("pool",))
+    queued = registry.gauge("ai_service_pool_queued", "Calls waiting in a service pool queue", ("pool",))
+    completed = registry.counter("ai_service_pool_completed_total", "Calls finished by a service pool", ("pool",))
+    rejected = registry.counter("ai_service_pool_rejected_total", "Calls rejected by a saturated pool", ("pool",))
+
+    def collect():
+        for name, stats in dispatcher.stats().items():
+            workers.set(stats["workers"], pool=name)
+            capacity.set(stats["queue_depth"], pool=name)
+            active.set(stats["active"], pool=name)
+            queued.set(stats["queued"], pool=name)
+            completed.set_total(stats["completed"], pool=name)
+            rejected.set_total(stats["rejected"], pool=name)
+
+    registry.register_collector(collect)
+
+
+def register_admission_collector(controller) -> None:
+    """Export each priority class's occupancy and admission counters on every scrape"""
+    limit = registry.gauge("ai_service_admission_limit", "Concurrency limit per priority class", ("priority",))
+    active = registry.gauge("ai_service_admission_active", "Requests running per priority class", ("priority",))
+    queued = registry.gauge("ai_service_admission_queued", "Requests waiting per priority class", ("priority",))
+    admitted = registry.counter(
+        "ai_service_admission_admitted_total", "Requests admitted per priority class", ("priority",)
+    )
+    rejected = registry.counter(
+        "ai_service_admission_rejected_total", "Requests shed per priority class and reason", ("priority", "reason")
+    )
+    cpu = registry.gauge("ai_service_admission_cpu_utilization", "Host CPU utilization seen by admission control")
+
+    def collect():
+        for name, stats in controller.stats().items():
+            limit.set(stats["max_concurrent"], priority=name)
+            active.set(stats["active"], priority=name)
+            queued.set(stats["queued"], priority=name)
+            admitted.set_total(stats["admitted"], priority=name)
+            for reason, count in stats["rejected"].items():
+                rejected.set_total(count, priority=name, reason=reason)
+        cpu.set(controller.cpu_monitor.utilization())
+
+    registry.register_collector(collect)
+
+
+def register_degradation_collector(controller) -> None:
+    """Export each pipeline's current quality tier (0 = full quality) and its load signals"""
+    level = registry.gauge("ai_service_quality_tier_level", "Current quality tier per pipeline, 0 is full", ("pipeline",))
+    p95 = registry.gauge("ai_service_degradation_p95_seconds", "Recent p95 latency seen per pipeline", ("pipeline",))
+    queue = registry.gauge("ai_service_degradation_queue_ratio", "Pool queue occupancy seen per pipeline", ("pipeline",))
+
+    def collect():
+        for name, state in controller.snapshot().items():
+            level.set(state["level"], pipeline=name)
+            p95.set(state["p95_seconds"] or 0, pipeline=name)
+            queue.set(state["queue_ratio"], pipeline=name)
+
+    registry.register_collector(collect)
@@ -0,0 +1,270 @@
+"""
+Registry of the model artifacts the services load, and a pinned local cache.
+
+``python models_cli.py prefetch`` downloads every artifact the enabled
+services need into MODEL_CACHE_DIR and writes ``manifest.json`` with the
+resolved revision and a SHA-256 for every file. At runtime ``model_source``
+returns the cached path instead of a hub name, and
+``configure_environment`` forces the Hugging Face hubs offline so a missing
+file fails fast instead of triggering a download.
+
+With MODEL_CACHE_DIR unset everything behaves as before: services pass the
+hub names and download on first use.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config import settings
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ModelNotCachedError(RuntimeError):
+    """Raised in offline mode when an artifact is missing from the cache"""
+
+    def __init__(self, key: str):
+        super().__init__(
+            f"Model '{key}' is not in MODEL_CACHE_DIR ({settings.MODEL_CACHE_DIR}) and downloads are "
+            f"disabled; run: python models_cli.py prefetch --services {','.join(ARTIFACTS[key].services)}"
+        )
+        self.key = key
+
+
+class ModelArtifact:
+    """One downloadable model and the services that need it"""
+
+    def __init__(self, key: str, kind: str, name: str, services: Iterable[str], revision: str = "main"):
+        self.key = key
+        self.kind = kind  # "clip", "sentence_transformers", "causal_lm" or "sequence_classification"
+        self.name = name
+        self.services = tuple(services)
+        self.revision = revision
+
+    @property
+    def relative_path(self) -> str:
+        if self.kind == "clip":
+            return f"clip/{self.name.replace('/', '-').replace('@', '-')}.pt"
+        return f"hf/{self.name.replace('/', '--')}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "key": self.key,
+            "kind": self.kind,
+            "name": self.name,
+            "services": list(self.services),
+            "revision": self.revision
+        }
+
+
+# Services here are the names used for warm-up and the dispatch pools
+ARTIFACTS: Dict[str, ModelArtifact] = {
+    "clip": ModelArtifact("clip", "clip", "ViT-L/14@336px", ["image"]),
+    "minilm": ModelArtifact(
+        "minilm", "sentence_transformers", "sentence-transformers/all-MiniLM-L6-v2", ["activities"]
+    ),
+    "qwen": ModelArtifact("qwen", "causal_lm", "Qwen/Qwen2.5-0.5B-Instruct", ["itinerary"]),
+    "sentiment": ModelArtifact(
+        "sentiment", "sequence_classification", "cardiffnlp/twitter-roberta-base-sentiment", ["sentiment"]
+    ),
+}
+if settings.CASCADE_ENABLED:
+    # Small backbone for the first stage of the cascade image search
+    ARTIFACTS["clip_small"] = ModelArtifact("clip_small", "clip", settings.CASCADE_BACKBONE, ["image"])
+
+
+def cache_dir() -> Optional[Path]:
+    return Path(settings.MODEL_CACHE_DIR).expanduser() if settings.MODEL_CACHE_DIR else None
+
+
+def artifacts_for(services: Optional[Iterable[str]] = None) -> List[ModelArtifact]:
+    """Artifacts needed by the given services (all of them when None)"""
+    if services is None:
+        return list(ARTIFACTS.values())
+    wanted = set(services)
+    unknown = wanted - {s for a in ARTIFACTS.values() for s in a.services}
+    if unknown:
+        raise ValueError(f"Unknown services: {', '.join(sorted(unknown))}")
+    return [a for a in ARTIFACTS.values() if wanted & set(a.services)]
+
+
+def load_manifest(directory: Optional[Path] = None) -> Dict[str, Dict]:
+    directory = directory or cache_dir()
+    if directory is None:
+        return {}
+    path = directory / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict[str, Dict], directory: Path) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f"{MANIFEST_NAME}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, directory / MANIFEST_NAME)
+
+
+def configure_environment() -> None:
+    """
+    Force the hubs offline and point library-level settings at the cache.
+
+    Must run before huggingface_hub/transformers are imported, since they
+    read these variables at import time.
+    """
+    directory = cache_dir()
+    if directory is None:
+        return
+    if settings.MODELS_OFFLINE:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    # The sentiment analyzer lives outside ai-service and reads its model from the environment
+    manifest = load_manifest(directory)
+    if "sentiment" in manifest:
+        os.environ.setdefault("SENTIMENT_MODEL_NAME", str(directory / manifest["sentiment"]["path"]))
+
+
+def model_source(key: str) -> str:
+    """
+    What to pass to the loader for an artifact: the cached path when it has
+    been prefetched, otherwise the hub name (or an error when offline).
+    """
+    artifact = ARTIFACTS[key]
+    directory = cache_dir()
+    if directory is None:
+        return artifact.name
+    entry = load_manifest(directory).get(key)
+    if entry and (directory / entry["path"]).exists():
+        return str(directory / entry["path"])
+    if settings.MODELS_OFFLINE:
+        raise ModelNotCachedError(key)
+    return artifact.name
+
+
+def sha256_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _artifact_files(root: Path) -> List[Path]:
+    if root.is_file():
+        return [root]
+    return sorted(p for p in root.rglob("*") if p.is_file() and ".cache" not in p.relative_to(root).parts)
+
+
+def checksum_artifact(directory: Path, relative_path: str) -> Dict[str, str]:
+    """SHA-256 of every file of an artifact, keyed by path relative to the cache"""
+    root = directory / relative_path
+    return {str(p.relative_to(directory)): sha256_file(p) for p in _artifact_files(root)}
+
+
+def _download(artifact: ModelArtifact, directory: Path) -> str:
+    """Fetch one artifact into the cache; returns the resolved revision"""
+    target = directory / artifact.relative_path
+    if artifact.kind == "clip":
+        import clip
+        # clip.load verifies the SHA-256 embedded in its download URL
+        clip_dir = target.parent
+        clip_dir.mkdir(parents=True, exist_ok=True)
+        downloaded = Path(clip._download(clip._MODELS[artifact.name], str(clip_dir)))
+        if downloaded != target:
+            os.replace(downloaded, target)
+        return clip._MODELS[artifact.name].split("/")[-2]
+
+    from huggingface_hub import HfApi, snapshot_download
+    revision = HfApi().model_info(artifact.name, revision=artifact.revision).sha
+    snapshot_download(repo_id=artifact.name, revision=revision, local_dir=str(target))
+    return revision
+
+
+def prefetch(services: Optional[Iterable[str]] = None, force: bool = False) -> List[Dict]:
+    """Download the artifacts for ``services`` and record them in the manifest"""
+    directory = cache_dir()
+    if directory is None:
+        raise RuntimeError("MODEL_CACHE_DIR is not set")
+    if os.environ.get("HF_HUB_OFFLINE") == "1":
+        raise RuntimeError("Prefetch needs network access; unset HF_HUB_OFFLINE")
+
+    manifest = load_manifest(directory)
+    report = []
+    for artifact in artifacts_for(services):
+        if artifact.key in manifest and not force and (directory / manifest[artifact.key]["path"]).exists():
+            report.append({"key": artifact.key, "status": "cached"})
+            continue
+        started = time.perf_counter()
+        revision = _download(artifact, directory)
+        files = checksum_artifact(directory, artifact.relative_path)
+        manifest[artifact.key] = {
+            **artifact.to_dict(),
+            "revision": revision,
+            "path": artifact.relative_path,
+            "files": files,
+            "bytes": sum((directory / f).stat().st_size for f in files),
+            "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        save_manifest(manifest, directory)
+        report.append({
+            "key": artifact.key,
+            "status": "fetched",
+            "revision": revision,
+            "seconds": round(time.perf_counter() - started, 1)
+        })
+    return report
+
+
+def verify(services: Optional[Iterable[str]] = None) -> List[Dict]:
+    """Recompute checksums and compare them with the manifest"""
+    directory = cache_dir()
+    if directory is None:
+        raise RuntimeError("MODEL_CACHE_DIR is not set")
+    manifest = load_manifest(directory)
+    report = []
+    for artifact in artifacts_for(services):
+        entry = manifest.get(artifact.key)
+        if entry is None:
+            report.append({"key": artifact.key, "status": "missing", "problems": ["not prefetched"]})
+            continue
+        problems = []
+        actual = checksum_artifact(directory, entry["path"]) if (directory / entry["path"]).exists() else {}
+        for name, expected in entry["files"].items():
+            if name not in actual:
+                problems.append(f"missing file {name}")
+            elif actual[name] != expected:
+                problems.append(f"checksum mismatch {name}")
+        for name in sorted(set(actual) - set(entry["files"])):
+            problems.append(f"unexpected file {name}")
+        report.append({
+            "key": artifact.key,
+            "status": "ok" if not problems else "corrupt",
+            "revision": entry.get("revision"),
+            "files": len(entry["files"]),
+            "problems": problems
+        })
+    return report
+
+
+def load_artifact(key: str):
+    """Load an artifact the way its service does (used for load-time reports)"""
+    artifact = ARTIFACTS[key]
+    source = model_source(key)
+    if artifact.kind == "clip":
+        import clip
+        return clip.load(source, device="cpu")
+    if artifact.kind == "sentence_transformers":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(source)
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    if artifact.kind == "causal_lm":
+        from transformers import AutoModelForCausalLM
+        return tokenizer, AutoModelForCausalLM.from_pretrained(source)
+    from transformers import AutoModelForSequenceClassification
+    return tokenizer, AutoModelForSequenceClassification.from_pretrained(source)
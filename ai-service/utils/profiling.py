@@ -0,0 +1,384 @@
+"""
+On-demand CPU and memory profiling of a running worker.
+
+Three tools back the /admin/profile endpoints in main.py:
+
+- ``RouteProfiler`` profiles the next N requests that match a route with
+  cProfile. The request's blocking work runs on the service pools, so the
+  pool wrapper in utils/dispatch.py profiles each call through
+  ``run_profiled``; the per-call profiles are merged into one pstats file.
+- ``StackSampler`` samples the stacks of every thread for T seconds and
+  writes folded stacks (``flamegraph.pl`` / speedscope format).
+- ``AllocationTracker`` wraps tracemalloc: start, take snapshots (top
+  allocations plus a ``.tracemalloc`` dump), diff two snapshots, stop.
+
+All output files go to PROFILE_OUTPUT_DIR and are listed and downloaded
+through the admin endpoints.
+"""
+import cProfile
+import contextvars
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+
+_request_profile: contextvars.ContextVar[Optional["RouteProfileSession"]] = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+
+def output_dir() -> Path:
+    path = Path(settings.PROFILE_OUTPUT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def list_output_files() -> List[Dict[str, Any]]:
+    directory = Path(settings.PROFILE_OUTPUT_DIR)
+    if not directory.exists():
+        return []
+    return [
+        {"name": p.name, "bytes": p.stat().st_size, "modified": p.stat().st_mtime}
+        for p in sorted(directory.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+        if p.is_file()
+    ]
+
+
+def resolve_output_file(name: str) -> Optional[Path]:
+    """Path of a file in the output directory, or None (rejects path traversal)"""
+    if not name or Path(name).name != name:
+        return None
+    path = Path(settings.PROFILE_OUTPUT_DIR) / name
+    return path if path.is_file() else None
+
+
+def _stamp() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+# ---------------------------------------------------------------------------
+# cProfile of the next N matching requests
+# ---------------------------------------------------------------------------
+
+class RouteProfileSession:
+    """Collects cProfile data for a fixed number of requests to one route"""
+
+    def __init__(self, route: str, requests: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.requested = requests
+        self.claimed = 0
+        self.finished = 0
+        self.created = time.time()
+        self.file_name: Optional[str] = None
+        self.top_functions: List[Dict[str, Any]] = []
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.file_name is not None
+
+    def claim(self) -> bool:
+        """Reserve one request slot; False once all N are taken"""
+        with self._lock:
+            if self.claimed >= self.requested:
+                return False
+            self.claimed += 1
+            return True
+
+    def run(self, fn: Callable[[], Any]) -> Any:
+        # A Profile is not thread-safe, so each pool call gets its own and the
+        # results are merged when the session completes
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn)
+        finally:
+            with self._lock:
+                self._profiles.append(profile)
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self.finished += 1
+            complete = self.finished >= self.requested
+        if complete:
+            self._write()
+
+    def _write(self) -> None:
+        name = f"requests-{self.route.strip('/').replace('/', '_').replace('{', '').replace('}', '')}-{_stamp()}.pstats"
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            # Requests that never reached a service pool have nothing to report
+            self.file_name = ""
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(str(output_dir() / name))
+        self.top_functions = top_functions(stats)
+        self.file_name = name
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "route": self.route,
+            "requests": self.requested,
+            "profiled": self.finished,
+            "pool_calls": len(self._profiles),
+            "done": self.done,
+            "file": self.file_name or None,
+            "top_functions": self.top_functions,
+            "pid": os.getpid()
+        }
+
+
+def top_functions(stats: pstats.Stats, limit: int = 25) -> List[Dict[str, Any]]:
+    """Most expensive functions by cumulative time"""
+    rows = []
+    for (filename, line, func), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{func} ({filename}:{line})",
+            "calls": calls,
+            "total_s": round(total, 4),
+            "cumulative_s": round(cumulative, 4)
+        })
+    rows.sort(key=lambda r: r["cumulative_s"], reverse=True)
+    return rows[:limit]
+
+
+class RouteProfiler:
+    """Arms profiling sessions and hands them to matching requests"""
+
+    def __init__(self):
+        self._sessions: Dict[str, RouteProfileSession] = {}
+        self._lock = threading.Lock()
+
+    def arm(self, route: str, requests: int) -> RouteProfileSession:
+        session = RouteProfileSession(route, requests)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[RouteProfileSession]:
+        return self._sessions.get(session_id)
+
+    def sessions(self) -> List[RouteProfileSession]:
+        return list(self._sessions.values())
+
+    def armed(self) -> bool:
+        """Cheap check so unprofiled traffic skips route matching"""
+        return any(not s.done and s.claimed < s.requested for s in list(self._sessions.values()))
+
+    def claim(self, route: str) -> Optional[RouteProfileSession]:
+        """The first armed session for ``route`` with a free slot, if any"""
+        with self._lock:
+            candidates = [s for s in self._sessions.values() if s.route == route and not s.done]
+        for session in candidates:
+            if session.claim():
+                return session
+        return None
+
+
+def activate_request_profile(session: RouteProfileSession) -> contextvars.Token:
+    return _request_profile.set(session)
+
+
+def deactivate_request_profile(token: contextvars.Token) -> None:
+    _request_profile.reset(token)
+
+
+def run_profiled(fn: Callable[[], Any]) -> Any:
+    """Run ``fn``, under cProfile if the current request is being profiled"""
+    session = _request_profile.get()
+    if session is None:
+        return fn()
+    return session.run(fn)
+
+
+# ---------------------------------------------------------------------------
+# Wall-clock stack sampling
+# ---------------------------------------------------------------------------
+
+class StackSampler:
+    """Samples every thread's Python stack and aggregates folded stacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fold(frame, thread_name: str) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.append(thread_name)
+        return ";".join(reversed(names))
+
+    def sample(self, seconds: float, interval: float = 0.01) -> Dict[str, Any]:
+        """
+        Sample for ``seconds`` and write a ``.folded`` file.
+
+        Blocks the calling thread; only one sampling run at a time.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A stack sample is already running")
+        try:
+            own_thread = threading.get_ident()
+            counts: Counter = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    counts[self._fold(frame, names.get(thread_id, str(thread_id)))] += 1
+                samples += 1
+                time.sleep(interval)
+
+            name = f"stacks-{_stamp()}.folded"
+            with open(output_dir() / name, "w") as f:
+                for stack, count in counts.most_common():
+                    f.write(f"{stack} {count}\n")
+            return {
+                "file": name,
+                "seconds": seconds,
+                "samples": samples,
+                "unique_stacks": len(counts),
+                "hottest": [{"stack": s, "count": c} for s, c in counts.most_common(10)],
+                "pid": os.getpid()
+            }
+        finally:
+            self._lock.release()
+
+
+# ---------------------------------------------------------------------------
+# tracemalloc snapshots
+# ---------------------------------------------------------------------------
+
+# Frames from the profiler itself are noise in allocation reports
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class AllocationTracker:
+    """Start/stop tracemalloc and keep the snapshots taken while it runs"""
+
+    def __init__(self, max_snapshots: int = 10):
+        self.max_snapshots = max_snapshots
+        self._snapshots: Dict[str, tracemalloc.Snapshot] = {}
+        self._order: List[str] = []
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 25) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+            self._order.clear()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced_mb": round(current / (1024 * 1024), 2),
+            "peak_mb": round(peak / (1024 * 1024), 2),
+            "snapshots": list(self._order),
+            "pid": os.getpid()
+        }
+
+    def snapshot(self, key_type: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+        """Take a snapshot, dump it to a file and report the top allocations"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first")
+        snap = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        snapshot_id = f"snapshot-{_stamp()}"
+        snap.dump(str(output_dir() / f"{snapshot_id}.tracemalloc"))
+        with self._lock:
+            self._snapshots[snapshot_id] = snap
+            self._order.append(snapshot_id)
+            while len(self._order) > self.max_snapshots:
+                self._snapshots.pop(self._order.pop(0), None)
+
+        stats = snap.statistics(key_type)
+        return {
+            "id": snapshot_id,
+            "file": f"{snapshot_id}.tracemalloc",
+            "total_mb": round(sum(s.size for s in stats) / (1024 * 1024), 2),
+            "top": [
+                {"location": _format_trace(s.traceback, key_type), "size_kb": round(s.size / 1024, 1), "count": s.count}
+                for s in stats[:limit]
+            ],
+            "pid": os.getpid()
+        }
+
+    def diff(self, base_id: str, target_id: Optional[str] = None,
+             key_type: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+        """Compare ``target_id`` (or a fresh snapshot) against ``base_id``"""
+        base = self._snapshots.get(base_id)
+        if base is None:
+            raise KeyError(f"Unknown snapshot: {base_id}")
+        if target_id is None:
+            target_id = self.snapshot(key_type, limit=0)["id"]
+        target = self._snapshots.get(target_id)
+        if target is None:
+            raise KeyError(f"Unknown snapshot: {target_id}")
+
+        stats = target.compare_to(base, key_type)
+        lines = [f"Allocation diff {base_id} -> {target_id} ({key_type})"]
+        for stat in stats[:200]:
+            lines.append(str(stat))
+        name = f"diff-{_stamp()}.txt"
+        with open(output_dir() / name, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        return {
+            "base": base_id,
+            "target": target_id,
+            "file": name,
+            "size_diff_mb": round(sum(s.size_diff for s in stats) / (1024 * 1024), 2),
+            "top": [
+                {
+                    "location": _format_trace(s.traceback, key_type),
+                    "size_diff_kb": round(s.size_diff / 1024, 1),
+                    "size_kb": round(s.size / 1024, 1),
+                    "count_diff": s.count_diff
+                }
+                for s in stats[:limit]
+            ],
+            "pid": os.getpid()
+        }
+
+
+def _format_trace(traceback: tracemalloc.Traceback, key_type: str) -> str:
+    if key_type == "traceback":
+        # Frames are ordered oldest call first
+        return " -> ".join(f"{Path(f.filename).name}:{f.lineno}" for f in traceback)
+    frame = traceback[-1]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+route_profiler = RouteProfiler()
+stack_sampler = StackSampler()
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,106 @@
+"""
+Startup warm-up and per-service readiness tracking.
+
+Services register a loader; ``start`` runs the selected loaders on parallel
+threads and records their state so ``/ready`` can tell a load balancer when
+the models are warm.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utils.memory import current_rss_mb
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ServiceState:
+    """Load state of a single service"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = PENDING
+        self.load_seconds: Optional[float] = None
+        self.rss_before_mb: Optional[float] = None
+        self.rss_after_mb: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        rss_delta = None
+        if self.rss_before_mb is not None and self.rss_after_mb is not None:
+            rss_delta = round(self.rss_after_mb - self.rss_before_mb, 1)
+        return {
+            "status": self.status,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            # Loads run in parallel, so the delta is approximate when several overlap
+            "rss_delta_mb": rss_delta,
+            "rss_after_mb": round(self.rss_after_mb, 1) if self.rss_after_mb is not None else None,
+            "error": self.error
+        }
+
+
+class ReadinessRegistry:
+    """Registry of service loaders and their warm-up state"""
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], None]] = {}
+        self._states: Dict[str, ServiceState] = {}
+        self._selected: List[str] = []
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], None]) -> None:
+        self._loaders[name] = loader
+
+    @property
+    def available(self) -> List[str]:
+        return list(self._loaders)
+
+    def _load(self, name: str) -> None:
+        state = self._states[name]
+        state.status = LOADING
+        state.rss_before_mb = current_rss_mb()
+        started = time.perf_counter()
+        try:
+            self._loaders[name]()
+            state.status = READY
+        except Exception as e:
+            state.status = FAILED
+            state.error = str(e)
+            print(f"[Warmup] Failed to load {name}: {e}")
+        finally:
+            state.load_seconds = time.perf_counter() - started
+            state.rss_after_mb = current_rss_mb()
+        print(f"[Warmup] {name}: {state.status} in {state.load_seconds:.2f}s")
+
+    def start(self, names: Iterable[str]) -> List[threading.Thread]:
+        """Load the selected services on parallel background threads"""
+        unknown = [n for n in names if n not in self._loaders]
+        if unknown:
+            raise ValueError(f"Unknown services for warm-up: {', '.join(unknown)}")
+
+        threads = []
+        with self._lock:
+            for name in names:
+                if name in self._states:
+                    continue
+                self._states[name] = ServiceState(name)
+                self._selected.append(name)
+                thread = threading.Thread(target=self._load, args=(name,), name=f"warmup-{name}", daemon=True)
+                threads.append(thread)
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def is_ready(self) -> bool:
+        """True once every selected service has loaded successfully"""
+        return all(self._states[name].status == READY for name in self._selected)
+
+    def snapshot(self) -> Dict:
+        return {
+            "ready": self.is_ready(),
+            "rss_mb": current_rss_mb(),
+            "services": {name: self._states[name].to_dict() for name in self._selected}
+        }
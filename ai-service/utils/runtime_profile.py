@@ -0,0 +1,204 @@
+"""
+CPU inference runtime profiles for the torch-based services.
+
+Each service (image, activities, llm, sentiment) gets a profile built from
+config.Settings: an intra-op thread budget, inference_mode vs no_grad,
+optional bf16 autocast, optional int8 dynamic quantization of Linear layers
+and, for the vision model, channels_last memory format. Services apply the
+profile when they load their model and wrap inference in
+``inference_context``.
+
+The intra-op thread budget is not set at load: torch.set_num_threads would
+set it for the whole process, so whichever service loaded last would win.
+Budgets are pinned per thread instead, in the dispatch pool and batcher
+threads that run each service's inference (``pool_thread_initializer``).
+
+torch is imported lazily so modules that only need the settings do not pay
+for it.
+"""
+import contextlib
+import threading
+from typing import Callable, Optional
+
+from config import settings
+
+# Services whose model is a vision network (channels_last only helps convolutions)
+VISION_SERVICES = {"image"}
+
+# Which runtime profile the threads of each dispatch pool should use
+POOL_RUNTIME_SERVICES = {
+    "image": "image",
+    "activities": "activities",
+    "itinerary": "llm",
+    "sentiment": "sentiment",
+}
+
+_interop_lock = threading.Lock()
+_interop_applied = False
+_default_threads_lock = threading.Lock()
+_default_threads: Optional[int] = None
+
+
+class RuntimeProfile:
+    """Inference settings for one torch-based service"""
+
+    def __init__(
+        self,
+        service: str,
+        intra_op_threads: int = 0,
+        inference_mode: bool = True,
+        bf16_autocast: bool = False,
+        int8_dynamic: bool = False,
+        channels_last: bool = False
+    ):
+        self.service = service
+        self.intra_op_threads = intra_op_threads
+        self.inference_mode = inference_mode
+        self.bf16_autocast = bf16_autocast
+        self.int8_dynamic = int8_dynamic
+        self.channels_last = channels_last
+
+    def describe(self) -> str:
+        parts = [f"threads={self.intra_op_threads or 'default'}"]
+        parts.append("inference_mode" if self.inference_mode else "no_grad")
+        if self.bf16_autocast:
+            parts.append("bf16")
+        if self.int8_dynamic:
+            parts.append("int8")
+        if self.channels_last:
+            parts.append("channels_last")
+        return f"{self.service}[{', '.join(parts)}]"
+
+    def __repr__(self) -> str:
+        return f"RuntimeProfile({self.describe()})"
+
+
+def get_runtime_profile(service: str) -> RuntimeProfile:
+    """Build the configured profile for a service"""
+    return RuntimeProfile(
+        service,
+        intra_op_threads=settings.TORCH_THREADS.get(service, 0),
+        inference_mode=settings.TORCH_INFERENCE_MODE,
+        bf16_autocast=service in settings.TORCH_BF16_SERVICES,
+        int8_dynamic=service in settings.TORCH_INT8_SERVICES,
+        channels_last=settings.TORCH_CHANNELS_LAST and service in VISION_SERVICES
+    )
+
+
+def _apply_interop_threads(torch) -> None:
+    """Inter-op threads are process-wide and can only be set once, before first use"""
+    global _interop_applied
+    with _interop_lock:
+        if _interop_applied or settings.TORCH_INTEROP_THREADS <= 0:
+            return
+        _interop_applied = True
+        try:
+            torch.set_num_interop_threads(settings.TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            print(f"[RuntimeProfile] Could not set inter-op threads: {e}")
+
+
+def apply_process_settings() -> None:
+    """Process-wide settings for a service loading its model (inter-op threads only)"""
+    import torch
+
+    _apply_interop_threads(torch)
+
+
+def pin_intra_op_threads(torch, threads: int) -> None:
+    """
+    Set the calling thread's intra-op thread count.
+
+    With the OpenMP backend torch keeps the count per thread, but initializes
+    each thread lazily from the process-wide value last passed to
+    set_num_threads, possibly by another thread. get_num_threads() runs that
+    initialization first, so it cannot later overwrite this thread's budget.
+    The first call records torch's default before anything changes it.
+    """
+    _process_default_threads(torch)
+    torch.get_num_threads()
+    torch.set_num_threads(threads)
+
+
+def apply_thread_settings(profile: RuntimeProfile) -> None:
+    """Apply the profile's thread budget to the calling thread"""
+    import torch
+
+    _apply_interop_threads(torch)
+    if profile.intra_op_threads > 0:
+        pin_intra_op_threads(torch, profile.intra_op_threads)
+
+
+def prepare_model(model, profile: RuntimeProfile):
+    """
+    Put a loaded model into inference form for this profile.
+
+    Changes are made in place (the same object is returned) so models held
+    by module-level singletons can be prepared without rebinding them.
+    """
+    import torch
+
+    model.eval()
+    if profile.channels_last:
+        model.to(memory_format=torch.channels_last)
+    if profile.int8_dynamic:
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def prepare_input(tensor, profile: RuntimeProfile):
+    """Match an input batch to the model's memory format"""
+    if profile.channels_last and tensor.dim() == 4:
+        import torch
+        return tensor.contiguous(memory_format=torch.channels_last)
+    return tensor
+
+
+@contextlib.contextmanager
+def inference_context(profile: RuntimeProfile):
+    """Grad-free (and optionally bf16 autocast) context for one inference call"""
+    import torch
+
+    grad_context = torch.inference_mode() if profile.inference_mode else torch.no_grad()
+    with grad_context:
+        if profile.bf16_autocast:
+            with torch.autocast("cpu", dtype=torch.bfloat16):
+                yield
+        else:
+            yield
+
+
+def _process_default_threads(torch) -> int:
+    """torch's own intra-op default, read once before the first pin_intra_op_threads sets a count"""
+    global _default_threads
+    with _default_threads_lock:
+        if _default_threads is None:
+            _default_threads = torch.get_num_threads()
+        return _default_threads
+
+
+def pool_thread_initializer(pool_name: str) -> Optional[Callable[[], None]]:
+    """
+    Initializer for a dispatch pool's (or batcher's) worker threads, or None
+    when no thread budget is configured.
+
+    Each thread pins its service's intra-op budget, so every service gets its
+    own budget instead of all of them sharing one process-wide setting.
+    Pools without a budget pin torch's default, so their threads don't
+    inherit another pool's value when they first run torch code. torch is
+    imported by the thread itself: pools are built when main is imported,
+    which must stay free of torch.
+    """
+    if not any(settings.TORCH_THREADS.values()):
+        return None
+    budget = settings.TORCH_THREADS.get(POOL_RUNTIME_SERVICES.get(pool_name), 0)
+
+    def initializer():
+        try:
+            import torch
+        except ImportError:
+            return
+        _apply_interop_threads(torch)
+        pin_intra_op_threads(torch, budget or _process_default_threads(torch))
+
+    return initializer
@@ -0,0 +1,205 @@
+"""
+Lightweight in-process tracing.
+
+Each sampled request gets a ``Trace`` with a root span. Code opens nested
+spans with ``span("name")`` and attaches debug events with
+``event("message", key=value)``. Both are tracked through contextvars, so
+they follow the request across ``await`` and into service pool threads
+(the dispatcher runs pool work in a copy of the caller's context).
+
+When a request is not sampled, or the code runs outside a request
+(warm-up, scripts), ``span`` and ``event`` cost one context lookup and
+record nothing. Sampled requests slower than SLOW_REQUEST_THRESHOLD_MS are
+written with their full span tree to SLOW_REQUEST_LOG_PATH as JSON lines.
+"""
+import contextlib
+import contextvars
+import json
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_current_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_request_id", default=None)
+
+_log_lock = threading.Lock()
+
+
+class Span:
+    """One timed block with attributes, events and child spans"""
+
+    def __init__(self, trace: "Trace", name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs or {}
+        self.events: List[Dict[str, Any]] = []
+        self.children: List["Span"] = []
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def add_event(self, message: str, attrs: Dict[str, Any]) -> None:
+        self.events.append({
+            "offset_ms": round((time.perf_counter() - self.trace.started) * 1000, 3),
+            "message": message,
+            **attrs
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.started) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "thread": self.thread,
+            "attrs": self.attrs,
+            "events": self.events,
+            "children": [child.to_dict() for child in self.children]
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned when nothing is being recorded"""
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def add_event(self, message: str, attrs: Dict[str, Any]) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Span tree for one request"""
+
+    def __init__(self, request_id: str, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.root = Span(self, name, attrs)
+
+    def finish(self) -> None:
+        self.root.end = time.perf_counter()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "timestamp": self.wall_started,
+            "duration_ms": round(self.root.duration_ms, 3),
+            "root": self.root.to_dict()
+        }
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Reuse the caller's request ID when it sent one, otherwise make one"""
+    if incoming and len(incoming) <= 128:
+        return incoming
+    return uuid.uuid4().hex
+
+
+def current_request_id() -> Optional[str]:
+    return _current_request_id.get()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def should_sample() -> bool:
+    rate = settings.TRACE_SAMPLE_RATE
+    return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+
+@contextlib.contextmanager
+def start_trace(request_id: str, name: str, sampled: bool = True, **attrs):
+    """
+    Make ``request_id`` current for the block and, when sampled, record a
+    span tree rooted at ``name``. Yields the Trace, or None if unsampled.
+    """
+    id_token = _current_request_id.set(request_id)
+    if not sampled:
+        try:
+            yield None
+        finally:
+            _current_request_id.reset(id_token)
+        return
+
+    trace = Trace(request_id, name, attrs)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        _current_request_id.reset(id_token)
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Time a nested block under the current span; a no-op when not tracing"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+
+    child = Span(parent.trace, name, attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.attrs["error"] = repr(e)
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def event(message: str, **attrs) -> None:
+    """
+    Attach a debug event to the current span.
+
+    Pass values as keyword arguments rather than pre-formatting a string so
+    an unsampled call does no formatting work.
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.add_event(message, attrs)
+    if settings.TRACE_PRINT_EVENTS:
+        details = " ".join(f"{key}={value}" for key, value in attrs.items())
+        print(f"[Trace {_current_request_id.get() or '-'}] {message} {details}".rstrip())
+
+
+def is_slow(trace: Trace) -> bool:
+    threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+    return bool(settings.SLOW_REQUEST_LOG_PATH) and threshold >= 0 and trace.root.duration_ms >= threshold
+
+
+def write_slow_request(trace: Trace, **extra) -> None:
+    """Append the trace's span tree to the slow-request log as one JSON line"""
+    record = {**trace.to_dict(), **extra}
+    line = json.dumps(record, default=str)
+    path = Path(settings.SLOW_REQUEST_LOG_PATH)
+    with _log_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
@@ -895,20 +895,32 @@ router.post('/:chatId/activities/process-message', authenticate, async (req, res
       });
     }
 
-    // Call AI service
-    const response = await axios.post(`${AI_SERVICE_URL}/api/v1/activities/message`, {
+    // Call AI service: one call updates the activity buffer and the chat's hotel preferences
+    const eventsResponse = await axios.post(`${AI_SERVICE_URL}/api/v1/chat/events`, {
       chat_id: chatId,
-      user: username,
-      message: message
+      events: [{ user: username, user_id: userId, message: message }],
+      features: ['activities', 'hotel_preferences']
     });
+    const { activities, errors = {}, error_status: errorStatus = {} } = eventsResponse.data;
+
+    if (errors.hotel_preferences) {
+      // Hotel recommendations fall back to the chat history, so only log it
+      console.error('Error updating hotel preferences:', errors.hotel_preferences);
+    }
+    if (!activities) {
+      return res.status(errorStatus.activities || 500).json({
+        success: false,
+        message: errors.activities || 'Error processing message'
+      });
+    }
 
     // If recommendations were generated, store them in the database
-    if (response.data.trigger_rec && response.data.recommendations && response.data.recommendations.length > 0) {
+    if (activities.trigger_rec && activities.recommendations && activities.recommendations.length > 0) {
       try {
         const PrivateChat = require('../models/PrivateChat');
         await PrivateChat.findByIdAndUpdate(chatId, {
           $set: {
-            activity_recommendations: response.data.recommendations.map(rec => ({
+            activity_recommendations: activities.recommendations.map(rec => ({
               name: rec.name,
               duration: rec.duration,
               score: rec.score,
@@ -918,7 +930,7 @@ router.post('/:chatId/activities/process-message', authenticate, async (req, res
               lon: rec.lon,
               best_time: rec.best_time,
               generated_at: new Date(),
-              based_on_messages: response.data.message_count
+              based_on_messages: activities.message_count
             }))
           }
         });
@@ -930,7 +942,7 @@ router.post('/:chatId/activities/process-message', authenticate, async (req, res
 
     res.json({
       success: true,
-      data: response.data
+      data: activities
     });
   } catch (error) {
     console.error('Error processing activity message:', error);
@@ -1435,7 +1447,9 @@ router.post('/:chatId/activities/itinerary/generate', authenticate, async (req,
         }))
       },
       {
-        params: { chat_id: chatId }
+        params: { chat_id: chatId },
+        // Lets a client retry with the same key get the original itinerary instead of a new generation
+        headers: req.get('Idempotency-Key') ? { 'Idempotency-Key': req.get('Idempotency-Key') } : {}
       }
     );
 
@@ -1611,7 +1625,8 @@ router.get('/:chatId/hotels/recommendations', authenticate, async (req, res, nex
         `${AI_SERVICE_URL}/api/v1/hotels/recommend`,
         {
           messages: formattedMessages,
-          limit: 5
+          limit: 5,
+          chat_id: chatId
         }
       );
       
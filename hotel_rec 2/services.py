@@ -8,14 +8,13 @@ class HotelService:
     _instance = None
     _hotels: List[Hotel] = []
 
-    def __new__(cls):
+    def __new__(cls, data_path: str = "hotel_data.json"):
         if cls._instance is None:
             cls._instance = super(HotelService, cls).__new__(cls)
-            cls._instance._load_data()
+            cls._instance._load_data(data_path)
         return cls._instance
 
-    def _load_data(self):
-        data_path = "hotel_data.json"
+    def _load_data(self, data_path: str):
         if os.path.exists(data_path):
             with open(data_path, "r") as f:
                 raw_data = json.load(f)
@@ -36,8 +35,10 @@ class ChatAnalyzer:
         return False
 
     @staticmethod
-    def extract_preferences(messages: List[ChatMessage]) -> UserPreferences:
-        prefs = UserPreferences()
+    def extract_preferences(messages: List[ChatMessage], prefs: Optional[UserPreferences] = None) -> UserPreferences:
+        # Passing the preferences from earlier messages continues from them,
+        # so new messages can be applied incrementally
+        prefs = prefs.model_copy(deep=True) if prefs is not None else UserPreferences()
         
         # Keywords to identify hotel-related context
         hotel_context_keywords = ["hotel", "resort", "stay", "room", "accommodation", "place to sleep", "check-in", "check-out", "hostel", "airbnb", "booking"]
@@ -3,6 +3,7 @@ import os
 import re
 import numpy as np
 import pickle
+import sys
 import torch
 try:
     import clip  # type: ignore
@@ -11,6 +12,12 @@ except ImportError:
 from typing import List, Dict, Any, Optional, Tuple
 from models import Hotel, UserPreferences, ChatMessage, DetailedRecommendation
 
+# Quantized feature copies are read through image_search/feature_store.py
+_image_search_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "image_search")
+if _image_search_dir not in sys.path:
+    sys.path.append(_image_search_dir)
+from feature_store import load_features
+
 class HotelService:
     _instance = None
     _hotels: List[Hotel] = []
@@ -251,12 +258,15 @@ class VisualSearchService:
         if clip is None: return
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         try:
-            feat_path = os.path.join(os.path.dirname(__file__), "hotel_features_ai.npy")
-            map_path = os.path.join(os.path.dirname(__file__), "mapping.pkl")
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            map_path = os.path.join(base_dir, "mapping.pkl")
+            # Memory-mapped; FEATURES_PRECISION=float16 or int8 uses the compact copies
+            precision = os.getenv("FEATURES_PRECISION", "float32")
+            features = load_features(base_dir, "hotel_features_ai", precision)
             
-            if os.path.exists(feat_path) and os.path.exists(map_path):
+            if features is not None and os.path.exists(map_path):
                 self._model, _ = clip.load("ViT-L/14@336px", device=self.device)
-                self._ai_features = np.load(feat_path)
+                self._ai_features = features
                 with open(map_path, "rb") as f:
                     self._mapping = pickle.load(f)
         except Exception as e:
@@ -282,7 +292,7 @@ class VisualSearchService:
                 text_features /= text_features.norm(dim=-1, keepdim=True)
                 
                 # Calculate similarities: shape (num_images, num_descriptors)
-                similarities = np.dot(self._ai_features, text_features.cpu().numpy().T)
+                similarities = self._ai_features @ text_features.cpu().numpy().T
                 
                 # For each image, find which descriptors match best
                 for i, image_similarities in enumerate(similarities):
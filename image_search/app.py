@@ -3,12 +3,15 @@ import torch
 import clip
 import torchvision.transforms as T
 from PIL import Image, ImageOps, ImageFilter
-import sqlite3
 import pickle
 import numpy as np
 import os
 import io
 
+from feature_store import load_features
+from hotel_catalog import HotelCatalog
+from visual_features import parse_crops, multi_scale_crops, best_crop_scores, color_texture_signature
+
 @st.cache_resource
 def load_resources():
     device = "cpu"
@@ -17,12 +20,12 @@ def load_resources():
     # Get the directory where app.py is located
     base_path = os.path.dirname(os.path.abspath(__file__))
     
-    ai_feat_path = os.path.join(base_path, "hotel_features_ai.npy")
-    color_feat_path = os.path.join(base_path, "hotel_features_color.npy")
     mapping_path = os.path.join(base_path, "mapping.pkl")
 
-    ai_features = np.load(ai_feat_path) if os.path.exists(ai_feat_path) else None
-    color_features = np.load(color_feat_path) if os.path.exists(color_feat_path) else None
+    # Memory-mapped; FEATURES_PRECISION=float16 or int8 uses the compact copies
+    precision = os.getenv("FEATURES_PRECISION", "float32")
+    ai_features = load_features(base_path, "hotel_features_ai", precision)
+    color_features = load_features(base_path, "hotel_features_color", precision)
     
     if not os.path.exists(mapping_path):
         st.error(f"Required file not found: {mapping_path}")
@@ -32,31 +35,17 @@ def load_resources():
         mapping = pickle.load(f)
     return model, preprocess, ai_features, color_features, mapping
 
-def extract_color_texture_signature(image):
-    img_small = image.resize((64, 64))
-    img_arr = np.array(img_small)
-    hist, _ = np.histogramdd(img_arr.reshape(-1, 3), bins=(4, 4, 4), range=((0,256), (0,256), (0,256)))
-    hist = hist.flatten()
-    hist /= (hist.sum() + 1e-7)
-    img_gray = ImageOps.grayscale(img_small)
-    img_gray_arr = np.array(img_gray).astype(float)
-    dx = np.diff(img_gray_arr, axis=1)
-    dy = np.diff(img_gray_arr, axis=0)
-    texture_sig = np.array([np.mean(dx**2), np.std(dx**2), np.mean(dy**2), np.std(dy**2)])
-    texture_sig /= (np.linalg.norm(texture_sig) + 1e-7)
-    return np.concatenate([hist, texture_sig]).astype("float32")
-
-def get_hotel_details(hotel_id):
+@st.cache_resource
+def load_catalog():
     # Get the directory where app.py is located
     base_path = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(base_path, "hotels.db")
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, stars, price, description, external_link FROM hotels WHERE id = ?", (hotel_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    return HotelCatalog(os.path.join(base_path, "hotels.db"))
+
+def get_hotel_details(hotel_id):
+    hotel = load_catalog().get(hotel_id)
+    if hotel is None:
+        return None
+    return hotel["name"], hotel["stars"], hotel["price"], hotel["description"], hotel["external_link"]
 
 def main():
     st.set_page_config(layout="wide")
@@ -78,13 +67,8 @@ def main():
             st.image(enhanced_image, caption="AI-Enhanced Input (Denoised)", use_container_width=False, width=400)
             
             # --- MULTI-SCALE HYBRID SEARCH ---
-            w, h = enhanced_image.size
-            # Analyze global and local regions
-            crops = [
-                enhanced_image,
-                enhanced_image.crop((w*0.1, h*0.1, w*0.9, h*0.9)),
-                enhanced_image.crop((w*0.2, w*0.2, w*0.8, h*0.8))
-            ]
+            # Analyze global and local regions (IMAGE_SEARCH_CROPS to change them)
+            crops = multi_scale_crops(enhanced_image, parse_crops(os.getenv("IMAGE_SEARCH_CROPS", "")))
             
             st.info("Computing Global/Local dependencies & Color signatures...")
             
@@ -107,19 +91,16 @@ def main():
                     if prob > 0.15:
                         detected_tags.append(visual_features[i].title())
             
-            # 1. AI Score (Semantic)
-            ai_scores_list = []
+            # 1. AI Score (Semantic): all crops in one forward pass and one matrix product
             with torch.no_grad():
-                for crop in crops:
-                    crop_input = preprocess(crop).unsqueeze(0)
-                    feat = model.encode_image(crop_input)
-                    feat /= feat.norm(dim=-1, keepdim=True)
-                    ai_scores_list.append(np.dot(ai_features, feat.numpy().T).flatten())
-            ai_scores = np.max(np.vstack(ai_scores_list), axis=0)
+                crop_inputs = torch.stack([preprocess(crop) for crop in crops])
+                feats = model.encode_image(crop_inputs).float()
+                feats /= feats.norm(dim=-1, keepdim=True)
+            ai_scores = best_crop_scores(ai_features, feats.numpy())
             
             # 2. Color/Texture Score (Exact pixels/shapes)
-            color_query = extract_color_texture_signature(enhanced_image)
-            color_scores = np.dot(color_features, color_query.T).flatten()
+            color_query = color_texture_signature(enhanced_image)
+            color_scores = color_features @ color_query
             
             # 3. Hybrid Fusion: 70% Intelligence + 30% Exact Color/Texture
             final_scores = (0.7 * ai_scores) + (0.3 * color_scores)
@@ -0,0 +1,153 @@
+"""
+Compact, memory-mapped copies of the hotel feature matrices.
+
+The indexer writes each float32 matrix (hotel_features_ai.npy,
+hotel_features_color.npy) in two smaller forms next to it:
+- ``<name>_f16.npy``: float16, half the size;
+- ``<name>_i8.npy`` with ``<name>_i8_scale.npy``: int8 codes with one
+  symmetric scale per dimension, a quarter of the size.
+
+Services open the copy selected by FEATURES_PRECISION read-only with
+mmap_mode="r", so several processes share the same pages. Scoring
+dequantizes on the fly, one chunk of rows at a time. For int8 the
+per-dimension scale is folded into the query, so a chunk costs one
+float32 conversion and one BLAS product:
+
+    x . q  ~=  (codes * scale) . q  =  codes . (scale * q)
+
+Existing feature files can be converted with:
+
+    python feature_store.py quantize
+"""
+import argparse
+import os
+
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+FEATURE_NAMES = ("hotel_features_ai", "hotel_features_color")
+
+# Rows dequantized per matrix product; bounds the float32 scratch memory
+SCORE_CHUNK = 4096
+
+
+def quantized_paths(directory, name):
+    return {
+        "float32": os.path.join(directory, f"{name}.npy"),
+        "float16": os.path.join(directory, f"{name}_f16.npy"),
+        "int8": os.path.join(directory, f"{name}_i8.npy"),
+        "int8_scale": os.path.join(directory, f"{name}_i8_scale.npy"),
+    }
+
+
+def quantize_int8(features):
+    """Symmetric per-dimension int8 codes and their float32 scales"""
+    features = np.asarray(features, dtype=np.float32)
+    scale = np.abs(features).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(features / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+def save_array(path, array):
+    """
+    np.save to a temporary file, then os.replace it into place. Workers keep
+    mapping the old inode instead of seeing a truncated, half-written file.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def write_quantized(features, directory, name):
+    """Write the float16 and int8 copies of one feature matrix"""
+    paths = quantized_paths(directory, name)
+    save_array(paths["float16"], np.asarray(features, dtype=np.float16))
+    codes, scale = quantize_int8(features)
+    save_array(paths["int8_scale"], scale)
+    save_array(paths["int8"], codes)
+
+
+class QuantizedFeatures:
+    """
+    Read-only float16 or int8 feature matrix that scores like a float32 one.
+
+    Supports what the search code needs from an ndarray: ``shape``,
+    ``len()``, row indexing (rows come back as float32) and ``@`` with a
+    query vector or matrix.
+    """
+
+    def __init__(self, data, scale=None):
+        self.data = data
+        self.scale = scale
+        self.dtype = data.dtype
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        rows = np.asarray(self.data[index], dtype=np.float32)
+        return rows * self.scale if self.scale is not None else rows
+
+    def __matmul__(self, other):
+        other = np.asarray(other, dtype=np.float32)
+        vector = other.ndim == 1
+        queries = other[:, None] if vector else other
+        if self.scale is not None:
+            queries = queries * self.scale[:, None]
+        out = np.empty((len(self.data), queries.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.data), SCORE_CHUNK):
+            chunk = self.data[start:start + SCORE_CHUNK]
+            out[start:start + len(chunk)] = chunk.astype(np.float32) @ queries
+        return out[:, 0] if vector else out
+
+
+def load_features(directory, name, precision="float32", mmap_mode="r"):
+    """
+    Open a feature matrix at the given precision.
+
+    Returns a plain ndarray for float32, otherwise QuantizedFeatures. Falls
+    back to float32 (with a warning) if the quantized copy was not written.
+    Returns None if the float32 matrix does not exist either.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown feature precision '{precision}'; expected one of {', '.join(PRECISIONS)}")
+    paths = quantized_paths(directory, name)
+    if precision != "float32":
+        if os.path.exists(paths[precision]):
+            data = np.load(paths[precision], mmap_mode=mmap_mode)
+            scale = np.load(paths["int8_scale"]) if precision == "int8" else None
+            return QuantizedFeatures(data, scale)
+        print(f"Warning: {paths[precision]} not found, using float32. Create it with: python feature_store.py quantize")
+    if not os.path.exists(paths["float32"]):
+        return None
+    return np.load(paths["float32"], mmap_mode=mmap_mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write float16 and int8 copies of the hotel feature matrices")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("quantize")
+    parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in FEATURE_NAMES:
+        features = load_features(base_dir, name, mmap_mode="r")
+        if features is None:
+            print(f"Skip {name}: {name}.npy not found")
+            continue
+        write_quantized(features, base_dir, name)
+        print(f"Quantized {name}: {features.shape[0]} x {features.shape[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Memory-resident view of the hotels table in hotels.db.
+
+Every search result needs its hotel's name, stars and price. Opening a
+SQLite connection per result costs more than the lookup itself, so
+HotelCatalog loads the table once:
+- names and links are kept in lists;
+- stars and prices are kept in numpy arrays;
+- everything is keyed by hotel id.
+
+Long descriptions are cold, so they stay in the database. They are read
+through a small pool of read-only connections, one query per batch of
+hotels.
+
+ImageAttributes copies each image's hotel price and stars from a snapshot
+into per-image arrays, so image search can apply price, star and hotel
+filters as one boolean mask before scoring.
+
+The catalog notices when setup_db.py rewrites the file (mtime or size
+change, checked at most every ``check_interval`` seconds). It then builds a
+new snapshot and swaps it in with one assignment, so readers see either
+the old table or the new one, never a mix.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Stored in the stars/prices arrays for NULL values
+MISSING = -1
+
+
+class CatalogSnapshot:
+    """Immutable copy of the hot columns of the hotels table"""
+
+    def __init__(self, rows, version):
+        self.version = version
+        rows = sorted(rows, key=lambda row: row[0])
+        self.ids = np.array([row[0] for row in rows], dtype=np.int32)
+        self.names = [row[1] for row in rows]
+        self.stars = np.array([MISSING if row[2] is None else row[2] for row in rows], dtype=np.int16)
+        self.prices = np.array([MISSING if row[3] is None else row[3] for row in rows], dtype=np.int32)
+        self.links = [row[4] for row in rows]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, hotel_ids):
+        """Row position of each hotel id, -1 where the id is unknown"""
+        hotel_ids = np.asarray(hotel_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(len(hotel_ids), -1)
+        positions = np.minimum(np.searchsorted(self.ids, hotel_ids), len(self.ids) - 1)
+        return np.where(self.ids[positions] == hotel_ids, positions, -1)
+
+    def record(self, position):
+        stars = int(self.stars[position])
+        price = int(self.prices[position])
+        return {
+            "id": int(self.ids[position]),
+            "name": self.names[position],
+            "stars": None if stars == MISSING else stars,
+            "price": None if price == MISSING else price,
+            "external_link": self.links[position],
+        }
+
+
+class ImageAttributes:
+    """Per-image hotel price and stars from one snapshot, for filtering images before scoring"""
+
+    def __init__(self, snapshot, image_hotel):
+        """
+        Args:
+            snapshot: CatalogSnapshot the attributes are copied from
+            image_hotel: hotel id of each indexed image, -1 for unmapped images
+        """
+        self.version = snapshot.version
+        self.image_hotel = np.asarray(image_hotel)
+        positions = snapshot.positions(self.image_hotel)
+        # Images of hotels missing from the catalog are never eligible
+        self.known = positions >= 0
+        self.prices = np.full(len(positions), MISSING, dtype=np.int32)
+        self.stars = np.full(len(positions), MISSING, dtype=np.int16)
+        self.prices[self.known] = snapshot.prices[positions[self.known]]
+        self.stars[self.known] = snapshot.stars[positions[self.known]]
+
+    def eligible(self, max_price=None, min_stars=None, hotel_ids=None):
+        """
+        Sorted indices of the images whose hotel passes every given filter.
+        Hotels without a price (or stars) fail a price (or stars) filter.
+        """
+        mask = self.known.copy()
+        if max_price is not None:
+            mask &= (self.prices != MISSING) & (self.prices <= max_price)
+        if min_stars is not None:
+            mask &= (self.stars != MISSING) & (self.stars >= min_stars)
+        if hotel_ids is not None:
+            mask &= np.isin(self.image_hotel, np.asarray(list(hotel_ids), dtype=np.int64))
+        return np.flatnonzero(mask)
+
+
+class HotelCatalog:
+    """Hotel details from hotels.db without a connection per lookup"""
+
+    def __init__(self, db_path, check_interval=1.0, pool_size=4):
+        self.db_path = str(db_path)
+        self.check_interval = check_interval
+        self.pool_size = pool_size
+        self._snapshot = CatalogSnapshot([], None)
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._connections = queue.LifoQueue()
+        self._generation = 0
+        self._reload()
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _reload(self):
+        version = self._file_version()
+        if version is None:
+            rows = []
+        else:
+            conn = self._connect()
+            try:
+                rows = conn.execute("SELECT id, name, stars, price, external_link FROM hotels").fetchall()
+            finally:
+                conn.close()
+        # Connections opened on a replaced file would keep reading the old one
+        self._generation += 1
+        self._drain_pool()
+        self._snapshot = CatalogSnapshot(rows, version)
+        print(f"Hotel catalog loaded: {len(rows)} hotels")
+
+    def snapshot(self):
+        """Current snapshot, reloading first if the database file changed"""
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            if self._file_version() != self._snapshot.version:
+                with self._reload_lock:
+                    if self._file_version() != self._snapshot.version:
+                        try:
+                            self._reload()
+                        except sqlite3.Error as e:
+                            # Mid-rewrite; keep serving the old snapshot and retry next check
+                            print(f"Error reloading hotel catalog: {e}")
+        return self._snapshot
+
+    def _connect(self):
+        uri = f"file:{self.db_path}?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    def _drain_pool(self):
+        while True:
+            try:
+                _, conn = self._connections.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+
+    def _acquire(self):
+        try:
+            generation, conn = self._connections.get_nowait()
+            if generation == self._generation:
+                return generation, conn
+            conn.close()
+        except queue.Empty:
+            pass
+        return self._generation, self._connect()
+
+    def _release(self, generation, conn):
+        if generation == self._generation and self._connections.qsize() < self.pool_size:
+            self._connections.put((generation, conn))
+        else:
+            conn.close()
+
+    def descriptions(self, hotel_ids):
+        """Descriptions of the given hotels in one read-only query"""
+        hotel_ids = [int(h) for h in hotel_ids]
+        if not hotel_ids:
+            return {}
+        generation, conn = self._acquire()
+        try:
+            placeholders = ",".join("?" * len(hotel_ids))
+            rows = conn.execute(
+                f"SELECT id, description FROM hotels WHERE id IN ({placeholders})", hotel_ids
+            ).fetchall()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        self._release(generation, conn)
+        return dict(rows)
+
+    def get_many(self, hotel_ids, with_description=True):
+        """Details of each known hotel, keyed by id"""
+        snapshot = self.snapshot()
+        hotel_ids = [int(h) for h in hotel_ids]
+        records = {}
+        for hotel_id, position in zip(hotel_ids, snapshot.positions(hotel_ids)):
+            if position >= 0:
+                records[hotel_id] = snapshot.record(position)
+        if with_description and records:
+            descriptions = self.descriptions(records)
+            for hotel_id, record in records.items():
+                record["description"] = descriptions.get(hotel_id)
+        return records
+
+    def get(self, hotel_id, with_description=True):
+        """Details of one hotel, or None if it is not in the catalog"""
+        return self.get_many([hotel_id], with_description).get(int(hotel_id))
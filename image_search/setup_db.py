@@ -1,3 +1,4 @@
+import argparse
 import os
 import json
 import sqlite3
@@ -11,6 +12,11 @@ from PIL import Image, ImageOps, ImageFilter
 from glob import glob
 import random
 
+from feature_store import save_array, write_quantized
+from vector_index import build_index
+from text_embeddings import write_common_phrases
+from visual_features import backbone_feature_name, color_texture_signatures, signature_pixels
+
 def setup_database():
     base_path = os.path.dirname(os.path.abspath(__file__))
     db_path = os.path.join(base_path, "hotels.db")
@@ -30,29 +36,28 @@ def setup_database():
     conn.commit()
     return conn
 
-def extract_color_texture_signature(image):
-    # Resize to small for color consistency
-    img_small = image.resize((64, 64))
-    img_arr = np.array(img_small)
-    
-    # 1. Color Signature: 3D Histogram (4 bins per channel = 64 dims)
-    # This captures the "Exact Color Codes" identity
-    hist, _ = np.histogramdd(img_arr.reshape(-1, 3), bins=(4, 4, 4), range=((0,256), (0,256), (0,256)))
-    hist = hist.flatten()
-    hist /= (hist.sum() + 1e-7)
-    
-    # 2. Texture Signature: Sobel-like Gradients
-    # Captures the "Shapes and Textures" of building materials
-    img_gray = ImageOps.grayscale(img_small)
-    img_gray_arr = np.array(img_gray).astype(float)
-    dx = np.diff(img_gray_arr, axis=1)
-    dy = np.diff(img_gray_arr, axis=0)
-    texture_sig = np.array([np.mean(dx**2), np.std(dx**2), np.mean(dy**2), np.std(dy**2)])
-    texture_sig /= (np.linalg.norm(texture_sig) + 1e-7)
-    
-    return np.concatenate([hist, texture_sig]).astype("float32")
+def write_backbone_features(backbone, mapping, base_dir, device="cpu"):
+    """
+    Encode every indexed image with a second CLIP backbone, in mapping order,
+    for the first stage of the cascade search (CASCADE_BACKBONE in ai-service).
+    """
+    print(f"Loading cascade backbone '{backbone}'...")
+    model, preprocess = clip.load(backbone, device=device)
+    features = []
+    for image_index in range(len(mapping)):
+        image = Image.open(mapping[image_index]["image_path"]).convert("RGB")
+        image_input = preprocess(image).unsqueeze(0).to(device)
+        with torch.no_grad():
+            feat = model.encode_image(image_input)
+            feat /= feat.norm(dim=-1, keepdim=True)
+        features.append(feat.numpy().astype("float32"))
+    features = np.vstack(features)
+    name = backbone_feature_name(backbone)
+    save_array(os.path.join(base_dir, f"{name}.npy"), features)
+    write_quantized(features, base_dir, name)
+    print(f"Wrote {name}.npy: {features.shape[0]} x {features.shape[1]}")
 
-def main():
+def main(backbone="ViT-B/32"):
     device = "cpu"
     print("Loading High-Definition CLIP 'ViT-L/14@336px'...")
     try:
@@ -66,7 +71,7 @@ def main():
     cursor = conn.cursor()
     
     all_ai_features = []
-    all_color_features = []
+    all_color_pixels = []
     mapping = {}
     faiss_id = 0
     
@@ -161,11 +166,12 @@ def main():
                         ai_feat = model.encode_image(image_input)
                         ai_feat /= ai_feat.norm(dim=-1, keepdim=True)
                     
-                    # Exact Color/Texture Processing
-                    color_feat = extract_color_texture_signature(image)
+                    # Exact Color/Texture Processing: keep the 64x64 pixels,
+                    # signatures are computed for all images at once below
+                    color_pixels = signature_pixels(image)
                     
                     all_ai_features.append(ai_feat.numpy().astype("float32"))
-                    all_color_features.append(color_feat)
+                    all_color_pixels.append(color_pixels)
                     
                     mapping[faiss_id] = {"hotel_id": hotel_id, "image_path": img_path}
                     faiss_id += 1
@@ -182,11 +188,33 @@ def main():
         color_feat_path = os.path.join(base_dir, "hotel_features_color.npy")
         mapping_path = os.path.join(base_dir, "mapping.pkl")
         
-        np.save(ai_feat_path, np.vstack(all_ai_features))
-        np.save(color_feat_path, np.vstack(all_color_features))
+        ai_features = np.vstack(all_ai_features)
+        color_features = color_texture_signatures(np.stack(all_color_pixels))
+        save_array(ai_feat_path, ai_features)
+        save_array(color_feat_path, color_features)
+        # float16 and int8 copies for FEATURES_PRECISION
+        write_quantized(ai_features, base_dir, "hotel_features_ai")
+        write_quantized(color_features, base_dir, "hotel_features_color")
         with open(mapping_path, "wb") as f:
             pickle.dump(mapping, f)
+        # IVF lists for approximate search (VECTOR_INDEX=ivf in ai-service)
+        build_index("ivf", ai_features, base_dir)
+        # Text embeddings of common phrases for /api/v1/hotels/search-by-text
+        write_common_phrases(model, base_dir, device)
+        if backbone:
+            write_backbone_features(backbone, mapping, base_dir, device)
         print(f"Ingestion complete. Hybrid Index created at {base_dir}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build hotels.db and the hybrid image index")
+    parser.add_argument("--backbone", default=os.getenv("CASCADE_BACKBONE", "ViT-B/32"),
+                        help="Small CLIP backbone for the cascade search ('' to skip)")
+    parser.add_argument("--backbone-only", action="store_true",
+                        help="Only encode the existing index with --backbone; keeps hotels.db as is")
+    args = parser.parse_args()
+    if args.backbone_only:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(base_dir, "mapping.pkl"), "rb") as f:
+            write_backbone_features(args.backbone, pickle.load(f), base_dir)
+    else:
+        main(args.backbone)
@@ -0,0 +1,156 @@
+"""
+CLIP text embeddings of search phrases, for text-to-image hotel search.
+
+A text query scores the image index with the same matrix product as an
+image crop, so its cost is dominated by CLIP's text tower. The phrases
+users actually send are few and repetitive, so their embeddings are
+looked up instead of recomputed:
+
+- COMMON_PHRASES, the descriptors used elsewhere in the project, are
+  encoded once and persisted in text_phrase_embeddings.npz next to the
+  features (setup_db.py writes it, or ``python text_embeddings.py build``);
+- any other phrase is encoded on first use and kept in a bounded LRU.
+
+The table records the CLIP model that built it. A table built with another
+model, or with the wrong dimension, is ignored and rebuilt, because its
+vectors would not be comparable with hotel_features_ai.npy.
+"""
+import argparse
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TABLE_FILE = "text_phrase_embeddings.npz"
+MODEL_NAME = "ViT-L/14@336px"
+
+# The visual descriptors of hotel_recommendations (visual_keywords and the
+# ChatAnalyzer.VIBE_GROUPS lists) and the feature tags of the Streamlit app
+COMMON_PHRASES = (
+    "wooden flooring", "infinity pool", "glass facade", "modern decor", "traditional style",
+    "bathtubs", "sea view", "beach view",
+    "beach", "sea", "ocean", "waterfront", "sand",
+    "forest", "jungle", "lush green", "paddy fields", "hills", "garden",
+    "lush garden", "cozy lighting", "spacious room", "balcony", "city skyline", "mountain view",
+)
+
+
+def normalize_phrase(text):
+    """Lower-case and collapse whitespace, so trivially different queries share an entry"""
+    return " ".join(text.lower().split())
+
+
+def save_table(path, phrases, embeddings, model_name=MODEL_NAME):
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path, phrases=np.array(list(phrases)), embeddings=np.asarray(embeddings, dtype=np.float32),
+        model=np.array(model_name)
+    )
+    os.replace(tmp_path, path)
+
+
+def load_table(path, dim, model_name=MODEL_NAME):
+    """
+    (phrases, embeddings) persisted at ``path``, or None when the file is
+    missing or was built for another model or dimension
+    """
+    if not os.path.exists(path):
+        return None
+    data = np.load(path)
+    if str(data["model"]) != model_name or data["embeddings"].shape[1:] != (dim,):
+        print(f"Warning: {path} was built for {data['model']} with shape {data['embeddings'].shape}, ignoring it")
+        return None
+    return [str(p) for p in data["phrases"]], data["embeddings"]
+
+
+class TextEmbeddingTable:
+    """
+    Phrase -> normalized CLIP text embedding: persisted common phrases plus
+    an LRU of the others. Thread-safe; encoding happens outside the lock.
+    """
+
+    def __init__(self, encode, dim, path=None, max_entries=4096, model_name=MODEL_NAME):
+        """
+        Args:
+            encode: list of phrases -> (n, dim) normalized float32 embeddings
+            dim: embedding dimension of the image index
+            path: persisted table; built from COMMON_PHRASES when missing or stale
+            max_entries: size of the LRU for phrases not in the persisted table
+        """
+        self.encode = encode
+        self.max_entries = max_entries
+        self._persisted = {}
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None:
+            table = load_table(path, dim, model_name)
+            if table is None:
+                phrases = [normalize_phrase(p) for p in COMMON_PHRASES]
+                table = phrases, np.asarray(encode(phrases), dtype=np.float32)
+                try:
+                    save_table(path, *table, model_name=model_name)
+                    print(f"Wrote {len(phrases)} phrase embeddings to {path}")
+                except OSError as e:
+                    print(f"Warning: cannot persist phrase embeddings ({e}); keeping them in memory")
+            for phrase, embedding in zip(*table):
+                self._persisted[phrase] = embedding
+
+    def __len__(self):
+        return len(self._persisted) + len(self._recent)
+
+    def lookup(self, phrase):
+        """(embedding, hit): hit is False when the phrase had to be encoded"""
+        phrase = normalize_phrase(phrase)
+        embedding = self._persisted.get(phrase)
+        if embedding is not None:
+            return embedding, True
+        with self._lock:
+            embedding = self._recent.get(phrase)
+            if embedding is not None:
+                self._recent.move_to_end(phrase)
+                return embedding, True
+        embedding = np.asarray(self.encode([phrase]), dtype=np.float32)[0]
+        with self._lock:
+            self._recent[phrase] = embedding
+            self._recent.move_to_end(phrase)
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+        return embedding, False
+
+
+def clip_text_encoder(model, device="cpu"):
+    """encode() for TextEmbeddingTable from a loaded CLIP model"""
+    import clip
+    import torch
+
+    def encode(phrases):
+        with torch.no_grad():
+            features = model.encode_text(clip.tokenize(phrases, truncate=True).to(device)).float()
+            features /= features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy()
+
+    return encode
+
+
+def write_common_phrases(model, directory, device="cpu"):
+    """Encode COMMON_PHRASES with the indexing model and persist them"""
+    phrases = [normalize_phrase(p) for p in COMMON_PHRASES]
+    save_table(os.path.join(directory, TABLE_FILE), phrases, clip_text_encoder(model, device)(phrases))
+    print(f"Wrote {len(phrases)} phrase embeddings to {TABLE_FILE}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persist CLIP text embeddings of common search phrases")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build")
+    parser.parse_args()
+
+    import clip
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    model, _ = clip.load(MODEL_NAME, device="cpu")
+    write_common_phrases(model, base_dir)
+
+
+if __name__ == "__main__":
+    main()
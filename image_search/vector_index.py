@@ -0,0 +1,225 @@
+"""
+Nearest-neighbour indexes over hotel_features_ai.npy.
+
+A query is several crop embeddings, and an image scores its best cosine
+similarity over the crops. The approximate indexes only pick candidate
+images. The candidates' scores are then computed exactly from the feature
+matrix, so an approximate search returns the exact top-k whenever the
+true neighbours are among the candidates.
+
+- ``exact``: brute force over every image.
+- ``ivf``: pure numpy IVF-Flat. Images are clustered by spherical k-means,
+  and a query scans the ``nprobe`` lists whose centroids are closest to
+  any of its crops.
+- ``faiss``: faiss.IndexIVFFlat with inner product, if faiss is installed.
+
+setup_db.py builds the IVF index next to the features. Rebuild or build
+another kind with:
+
+    python vector_index.py build --kind ivf --nlist 1024
+"""
+import argparse
+import os
+
+import numpy as np
+
+from visual_features import best_crop_scores
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+INDEX_FILES = {"ivf": "hotel_index_ivf.npz", "faiss": "hotel_index_faiss.index"}
+
+# Rows scored per matrix product during k-means assignment
+ASSIGN_CHUNK = 65536
+
+
+def top_k_ids(ids, scores, k):
+    """The k best (ids, scores), best first"""
+    if k < len(scores):
+        keep = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+
+def default_nlist(n_images):
+    """About 4 * sqrt(n) lists, the usual IVF starting point"""
+    return int(max(1, min(n_images, round(4 * np.sqrt(n_images)))))
+
+
+class ExactIndex:
+    """Brute-force search over every image"""
+
+    kind = "exact"
+
+    def __init__(self, features):
+        self.features = features
+
+    def search(self, queries, k):
+        scores = best_crop_scores(self.features, queries)
+        return top_k_ids(np.arange(len(scores)), scores, k)
+
+
+class IVFIndex:
+    """Inverted file of spherical k-means clusters, in numpy"""
+
+    kind = "ivf"
+
+    def __init__(self, features, centroids, list_offsets, list_ids, nprobe=8):
+        self.features = features
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, features, nlist=None, iterations=10, max_train=65536, seed=0):
+        rng = np.random.default_rng(seed)
+        n = len(features)
+        train = np.asarray(features[np.sort(rng.choice(n, min(n, max_train), replace=False))], dtype=np.float32)
+        nlist = min(nlist or default_nlist(n), len(train))
+        centroids = train[rng.choice(len(train), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(train @ centroids.T, axis=1)
+            counts = np.bincount(assignment, minlength=nlist)
+            # Sum each cluster's points as one contiguous segment
+            starts = np.r_[0, np.cumsum(counts)[:-1]]
+            nonempty = np.flatnonzero(counts)
+            sums = np.zeros_like(centroids)
+            sums[nonempty] = np.add.reduceat(train[np.argsort(assignment, kind="stable")], starts[nonempty])
+            empty = np.flatnonzero(counts == 0)
+            # Reseed empty clusters with random training points
+            sums[empty] = train[rng.choice(len(train), len(empty), replace=False)]
+            centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-12)
+
+        assignment = np.concatenate([
+            np.argmax(np.asarray(features[start:start + ASSIGN_CHUNK], dtype=np.float32) @ centroids.T, axis=1)
+            for start in range(0, n, ASSIGN_CHUNK)
+        ])
+        list_ids = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.r_[0, np.cumsum(np.bincount(assignment, minlength=nlist))].astype(np.int64)
+        return cls(features, centroids.astype(np.float32), list_offsets, list_ids)
+
+    def save(self, path):
+        np.savez(
+            path, centroids=self.centroids, list_offsets=self.list_offsets, list_ids=self.list_ids,
+            shape=np.array(self.features.shape)
+        )
+
+    @classmethod
+    def load(cls, path, features, nprobe=8):
+        data = np.load(path)
+        if tuple(data["shape"]) != tuple(features.shape):
+            raise ValueError(f"{path} was built for features of shape {tuple(data['shape'])}, not {features.shape}")
+        return cls(features, data["centroids"], data["list_offsets"], data["list_ids"], nprobe)
+
+    def probe_lists(self, queries):
+        """Lists among the nprobe nearest centroids of any crop"""
+        nprobe = min(self.nprobe, len(self.centroids))
+        nearest = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        return np.unique(nearest)
+
+    def search(self, queries, k):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        ids = np.concatenate([
+            self.list_ids[self.list_offsets[i]:self.list_offsets[i + 1]] for i in self.probe_lists(queries)
+        ])
+        ids.sort()  # Sequential reads from a memory-mapped feature matrix
+        scores = best_crop_scores(np.asarray(self.features[ids]), queries)
+        return top_k_ids(ids, scores, k)
+
+
+class FaissIndex:
+    """faiss.IndexIVFFlat on inner product; candidates are rescored exactly"""
+
+    kind = "faiss"
+
+    def __init__(self, features, index, nprobe=8):
+        self.features = features
+        self.index = index
+        self.nprobe = nprobe
+        self.index.nprobe = nprobe
+
+    @classmethod
+    def build(cls, features, nlist=None):
+        if faiss is None:
+            raise ImportError("faiss is not installed (pip install faiss-cpu)")
+        vectors = np.ascontiguousarray(features, dtype=np.float32)
+        nlist = min(nlist or default_nlist(len(vectors)), len(vectors))
+        quantizer = faiss.IndexFlatIP(vectors.shape[1])
+        index = faiss.IndexIVFFlat(quantizer, vectors.shape[1], nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add(vectors)
+        return cls(features, index)
+
+    def save(self, path):
+        faiss.write_index(self.index, str(path))
+
+    @classmethod
+    def load(cls, path, features, nprobe=8):
+        if faiss is None:
+            raise ImportError("faiss is not installed (pip install faiss-cpu)")
+        index = faiss.read_index(str(path))
+        if index.ntotal != len(features) or index.d != features.shape[1]:
+            raise ValueError(f"{path} holds {index.ntotal}x{index.d} vectors, features are {features.shape}")
+        return cls(features, index, nprobe)
+
+    def search(self, queries, k):
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.index.d)
+        _, neighbours = self.index.search(queries, k)
+        ids = np.unique(neighbours[neighbours >= 0])
+        scores = best_crop_scores(np.asarray(self.features[ids]), queries)
+        return top_k_ids(ids, scores, k)
+
+
+INDEX_CLASSES = {"ivf": IVFIndex, "faiss": FaissIndex}
+
+
+def build_index(kind, features, directory, nlist=None):
+    """Build an index of the given kind and save it next to the features"""
+    index = INDEX_CLASSES[kind].build(features, nlist)
+    index.save(os.path.join(directory, INDEX_FILES[kind]))
+    return index
+
+
+def load_index(kind, features, directory, nprobe=8):
+    """
+    Load the saved index of the given kind.
+
+    Falls back to the exact index (with a warning) when the kind is
+    "exact", the index file is missing or stale, or faiss is unavailable.
+    """
+    if kind == "exact":
+        return ExactIndex(features)
+    if kind not in INDEX_CLASSES:
+        raise ValueError(f"Unknown vector index '{kind}'; expected exact, {', '.join(INDEX_CLASSES)}")
+    path = os.path.join(directory, INDEX_FILES[kind])
+    if not os.path.exists(path):
+        print(f"Warning: {path} not found, using exact search. Build it with: python vector_index.py build --kind {kind}")
+        return ExactIndex(features)
+    try:
+        return INDEX_CLASSES[kind].load(path, features, nprobe)
+    except (ImportError, ValueError) as e:
+        print(f"Warning: cannot load {kind} index ({e}), using exact search")
+        return ExactIndex(features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a nearest-neighbour index over hotel_features_ai.npy")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--kind", choices=sorted(INDEX_CLASSES), default="ivf")
+    build.add_argument("--nlist", type=int, default=None, help="Number of lists (default about 4*sqrt(n))")
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    features = np.load(os.path.join(base_dir, "hotel_features_ai.npy"), mmap_mode="r")
+    index = build_index(args.kind, features, base_dir, args.nlist)
+    print(f"Built {index.kind} index over {len(features)} images in {base_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Multi-scale crops and batched scoring shared by app.py and the ai-service
+image search.
+
+Crops are boxes in fractions of the image size (x0, y0, x1, y1). The query
+image is cut into every crop, all crops are encoded in one forward pass,
+and each indexed image scores the best match over the crops with a single
+matrix product.
+
+For a cascade search a small backbone (hotel_features_ai_<backbone>.npy)
+scores every image, and only the images of its best hotels are re-ranked
+with the large model's features.
+
+The color/texture signature (64-bin RGB histogram plus 4 gradient
+statistics) is computed here too, for one image or a stacked batch.
+"""
+import numpy as np
+
+# Whole image, then two progressively tighter center crops
+DEFAULT_CROPS = (
+    (0.0, 0.0, 1.0, 1.0),
+    (0.1, 0.1, 0.9, 0.9),
+    (0.2, 0.2, 0.8, 0.8),
+)
+
+
+def parse_crops(spec):
+    """
+    Parse IMAGE_SEARCH_CROPS, e.g. "0,0,1,1;0.1,0.1,0.9,0.9".
+
+    An empty spec gives DEFAULT_CROPS. Raises ValueError for a malformed box.
+    """
+    if not spec or not spec.strip():
+        return DEFAULT_CROPS
+    crops = []
+    for box in spec.split(";"):
+        if not box.strip():
+            continue
+        try:
+            x0, y0, x1, y1 = (float(v) for v in box.split(","))
+        except ValueError:
+            raise ValueError(f"Crop '{box.strip()}' must be four comma-separated fractions x0,y0,x1,y1")
+        if not (0.0 <= x0 < x1 <= 1.0 and 0.0 <= y0 < y1 <= 1.0):
+            raise ValueError(f"Crop '{box.strip()}' must satisfy 0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1")
+        crops.append((x0, y0, x1, y1))
+    if not crops:
+        raise ValueError("IMAGE_SEARCH_CROPS must contain at least one crop")
+    return tuple(crops)
+
+
+def multi_scale_crops(image, crops=DEFAULT_CROPS):
+    """Cut a PIL image into the given fractional boxes"""
+    w, h = image.size
+    regions = []
+    for x0, y0, x1, y1 in crops:
+        if (x0, y0, x1, y1) == (0.0, 0.0, 1.0, 1.0):
+            regions.append(image)
+        else:
+            regions.append(image.crop((w * x0, h * y0, w * x1, h * y1)))
+    return regions
+
+
+def backbone_feature_name(backbone):
+    """Feature file stem for a CLIP backbone, e.g. "ViT-B/32" -> hotel_features_ai_vit-b-32"""
+    slug = backbone.lower().replace("/", "-").replace("@", "-")
+    return f"hotel_features_ai_{slug}"
+
+
+def best_crop_scores(features, queries):
+    """
+    Score every indexed image against every crop in one matrix product.
+
+    Args:
+        features: (n_images, dim) normalized index features
+        queries: (n_crops, dim) normalized crop features
+
+    Returns:
+        (n_images,) best cosine similarity over the crops
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, features.shape[1])
+    return (features @ queries.T).max(axis=1)
+
+
+SIGNATURE_SIZE = 64  # Images are resized to 64x64 before the color/texture signature
+# Images per vectorized pass; bounds the temporaries at a few MB
+SIGNATURE_CHUNK = 256
+
+
+def signature_pixels(image):
+    """The 64x64 RGB array a color/texture signature is computed from"""
+    return np.asarray(image.resize((SIGNATURE_SIZE, SIGNATURE_SIZE)), dtype=np.uint8)
+
+
+def color_texture_signatures(pixels):
+    """
+    Color/texture signatures of a batch of 64x64 RGB images.
+
+    Args:
+        pixels: (n, 64, 64, 3) uint8 arrays from signature_pixels
+
+    Returns:
+        (n, 68) float32: the normalized 4x4x4 RGB histogram, then the
+        normalized mean and std of the squared horizontal and vertical
+        gray-level gradients. Bit-identical to np.histogramdd plus
+        ImageOps.grayscale and np.diff on each image.
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    out = np.empty((len(pixels), 68), dtype=np.float32)
+    for start in range(0, len(pixels), SIGNATURE_CHUNK):
+        out[start:start + SIGNATURE_CHUNK] = _signature_chunk(pixels[start:start + SIGNATURE_CHUNK])
+    return out
+
+
+def _signature_chunk(pixels):
+    n = len(pixels)
+    flat = pixels.reshape(n, -1, 3)
+
+    # 4 bins per channel over 0..255 is the top two bits of each value
+    bins = (flat[..., 0] >> 6).astype(np.intp) * 16 + (flat[..., 1] >> 6) * 4 + (flat[..., 2] >> 6)
+    bins += np.arange(n)[:, None] * 64
+    hist = np.bincount(bins.ravel(), minlength=n * 64).reshape(n, 64).astype(np.float64)
+    hist /= hist.sum(axis=1, keepdims=True) + 1e-7
+
+    # PIL's integer RGB -> L conversion
+    gray = np.multiply(pixels[..., 0], 19595, dtype=np.uint32)
+    gray += np.multiply(pixels[..., 1], 38470, dtype=np.uint32)
+    gray += np.multiply(pixels[..., 2], 7471, dtype=np.uint32)
+    gray += 0x8000
+    gray >>= 16
+    gray = gray.astype(np.float64)
+    dx2 = (np.diff(gray, axis=2) ** 2).reshape(n, -1)
+    dy2 = (np.diff(gray, axis=1) ** 2).reshape(n, -1)
+    texture = np.stack([dx2.mean(axis=1), dx2.std(axis=1), dy2.mean(axis=1), dy2.std(axis=1)], axis=1)
+    # Row by row: np.linalg.norm of a vector is a BLAS dot, whose summation
+    # order a batched reduction does not reproduce bit for bit
+    texture /= np.array([np.linalg.norm(row) for row in texture]).reshape(n, 1) + 1e-7
+
+    return np.concatenate([hist, texture], axis=1).astype(np.float32)
+
+
+def color_texture_signature(image):
+    """Color/texture signature of one PIL RGB image, shape (68,)"""
+    return color_texture_signatures(signature_pixels(image)[None])[0]
+
+
+class HotelGroups:
+    """
+    Image -> hotel grouping of the index, precomputed from mapping.pkl so the
+    per-hotel best score and top-k need no Python loop per query.
+
+    Images are stored sorted by hotel (and by image index within a hotel), so
+    every hotel is one contiguous segment for ``np.maximum.reduceat``. The
+    results match a loop over the images in index order that keeps the first
+    best image per hotel, followed by a stable sort by score: ties between
+    hotels go to the hotel whose first image comes first.
+    """
+
+    def __init__(self, mapping, n_images):
+        # -1 marks images with no hotel in the mapping
+        self.image_hotel = np.full(n_images, -1, dtype=np.int32)
+        for image_index, info in mapping.items():
+            if 0 <= image_index < n_images:
+                self.image_hotel[image_index] = info["hotel_id"]
+        mapped = np.flatnonzero(self.image_hotel >= 0)
+        self.order = mapped[np.argsort(self.image_hotel[mapped], kind="stable")]
+        hotels = self.image_hotel[self.order]
+        self.starts = np.flatnonzero(np.r_[True, hotels[1:] != hotels[:-1]]) if len(hotels) else np.zeros(0, np.intp)
+        self.hotel_ids = hotels[self.starts]
+        self.lengths = np.diff(np.r_[self.starts, len(self.order)])
+        # First image of each hotel, the tie-break between equal scores
+        self.first_image = self.order[self.starts]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def best_per_hotel(self, scores):
+        """Best score and the first image reaching it, per hotel (in hotel_ids order)"""
+        segment_scores = np.asarray(scores)[self.order]
+        best = np.maximum.reduceat(segment_scores, self.starts)
+        is_best = segment_scores == np.repeat(best, self.lengths)
+        positions = np.where(is_best, np.arange(len(segment_scores)), len(segment_scores))
+        best_positions = np.minimum.reduceat(positions, self.starts)
+        # NaN scores never compare equal; fall back to the hotel's first image
+        best_positions = np.where(best_positions < len(segment_scores), best_positions, self.starts)
+        return best, self.order[best_positions]
+
+    def images_of(self, hotel_ids):
+        """Indices of every image of the given hotels, ascending"""
+        return np.flatnonzero(np.isin(self.image_hotel, np.asarray(hotel_ids, dtype=np.int32)))
+
+    def top_hotels(self, scores, top_k):
+        """
+        (hotel_ids, best_scores, best_image_indices) of the top_k hotels, best first
+        """
+        if not len(self) or top_k <= 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return self.hotel_ids[empty], np.asarray(scores)[empty], empty
+        best, best_images = self.best_per_hotel(scores)
+        if top_k < len(best):
+            # Keep every hotel tied with the k-th score so the tie-break stays exact
+            kth = best[np.argpartition(-best, top_k - 1)[:top_k]].min()
+            candidates = np.flatnonzero(best >= kth)
+        else:
+            candidates = np.arange(len(best))
+        ranked = candidates[np.lexsort((self.first_image[candidates], -best[candidates]))][:top_k]
+        return self.hotel_ids[ranked], best[ranked], best_images[ranked]
+
+
+def cascade_candidates(groups, coarse_scores, n_hotels):
+    """Every image of the n_hotels best hotels under the small-backbone scores"""
+    hotel_ids, _, _ = groups.top_hotels(coarse_scores, n_hotels)
+    return groups.images_of(hotel_ids)
@@ -3,8 +3,10 @@
 Handles model configuration and constants.
 """
 
-# Model configuration
-MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment"
+import os
+
+# Model configuration (SENTIMENT_MODEL_NAME may point at a local copy of the model)
+MODEL_NAME = os.getenv("SENTIMENT_MODEL_NAME", "cardiffnlp/twitter-roberta-base-sentiment")
 
 # Sentiment label mapping
 # The model outputs: LABEL_0 (negative), LABEL_1 (neutral), LABEL_2 (positive)